@@ -65,6 +65,41 @@ export async function fetchDopplerPlotData(
   return data as DopplerPlotData;
 }
 
+/**
+ * Fetch plot data and audio from a single simulation.
+ * Body: float32 [time | amplitude | frequency] followed by the WAV file.
+ */
+export async function fetchDopplerCombined(
+  params: DopplerParams
+): Promise<{ audio: Blob; plot: DopplerPlotData }> {
+  const url = `${BASE_URL}/combined?frequency=${params.frequency}&velocity=${params.velocity}&duration=${params.duration}`;
+
+  const response = await fetch(url, {
+    method: "GET",
+  });
+
+  if (!response.ok) {
+    throw new Error(
+      `Failed to fetch Doppler data: ${response.status} ${response.statusText}`
+    );
+  }
+
+  const points = Number(response.headers.get("X-Plot-Points"));
+  const plotBytes = Number(response.headers.get("X-Plot-Bytes"));
+  const body = await response.arrayBuffer();
+  const plot = new Float32Array(body, 0, points * 3);
+
+  return {
+    audio: new Blob([body.slice(plotBytes)], { type: "audio/wav" }),
+    plot: {
+      time: Array.from(plot.subarray(0, points)),
+      amplitude: Array.from(plot.subarray(points, 2 * points)),
+      frequency: Array.from(plot.subarray(2 * points)),
+      stats: JSON.parse(response.headers.get("X-Doppler-Stats") ?? "{}"),
+    },
+  };
+}
+
 /**
  * Predict source frequency and velocity from uploaded audio file using AI model
  */
@@ -11,8 +11,7 @@ import { useToast } from "../../hooks/use-toast";
 // Import Plotly
 import Plot from "react-plotly.js";
 import {
-  fetchDopplerAudio,
-  fetchDopplerPlotData,
+  fetchDopplerCombined,
   type DopplerPlotData,
 } from "../api/doppler";
 
@@ -39,13 +38,11 @@ export default function DopplerGenerator() {
     setIsGenerating(true);
     try {
       const params = { frequency, velocity, duration };
-      const [audioBlob, plotDataResponse] = await Promise.all([
-        fetchDopplerAudio(params),
-        fetchDopplerPlotData(params),
-      ]);
-      const url = URL.createObjectURL(audioBlob);
+      // One request, one simulation: plot arrays and WAV together
+      const { audio, plot } = await fetchDopplerCombined(params);
+      const url = URL.createObjectURL(audio);
       setAudioUrl(url);
-      setPlotData(plotDataResponse);
+      setPlotData(plot);
       toast({
         title: "Sound Generated",
         description: "Doppler effect audio has been generated successfully.",
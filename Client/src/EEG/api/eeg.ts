@@ -1,9 +1,27 @@
 export interface EEGPreprocessResponse {
   channels: string[];
+  recording_id: string;
   access_url: string;
+  window_url: string;
   message: string;
 }
 
+export interface EEGHeader {
+  channels: string[];
+  samplingRate: number;
+  nSamples: number;
+  dtype: string;
+  layout: string;
+  dataFile: string;
+}
+
+export interface EEGWindow {
+  channels: string[];
+  samplingRate: number;
+  startSample: number;
+  data: Float32Array[]; // data[channelIndex][sampleIndex]
+}
+
 export interface EEGData {
   channels: string[];
   data: number[][]; // 2D array: data[channelIndex][sampleIndex]
@@ -38,8 +56,50 @@ export async function preprocessEDF(
 }
 
 /**
- * Fetch the preprocessed EEG data from the access URL
- * @param accessUrl - URL to fetch the JSON data from
+ * Fetch a [t0, t1) window of a preprocessed recording as float32 samples
+ * @param recordingId - id returned by preprocessEDF
+ * @param t0 - window start in seconds
+ * @param t1 - window end in seconds (omit for end of recording)
+ * @param channels - subset of channel names (omit for all)
+ */
+export async function fetchEEGWindow(
+  recordingId: string,
+  t0 = 0,
+  t1?: number,
+  channels?: string[]
+): Promise<EEGWindow> {
+  const params = new URLSearchParams({ t0: String(t0) });
+  if (t1 !== undefined) params.set("t1", String(t1));
+  if (channels?.length) params.set("channels", channels.join(","));
+
+  const response = await fetch(
+    `${BASE_URL}/${encodeURIComponent(recordingId)}/window?${params}`
+  );
+
+  if (!response.ok) {
+    throw new Error(
+      `Failed to fetch EEG window: ${response.status} ${response.statusText}`
+    );
+  }
+
+  const [nChannels, nSamples] = (response.headers.get("X-Shape") ?? "0,0")
+    .split(",")
+    .map(Number);
+  const samples = new Float32Array(await response.arrayBuffer());
+
+  return {
+    channels: (response.headers.get("X-Channels") ?? "").split(",").filter(Boolean),
+    samplingRate: Number(response.headers.get("X-Sampling-Rate")),
+    startSample: Number(response.headers.get("X-Start-Sample") ?? 0),
+    data: Array.from({ length: nChannels }, (_, i) =>
+      samples.subarray(i * nSamples, (i + 1) * nSamples)
+    ),
+  };
+}
+
+/**
+ * Fetch the whole preprocessed recording: JSON header + binary samples
+ * @param accessUrl - URL of the recording's JSON header
  */
 export async function fetchEEGData(accessUrl: string): Promise<EEGData> {
   const response = await fetch(accessUrl);
@@ -50,6 +110,13 @@ export async function fetchEEGData(accessUrl: string): Promise<EEGData> {
     );
   }
 
-  const data = await response.json();
-  return data as EEGData;
+  const header = (await response.json()) as EEGHeader;
+  const recordingId = header.dataFile.replace(/\.npy$/, "");
+  const recording = await fetchEEGWindow(recordingId);
+
+  return {
+    channels: recording.channels,
+    samplingRate: recording.samplingRate,
+    data: recording.data.map((channel) => Array.from(channel)),
+  };
 }
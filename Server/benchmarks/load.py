@@ -0,0 +1,143 @@
+"""End-to-end HTTP throughput and latency under concurrency."""
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks import synthetic
+
+# name -> builder(ctx) returning (method, path, request kwargs), or None to skip
+SCENARIOS: Dict[str, Callable[[Dict[str, Any]], Optional[tuple]]] = {}
+
+
+def scenario(name: str):
+    def register(builder):
+        SCENARIOS[name] = builder
+        return builder
+    return register
+
+
+@scenario("health")
+def _health(ctx):
+    return "GET", "/health", {}
+
+
+@scenario("doppler")
+def _doppler(ctx):
+    # Varying velocity so requests miss the simulation memo
+    return "GET", "/api/doppler", {"params_fn": lambda i: {"frequency": 650, "velocity": 5 + i % 50, "duration": 5}}
+
+
+@scenario("ecg.predict")
+def _ecg(ctx):
+    record = synthetic.random_ecg(1)[0]
+    return "POST", "/api/predict/binary", {
+        "content": record.tobytes(),
+        "headers": {"X-Shape": f"{record.shape[0]},{record.shape[1]}", "X-Dtype": "float32"},
+    }
+
+
+@scenario("drone.predict")
+def _drone(ctx):
+    path = os.path.join(ctx["workdir"], "bench.wav")
+    synthetic.write_wav(path, 2.0)
+    with open(path, "rb") as f:
+        audio = f.read()
+    return "POST", "/api/predictDrone", {"files": {"audio": ("bench.wav", audio, "audio/wav")}}
+
+
+@scenario("eeg.view")
+def _eeg_view(ctx):
+    if not ctx.get("eeg_recording"):
+        return None
+    return "GET", f"/api/eeg/{ctx['eeg_recording']}/view", {
+        "params_fn": lambda i: {"t0": (i * 7) % 120, "t1": (i * 7) % 120 + 60, "pixels": 1500},
+    }
+
+
+@scenario("sar.tile")
+def _sar_tile(ctx):
+    if not ctx.get("sar_scene"):
+        return None
+    return "GET", "/api/sar/tiles/0/0/0.png", {}
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+async def _load(client, method: str, path: str, kwargs: Dict[str, Any], requests: int, concurrency: int) -> Dict[str, Any]:
+    params_fn = kwargs.pop("params_fn", None)
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            request_kwargs = dict(kwargs)
+            if params_fn is not None:
+                request_kwargs["params"] = params_fn(i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **request_kwargs)
+                await response.aread()
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": requests / elapsed,
+        "p50_s": _percentile(latencies, 0.50),
+        "p90_s": _percentile(latencies, 0.90),
+        "p99_s": _percentile(latencies, 0.99),
+        "max_s": latencies[-1] if latencies else float("nan"),
+    }
+
+
+async def _run(ctx: Dict[str, Any], names: List[str], requests: int, concurrency: int, url: Optional[str]):
+    import httpx
+
+    if url:
+        client = httpx.AsyncClient(base_url=url, timeout=120)
+    else:
+        # In-process: the app runs in this event loop, no sockets involved
+        from main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+
+    results = {}
+    async with client:
+        for name in names:
+            spec = SCENARIOS[name](ctx)
+            if spec is None:
+                print(f"⏭️  http {name}: skipped (no input for it)")
+                results[name] = {"skipped": "no input"}
+                continue
+            method, path, kwargs = spec
+            # Warm-up request: first-use imports and caches are not what we measure
+            await _load(client, method, path, dict(kwargs), 1, 1)
+            results[name] = await _load(client, method, path, dict(kwargs), requests, concurrency)
+            r = results[name]
+            print(f"🌐 http {name}: {r['throughput_rps']:.1f} req/s, p50 {r['p50_s'] * 1000:.1f} ms, "
+                  f"p99 {r['p99_s'] * 1000:.1f} ms, {r['errors']} errors")
+    return results
+
+
+def run_http(ctx: Dict[str, Any], names: List[str], requests: int, concurrency: int,
+             url: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    try:
+        return asyncio.run(_run(ctx, names, requests, concurrency, url))
+    except ImportError as e:
+        print(f"⏭️  http: skipped ({e})")
+        return {name: {"skipped": str(e)} for name in names}
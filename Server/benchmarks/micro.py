@@ -0,0 +1,242 @@
+"""Per-function micro-benchmarks of the service hot paths."""
+import os
+import shutil
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from benchmarks import standins, synthetic
+
+# name -> setup(ctx) returning the callable to time
+CASES: Dict[str, Callable[[Dict[str, Any]], Callable[[], Any]]] = {}
+
+
+def case(name: str):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Wall-clock times of `repeat` calls after `warmup`, plus the peak traced allocation of one call"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    # Separate run: tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times.sort()
+    return {
+        "median_s": statistics.median(times),
+        "p95_s": times[min(len(times) - 1, int(round(0.95 * (len(times) - 1))))],
+        "min_s": times[0],
+        "mean_s": statistics.fmean(times),
+        "repeat": repeat,
+        "peak_alloc_mb": peak / 1024 ** 2,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Doppler
+# ---------------------------------------------------------------------------
+
+@case("doppler.simulate")
+def _doppler_simulate(ctx):
+    from services import doppler_service
+
+    def run():
+        doppler_service._simulate.cache_clear()  # time the simulation, not the memo
+        doppler_service.simulate_doppler(650, 20, ctx["doppler_seconds"])
+    return run
+
+
+@case("doppler.stream")
+def _doppler_stream(ctx):
+    from services.doppler_service import stream_doppler
+    sources = [{"frequency": 650, "velocity": 20}, {"frequency": 440, "velocity": -15, "distance": 20}]
+    return lambda: sum(len(chunk) for chunk in stream_doppler(sources, ctx["doppler_seconds"]))
+
+
+@case("doppler.speed_lookup")
+def _doppler_speed(ctx):
+    from services.doppler_service import get_first_predicted_speed
+    standins.install_speed_index(os.path.join(ctx["workdir"], "speeds.h5"))
+    return lambda: [get_first_predicted_speed(f"Car_{v}.wav") for v in range(5, 40)]
+
+
+# ---------------------------------------------------------------------------
+# ECG
+# ---------------------------------------------------------------------------
+
+@case("ecg.prepare_input")
+def _ecg_prepare(ctx):
+    from services.ecg_service import prepare_batch
+    batch = synthetic.random_ecg(ctx["ecg_batch"])
+    return lambda: prepare_batch(batch)
+
+
+@case("ecg.predict_bulk")
+def _ecg_predict(ctx):
+    from services.ecg_service import predict_ecg_bulk
+    standins.install_ecg()
+    batch = synthetic.random_ecg(ctx["ecg_batch"])
+    return lambda: predict_ecg_bulk(batch)
+
+
+# ---------------------------------------------------------------------------
+# EEG
+# ---------------------------------------------------------------------------
+
+def _edf_path(ctx) -> str:
+    path = os.path.join(ctx["workdir"], "bench.edf")
+    if not os.path.exists(path):
+        synthetic.write_edf(path, ctx["edf_seconds"], ctx["edf_channels"])
+    return path
+
+
+@case("eeg.preprocess_edf")
+def _eeg_preprocess(ctx):
+    from services.eeg_service import preprocess_edf
+    path = _edf_path(ctx)
+    output_dir = os.path.join(ctx["workdir"], "eegdata")
+    return lambda: preprocess_edf(path, "bench", output_dir)
+
+
+@case("eeg.read_view")
+def _eeg_view(ctx):
+    from services.eeg_service import preprocess_edf
+    from services.signal_store import read_view
+    output_dir = os.path.join(ctx["workdir"], "eegdata")
+    preprocess_edf(_edf_path(ctx), "bench-view", output_dir)
+    return lambda: [read_view("bench-view", output_dir, t0, None, 1500) for t0 in (0.0, 60.0, 120.0)]
+
+
+# ---------------------------------------------------------------------------
+# Drone
+# ---------------------------------------------------------------------------
+
+@case("drone.predict_batch")
+def _drone_predict(ctx):
+    import numpy as np
+    from services.drone_service import predict_drone_batch
+    standins.install_drone()
+    rng = np.random.default_rng(0)
+    waveforms = [rng.standard_normal(16000).astype(np.float32) for _ in range(8)]
+    return lambda: predict_drone_batch(waveforms)
+
+
+# ---------------------------------------------------------------------------
+# SAR
+# ---------------------------------------------------------------------------
+
+def _safe_folder(ctx) -> str:
+    folder = os.path.join(ctx["workdir"], "S1C_IW_GRDH_1SDV_20250101T000000_20250101T000025_000000_000000_BENCH.SAFE")
+    if not os.path.exists(folder):
+        synthetic.write_safe_scene(folder, ctx["sar_size"])
+    return folder
+
+
+@case("sar.process_image")
+def _sar_image(ctx):
+    import matplotlib.pyplot as plt
+    from services.sar_service import process_sar_image
+    from services.sar_tiles import find_measurement
+    tiff = find_measurement(_safe_folder(ctx), "vv")
+
+    def run():
+        plt.close(process_sar_image(tiff))
+    return run
+
+
+@case("sar.process_scene")
+def _sar_scene(ctx):
+    from services.sar_products import process_scene
+    folder = _safe_folder(ctx)
+    output_dir = os.path.join(ctx["workdir"], "sar")
+
+    def run():
+        shutil.rmtree(output_dir, ignore_errors=True)  # stats are stored once per scene
+        process_scene(folder, output_dir)
+    return run
+
+
+@case("sar.render_tile")
+def _sar_tiles(ctx):
+    from services.sar_tiles import scene_info, render_tile
+    info = scene_info(_safe_folder(ctx), "vv")
+    # One tile per zoom level: every overview plus a native-resolution read
+    tiles = [(z, 0, 0) for z in range(info["max_zoom"] + 1)]
+    return lambda: [render_tile(info, z, x, y) for z, x, y in tiles]
+
+
+@case("sar.catalog_query")
+def _sar_catalog(ctx):
+    import numpy as np
+    from services import sar_catalog
+    root = os.path.join(ctx["workdir"], "archive")
+    if not os.path.exists(root):
+        rng = np.random.default_rng(0)
+        for i in range(ctx["catalog_scenes"]):
+            day = f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}"
+            folder = os.path.join(root, f"S1C_IW_GRDH_1SDV_{day.replace('-', '')}T000000_{i:06d}.SAFE")
+            synthetic.write_manifest(folder, rng.uniform(-60, 60), rng.uniform(-170, 170),
+                                     f"{day}T00:00:00", f"{day}T00:00:25", ["vv", "vh"])
+    sar_catalog.SAR_CATALOG_PATH = os.path.join(ctx["workdir"], "sar_catalog.sqlite")
+    sar_catalog.SAR_DATA_ROOT = root
+    sar_catalog.RESCAN_SECONDS = 0  # time the lookup, with no scans running alongside
+    sar_catalog.scan(root)
+    return lambda: sar_catalog.query((0, 0, 40, 40), "2025-03-01", "2025-09-30", "vh")
+
+
+# ---------------------------------------------------------------------------
+# Analysis / spectrogram
+# ---------------------------------------------------------------------------
+
+@case("analysis.recurrence")
+def _recurrence(ctx):
+    import numpy as np
+    from services.analysis_service import recurrence_matrix
+    rng = np.random.default_rng(0)
+    x, y = np.cumsum(rng.standard_normal((2, ctx["recurrence_points"])), axis=1)
+    return lambda: recurrence_matrix(x, y, 0.1, 512)
+
+
+@case("spectrogram.compute")
+def _spectrogram(ctx):
+    import numpy as np
+    from services import spectrogram_service
+    from services.signal_store import save_recording
+    output_dir = os.path.join(ctx["workdir"], "audio")
+    rng = np.random.default_rng(0)
+    save_recording(["audio"], rng.standard_normal((1, 16000 * 60)).astype(np.float32), 16000, "bench", output_dir)
+
+    def run():
+        spectrogram_service.frame_cache = spectrogram_service.FrameCache(spectrogram_service.FRAME_CACHE_MAX_BYTES)
+        spectrogram_service.compute_spectrogram("bench", output_dir, None, 0, 60, 1024, 512, n_mels=128)
+    return run
+
+
+def run_micro(ctx: Dict[str, Any], names: List[str], repeat: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for name in names:
+        try:
+            fn = CASES[name](ctx)
+        except ImportError as e:
+            # Optional stacks (rasterio, keras, torch...) may not be installed everywhere
+            print(f"⏭️  {name}: skipped ({e})")
+            results[name] = {"skipped": str(e)}
+            continue
+        results[name] = measure(fn, repeat)
+        print(f"⏱️  {name}: median {results[name]['median_s'] * 1000:.2f} ms, "
+              f"p95 {results[name]['p95_s'] * 1000:.2f} ms, peak {results[name]['peak_alloc_mb']:.1f} MB")
+    return results
@@ -0,0 +1,85 @@
+"""
+Numerical parity of optimized paths against the original implementations.
+From the Server directory:
+
+    python -m benchmarks.parity
+
+Exits 1 if any check is out of tolerance.
+"""
+import os
+import sys
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+# name -> check returning {"passed": bool, ...measurements}
+CHECKS: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def check(name: str):
+    def register(fn):
+        CHECKS[name] = fn
+        return fn
+    return register
+
+
+def _band_limited_ecg(rate: float, seconds: float = 10.0, seed: int = 0) -> np.ndarray:
+    """(n, 12) ECG-like traces with content below 40 Hz, as real ECG bandwidth"""
+    from scipy.signal import butter, sosfiltfilt
+
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    beats = np.sin(np.pi * 1.2 * t) ** 16 * 1000
+    noise = sosfiltfilt(butter(4, 40, fs=rate, output="sos"), rng.standard_normal((t.size, 12)), axis=0) * 20
+    return (beats[:, None] * rng.uniform(0.3, 1.0, 12) + noise).astype(np.float32)
+
+
+def _ecg_resampling(rate: float) -> Dict[str, Any]:
+    """
+    prepare_batch (polyphase) against the original FFT resample, without
+    z-scoring so gain errors show. The FFT treats the record as periodic, so
+    the edges are compared separately from the interior.
+    """
+    from scipy.signal import resample
+    from services.ecg_service import MODEL_LENGTH, prepare_batch
+
+    x = _band_limited_ecg(rate)
+    out = prepare_batch(x[None], rate, normalize=False)[0]
+    n_new = int(round(len(x) * 400 / rate))
+    reference = np.zeros_like(out)
+    reference[:n_new] = resample(x, n_new, axis=0)[:MODEL_LENGTH] * 0.01
+
+    scale = float(np.abs(reference).max())
+    diff = np.abs(out - reference)
+    edge = 50
+    result = {
+        "gain": float(np.abs(out).max()) / scale,
+        "interior_max_rel": float(diff[edge:n_new - edge].max()) / scale,
+        "rms_rel": float(np.sqrt((diff[:n_new] ** 2).mean() / (reference[:n_new] ** 2).mean())),
+    }
+    result["passed"] = (abs(result["gain"] - 1) < 0.01 and result["interior_max_rel"] < 0.005
+                        and result["rms_rel"] < 0.01)
+    return result
+
+
+for _rate in (250.0, 500.0, 1000.0):
+    check(f"ecg.resampling_{int(_rate)}hz")(lambda rate=_rate: _ecg_resampling(rate))
+
+
+def main() -> int:
+    failed = []
+    for name, fn in CHECKS.items():
+        result = fn()
+        details = ", ".join(f"{k} {v:.5f}" for k, v in result.items() if k != "passed")
+        print(f"{'✅' if result['passed'] else '❌'} {name}: {details}")
+        if not result["passed"]:
+            failed.append(name)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+Benchmark runner. From the Server directory:
+
+    python -m benchmarks.run                     # micro + HTTP, compare to baseline
+    python -m benchmarks.run --quick --suite micro
+    python -m benchmarks.run --save-baseline     # record the current numbers
+    python -m benchmarks.run --suite http --url http://localhost:8000
+
+Inputs are synthesized under a scratch directory and models are replaced by
+stand-ins, so runs are offline and reproducible. Exits 1 on regressions, or
+if there is no baseline to compare against.
+
+benchmarks/baseline.json is a reference run (full inputs; its "meta" records
+the machine). Timings only compare on similar hardware: on a new CI machine,
+record its own baseline with --save-baseline first. Cases skipped when the
+baseline was recorded (optional stacks not installed) are not gated; the
+run lists them.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+from benchmarks import standins, synthetic  # noqa: E402
+from benchmarks.load import SCENARIOS, run_http  # noqa: E402
+from benchmarks.micro import CASES, run_micro  # noqa: E402
+from services.metrics import peak_rss_bytes  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(SERVER_DIR, "benchmarks", "baseline.json")
+DEFAULT_OUTPUT = os.path.join(SERVER_DIR, "benchmarks", "results", "latest.json")
+
+SIZES = {
+    "full": {"doppler_seconds": 30, "ecg_batch": 64, "edf_seconds": 1800, "edf_channels": 23,
+             "sar_size": 8192, "recurrence_points": 10000, "catalog_scenes": 5000},
+    "quick": {"doppler_seconds": 5, "ecg_batch": 8, "edf_seconds": 120, "edf_channels": 23,
+              "sar_size": 2048, "recurrence_points": 2000, "catalog_scenes": 500},
+}
+
+# Which number of a result is compared, and whether higher is worse
+MICRO_METRIC = ("median_s", True)
+HTTP_METRICS = [("p50_s", True), ("p99_s", True), ("throughput_rps", False)]
+
+
+def prepare_app_workdir(ctx: Dict[str, Any]):
+    """
+    Lay out the scratch directory like the Server directory the app expects
+    (static/, ../client/public, the SAR scene and speed table at their
+    hard-coded relative paths) and install the stand-in models.
+    """
+    server = ctx["workdir"]
+    os.makedirs(os.path.join(server, "static"), exist_ok=True)
+    os.makedirs(os.path.join(server, "..", "client", "public"), exist_ok=True)
+
+    steps = {
+        "drone model": standins.install_drone,
+        "ecg model": standins.install_ecg,
+        "speed index": lambda: standins.install_speed_index(
+            os.path.join(server, __import__("services.doppler_service", fromlist=["MODEL_PATH"]).MODEL_PATH)),
+    }
+    for name, install in steps.items():
+        try:
+            install()
+        except ImportError as e:
+            print(f"⏭️  stand-in {name}: skipped ({e})")
+
+    try:
+        from services.eeg_service import preprocess_edf, EEG_DATA_DIR
+        edf = synthetic.write_edf(os.path.join(server, "http.edf"), 180, ctx["edf_channels"])
+        preprocess_edf(edf, "bench", EEG_DATA_DIR)
+        ctx["eeg_recording"] = "bench"
+    except ImportError as e:
+        print(f"⏭️  EEG recording: skipped ({e})")
+
+    try:
+        from services.sar_service import HARDCODED_SAR_FOLDER
+        synthetic.write_safe_scene(os.path.join(server, HARDCODED_SAR_FOLDER), ctx["sar_size"])
+        ctx["sar_scene"] = HARDCODED_SAR_FOLDER
+    except ImportError as e:
+        print(f"⏭️  SAR scene: skipped ({e})")
+
+
+def uncovered(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Cases run now that the baseline has no numbers for, so they can't regress"""
+    missing = []
+    for suite in ("micro", "http"):
+        for name, current in results.get(suite, {}).items():
+            previous = baseline.get(suite, {}).get(name)
+            if "skipped" not in current and (not previous or "skipped" in previous):
+                missing.append(f"{suite} {name}")
+    return missing
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Human-readable regressions of `results` against `baseline`"""
+    regressions = []
+    checks = [("micro", [MICRO_METRIC]), ("http", HTTP_METRICS)]
+    for suite, metrics in checks:
+        for name, current in results.get(suite, {}).items():
+            previous = baseline.get(suite, {}).get(name)
+            if not previous or "skipped" in current or "skipped" in previous:
+                continue
+            for metric, higher_is_worse in metrics:
+                old, new = previous.get(metric), current.get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old if higher_is_worse else (old - new) / old
+                if change > tolerance:
+                    regressions.append(f"{suite} {name} {metric}: {old:.4g} -> {new:.4g} ({change:+.0%} worse)")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the service hot paths and the HTTP API")
+    parser.add_argument("--suite", choices=["micro", "http", "all"], default="all")
+    parser.add_argument("--only", nargs="*", help="Case / scenario names to run (default: all)")
+    parser.add_argument("--quick", action="store_true", help="Small inputs, for a fast smoke run")
+    parser.add_argument("--repeat", type=int, default=None, help="Timed calls per micro-benchmark")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--workdir", help="Scratch directory (default: a temporary one, removed afterwards)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    size = "quick" if args.quick else "full"
+    repeat = args.repeat or (3 if args.quick else 10)
+    baseline_path, output_path = os.path.abspath(args.baseline), os.path.abspath(args.output)
+
+    scratch = args.workdir or tempfile.mkdtemp(prefix="signalvista-bench-")
+    workdir = os.path.join(os.path.abspath(scratch), "server")
+    os.makedirs(workdir, exist_ok=True)
+    ctx = {"workdir": workdir, **SIZES[size]}
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "size": size,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+    }
+    cwd = os.getcwd()
+    # Services use paths relative to the Server directory; run them in the scratch copy
+    os.chdir(workdir)
+    try:
+        if args.suite in ("micro", "all"):
+            names = [n for n in CASES if not args.only or n in args.only]
+            results["micro"] = run_micro(ctx, names, repeat)
+        if args.suite in ("http", "all"):
+            names = [n for n in SCENARIOS if not args.only or n in args.only]
+            if not args.url:
+                prepare_app_workdir(ctx)
+            results["http"] = run_http(ctx, names, args.requests, args.concurrency, args.url)
+    finally:
+        os.chdir(cwd)
+        if not args.workdir:
+            shutil.rmtree(scratch, ignore_errors=True)
+    results["meta"]["peak_rss_mb"] = peak_rss_bytes() / 1024 ** 2
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"📄 Results written to {output_path} (peak RSS {results['meta']['peak_rss_mb']:.0f} MB)")
+
+    if args.save_baseline:
+        with open(baseline_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📌 Baseline saved to {baseline_path}")
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print(f"❌ No baseline at {baseline_path} to compare against (record one with --save-baseline)")
+        return 1
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    meta = baseline.get("meta", {})
+    if meta.get("size") != size:
+        print(f"⚠️  Baseline was recorded with {meta.get('size')} inputs, this run used {size}")
+    if (meta.get("platform"), meta.get("cpus")) != (results["meta"]["platform"], results["meta"]["cpus"]):
+        print(f"⚠️  Baseline was recorded on {meta.get('platform')} with {meta.get('cpus')} CPUs; "
+              f"timings may not compare (re-record with --save-baseline on this machine)")
+    missing = uncovered(results, baseline)
+    if missing:
+        print(f"⚠️  Not in the baseline, not checked: {', '.join(missing)}")
+
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"❌ {line}")
+    if not regressions:
+        print("✅ No regressions against the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
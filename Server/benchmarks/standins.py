@@ -0,0 +1,77 @@
+"""
+Small local models with the same call interfaces as the real ones, so the
+model-dependent paths can be benchmarked without downloading anything.
+They measure everything around inference, not the networks themselves.
+"""
+import numpy as np
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+DRONE_LABELS = ["drone", "no_drone"]
+N_ECG_LABELS = 6
+
+
+class StandInDroneClassifier:
+    """Callable like a transformers audio-classification pipeline"""
+
+    def __init__(self, sampling_rate: int = 16000, n_fft: int = 400, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.feature_extractor = SimpleNamespace(sampling_rate=sampling_rate)
+        self.n_fft = n_fft
+        self.weights = rng.standard_normal((n_fft // 2 + 1, len(DRONE_LABELS))).astype(np.float32) * 0.01
+
+    def _scores(self, waveform: np.ndarray) -> np.ndarray:
+        frames = np.lib.stride_tricks.sliding_window_view(waveform, self.n_fft)[::self.n_fft // 2]
+        spectrum = np.log1p(np.abs(np.fft.rfft(frames, axis=-1))).mean(axis=0)
+        logits = spectrum @ self.weights
+        exp = np.exp(logits - logits.max())
+        return exp / exp.sum()
+
+    def __call__(self, inputs: List[Dict[str, Any]], batch_size: int = 1) -> List[List[Dict[str, Any]]]:
+        results = []
+        for item in inputs:
+            scores = self._scores(np.asarray(item["raw"], dtype=np.float32))
+            order = np.argsort(scores)[::-1]
+            results.append([{"label": DRONE_LABELS[i], "score": float(scores[i])} for i in order])
+        return results
+
+
+class StandInECGModel:
+    """predict() like the Keras model: (B, 4096, 12) -> (B, 6) probabilities"""
+
+    def __init__(self, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.conv = rng.standard_normal((12, 32)).astype(np.float32) * 0.1
+        self.dense = rng.standard_normal((32, N_ECG_LABELS)).astype(np.float32) * 0.1
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        hidden = np.maximum(np.asarray(batch, dtype=np.float32) @ self.conv, 0).mean(axis=1)
+        return 1.0 / (1.0 + np.exp(-(hidden @ self.dense)))
+
+
+def write_speed_table(path: str, vehicles=("Car", "Truck"), n_speeds: int = 1000, seed: int = 0) -> str:
+    """Speed-estimation HDF5 in the layout SpeedIndex reads"""
+    import h5py
+
+    rng = np.random.default_rng(seed)
+    with h5py.File(path, "w") as f:
+        for vehicle in vehicles:
+            gt = rng.uniform(5, 40, n_speeds)
+            f[f"{vehicle}_speeds_gt"] = gt
+            f[f"{vehicle}_speeds_est_all"] = gt[None, :] + rng.standard_normal((10, n_speeds))
+    return path
+
+
+def install_drone():
+    from services import drone_service
+    drone_service.classifier = StandInDroneClassifier()
+
+
+def install_ecg():
+    from services import ecg_service
+    ecg_service.ecg_model = StandInECGModel()
+
+
+def install_speed_index(path: str):
+    from services import doppler_service
+    doppler_service.speed_index = doppler_service.SpeedIndex(write_speed_table(path))
@@ -0,0 +1,132 @@
+"""Synthetic inputs for the benchmarks, generated locally from a seed."""
+import os
+import wave
+import numpy as np
+from typing import List, Optional
+
+EEG_LABELS = [
+    'FP1-F7', 'F7-T7', 'T7-FT9', 'FT9-TT9', 'TT9-T9', 'T9-P9', 'P9-O9',
+    'FP1-F3', 'F3-C3', 'C3-P3', 'P3-O1', 'FP2-F4', 'F4-C4', 'C4-P4',
+    'P4-O2', 'F8-T8', 'T8-FT10', 'FT10-TT10', 'FZ-CZ', 'CZ-PZ', 'ECG', 'VNS',
+]
+
+
+def _field(value, width: int) -> bytes:
+    return str(value).encode("latin-1")[:width].ljust(width)
+
+
+def write_edf(path: str, seconds: int = 600, n_channels: int = 23, sfreq: int = 256, seed: int = 0) -> str:
+    """
+    EDF file of `seconds` 1-s records: alpha/beta-like sines plus pink-ish
+    noise, int16 samples over +/-3200 uV. Labels follow the CHB-MIT montage.
+    """
+    rng = np.random.default_rng(seed)
+    labels = (EEG_LABELS + [f"CH{i}" for i in range(len(EEG_LABELS), n_channels)])[:n_channels]
+
+    header = b"".join([
+        _field(0, 8), _field("X X X X", 80), _field("Startdate X X X X", 80),
+        _field("01.01.25", 8), _field("00.00.00", 8), _field(256 * (n_channels + 1), 8),
+        _field("", 44), _field(seconds, 8), _field(1, 8), _field(n_channels, 4),
+    ])
+    columns = [
+        (labels, 16), (["AgAgCl electrode"] * n_channels, 80), (["uV"] * n_channels, 8),
+        ([-3200] * n_channels, 8), ([3200] * n_channels, 8),
+        ([-32768] * n_channels, 8), ([32767] * n_channels, 8),
+        (["HP:0.1Hz LP:100Hz"] * n_channels, 80), ([sfreq] * n_channels, 8), ([""] * n_channels, 32),
+    ]
+    header += b"".join(_field(v, width) for values, width in columns for v in values)
+
+    t = np.arange(sfreq) / sfreq
+    freqs = rng.uniform(4, 25, n_channels)[:, None]
+    with open(path, "wb") as f:
+        f.write(header)
+        for record in range(seconds):
+            phase = 2 * np.pi * freqs * (t + record)
+            noise = np.cumsum(rng.standard_normal((n_channels, sfreq)), axis=1) * 2
+            signal = 50 * np.sin(phase) + noise
+            digital = np.clip(signal / 3200 * 32767, -32768, 32767).astype("<i2")
+            f.write(digital.tobytes())
+    return path
+
+
+def random_ecg(n_records: int = 1, n_samples: int = 5000, seed: int = 0) -> np.ndarray:
+    """(n_records, n_samples, 12) float32 ECG-like traces in the model's raw units"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_samples) / 500.0
+    beats = np.sin(2 * np.pi * 1.2 * t) ** 63 * 1000  # narrow periodic peaks
+    lead_gain = rng.uniform(0.3, 1.0, (n_records, 1, 12))
+    noise = rng.standard_normal((n_records, n_samples, 12)) * 20
+    return (beats[None, :, None] * lead_gain + noise).astype(np.float32)
+
+
+def write_wav(path: str, seconds: float = 5.0, fs: int = 16000, seed: int = 0) -> str:
+    """Mono 16-bit WAV: a rotor-like harmonic stack with noise"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * fs)) / fs
+    f0 = rng.uniform(150, 250)
+    audio = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 8))
+    audio = audio / np.abs(audio).max() * 0.5 + rng.standard_normal(t.size) * 0.05
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(fs)
+        w.writeframes((np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes())
+    return path
+
+
+MANIFEST = """<?xml version="1.0" encoding="UTF-8"?>
+<xfdu:XFDU xmlns:xfdu="urn:ccsds:schema:xfdu:1" xmlns:safe="http://www.esa.int/safe/sentinel-1.0"
+  xmlns:gml="http://www.opengis.net/gml" xmlns:s1sarl1="http://www.esa.int/safe/sentinel-1.0/sentinel-1/sar/level-1">
+  <metadataSection><metadataObject ID="metadata"><metadataWrap><xmlData>
+    <safe:platform><safe:familyName>SENTINEL-1</safe:familyName><safe:number>C</safe:number></safe:platform>
+    <safe:acquisitionPeriod><safe:startTime>{start}</safe:startTime><safe:stopTime>{stop}</safe:stopTime></safe:acquisitionPeriod>
+    <s1sarl1:standAloneProductInformation><s1sarl1:productType>GRD</s1sarl1:productType>{pols}</s1sarl1:standAloneProductInformation>
+    <safe:frameSet><safe:frame><safe:footPrint><gml:coordinates>{coordinates}</gml:coordinates></safe:footPrint></safe:frame></safe:frameSet>
+  </xmlData></metadataWrap></metadataObject></metadataSection>
+</xfdu:XFDU>
+"""
+
+
+def write_manifest(folder: str, lat: float, lon: float, start: str, stop: str, polarisations: List[str]) -> str:
+    """manifest.safe with the fields the SAR catalog indexes: a 2x3 degree footprint, times, polarisations"""
+    os.makedirs(os.path.join(folder, "measurement"), exist_ok=True)
+    corners = [(lat, lon), (lat + 2, lon), (lat + 2, lon + 3), (lat, lon + 3)]
+    with open(os.path.join(folder, "manifest.safe"), "w") as f:
+        f.write(MANIFEST.format(
+            start=start, stop=stop,
+            pols="".join(f"<s1sarl1:transmitterReceiverPolarisation>{p.upper()}</s1sarl1:transmitterReceiverPolarisation>"
+                         for p in polarisations),
+            coordinates=" ".join(f"{a:.6f},{b:.6f}" for a, b in corners),
+        ))
+    return folder
+
+
+def write_safe_scene(folder: str, size: int = 4096, polarisations: Optional[List[str]] = None, seed: int = 0) -> str:
+    """
+    Minimal Sentinel-1 GRD SAFE folder: a manifest and one uint16 GeoTIFF
+    per polarisation under measurement/, with speckle-like intensities.
+    """
+    import rasterio
+    from rasterio.transform import from_origin
+
+    rng = np.random.default_rng(seed)
+    name = os.path.basename(os.path.normpath(folder)).replace(".SAFE", "").lower()
+    polarisations = polarisations or ["vv", "vh"]
+    write_manifest(folder, 30.0, 31.0, "2025-01-01T00:00:00.000000", "2025-01-01T00:00:25.000000", polarisations)
+
+    for pol in polarisations:
+        path = os.path.join(folder, "measurement", f"s1c-iw-grd-{pol}-{name}-001.tiff")
+        profile = {
+            "driver": "GTiff", "width": size, "height": size, "count": 1, "dtype": "uint16",
+            "tiled": True, "blockxsize": 256, "blockysize": 256,
+            "transform": from_origin(0, size * 10, 10, 10),
+        }
+        with rasterio.open(path, "w", **profile) as dst:
+            for row in range(0, size, 256):
+                height = min(256, size - row)
+                # Exponential speckle over a smooth backscatter field
+                field = 200 + 150 * np.sin(np.arange(size) / 300.0)[None, :]
+                block = rng.exponential(1.0, (height, size)) * field
+                dst.write(np.clip(block, 0, 65535).astype(np.uint16), 1,
+                          window=rasterio.windows.Window(0, row, size, height))
+    return folder
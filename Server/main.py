@@ -1,14 +1,14 @@
-from fastapi import FastAPI
+import importlib
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from routers import drone, doppler, eeg, ecg, sar  # Assuming your other routers exist
-from services.drone_service import load_drone_model  # Your drone loader
-    
-# Note: ECG model loaded on-demand in endpoint, so no import/load here
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
+from services.config import ENABLED_DOMAINS
+from services import metrics, warmup
 
-app = FastAPI(
-    max_request_body_size=2 * 1024 * 1024 * 1024  # 2 GB limit for large EDF files
-)
+# EDF uploads are processed block by block, so no oversized body limit is needed
+app = FastAPI()
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,24 +16,94 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Metadata for binary responses travels in headers
+    expose_headers=["X-Channels", "X-Sampling-Rate", "X-Shape", "X-Start-Sample", "X-Bin-Size",
+                    "X-Plot-Points", "X-Plot-Bytes", "X-Doppler-Stats", "X-Recurrence-Rate", "X-Threshold",
+                    "X-Hop-Length", "X-Max-Frequency", "X-Recording-Id", "X-Profile-File"],
 )
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    """Latency, payload sizes and RSS growth per route; cProfile on X-Profile: 1"""
+    profiler = None
+    if metrics.PROFILING_ENABLED and request.headers.get("X-Profile") == "1":
+        profiler = metrics.start_profile()
+
+    rss_before = metrics.current_rss_bytes()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        # Route template, not the raw path, so ids don't explode the label set
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        labels = {"method": request.method, "route": route}
+        metrics.observe("http_request_duration_seconds", elapsed, help="Request latency (until response headers)",
+                        status=str(status), **labels)
+        request_size = request.headers.get("content-length")
+        if request_size is not None:
+            metrics.observe("http_request_size_bytes", int(request_size), metrics.SIZE_BUCKETS,
+                            help="Request body size", **labels)
+        # Per-request change, not the lifetime peak; concurrent requests share the process
+        rss_growth = max(0, metrics.current_rss_bytes() - rss_before)
+        metrics.observe("http_request_rss_growth_bytes", rss_growth, metrics.SIZE_BUCKETS,
+                        help="Resident memory gained by the process during the request", **labels)
+        if profiler is not None:
+            profile_path = metrics.save_profile(profiler, route)
+
+    response_size = response.headers.get("content-length")
+    if response_size is not None:
+        metrics.observe("http_response_size_bytes", int(response_size), metrics.SIZE_BUCKETS,
+                        help="Response body size", **labels)
+    if profiler is not None:
+        response.headers["X-Profile-File"] = profile_path
+    return response
+
 app.mount("/public", StaticFiles(directory="../client/public"), name="client_public")
 # Serve static files (images)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 # Enable CORS (frontend can call APIs)
-# Routers
-app.include_router(drone.router, prefix="/api", tags=["Drone Detection"])
-app.include_router(doppler.router, prefix="/api", tags=["Doppler Simulation"])
-app.include_router(eeg.router, prefix="/api", tags=["EEG Conversion"])
-app.include_router(ecg.router, prefix="/api", tags=["ECG Diagnosis"])
-app.include_router(sar.router, prefix="/api", tags=["Sentinel-1 GRD"])
+# Routers (only the enabled domains; their heavy services import on first use)
+ROUTER_TAGS = {
+    "drone": "Drone Detection",
+    "doppler": "Doppler Simulation",
+    "eeg": "EEG Conversion",
+    "ecg": "ECG Diagnosis",
+    "sar": "Sentinel-1 GRD",
+    "analysis": "Signal Analysis",
+    "spectrogram": "Spectrogram",
+}
+for domain in ENABLED_DOMAINS:
+    module = importlib.import_module(f"routers.{domain}")
+    app.include_router(module.router, prefix="/api", tags=[ROUTER_TAGS[domain]])
 
 @app.on_event("startup")
 def startup_event():
-    print("Loading models on startup...")
-    load_drone_model()  # Load HuggingFace drone classifier
-    # ECG loaded on-demand in endpoint
-    print("Startup complete (ECG loads per request)")
+    # Drone classifier, ECG model and Doppler speed index load in the
+    # background; /ready reports when they are in
+    print(f"Enabled domains: {', '.join(ENABLED_DOMAINS)}")
+    warmup.start(ENABLED_DOMAINS)
+    if "sar" in ENABLED_DOMAINS:
+        from services import sar_catalog
+        sar_catalog.start_background_scans()
+    print("Startup complete, models warming up")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus text format; counts are per worker process"""
+    return metrics.render()
+
+@app.get("/health")
+def health():
+    """Liveness: the process is up and serving"""
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    """Readiness: every enabled model has finished loading"""
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
 
 @app.get("/")
 def root():
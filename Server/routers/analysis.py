@@ -0,0 +1,75 @@
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import Optional
+import asyncio
+import math
+from services.analysis_service import recurrence_matrix, recurrence_image, xor_analysis
+from services.png import encode_png_gray
+from services.signal_store import read_window
+from services.config import DATA_DIRS
+
+router = APIRouter(prefix="/analysis", tags=["Signal Analysis"])
+
+def _read_pair(kind: str, recording_id: str, channel_a: str, channel_b: str, t0: float, t1: Optional[float]):
+    if kind not in DATA_DIRS:
+        raise HTTPException(status_code=404, detail=f"Unknown recording kind: {kind}")
+    try:
+        header, _, start, window = read_window(recording_id, DATA_DIRS[kind], t0, t1, [channel_a, channel_b])
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return header, start, window
+
+@router.get("/{kind}/{recording_id}/recurrence")
+async def recurrence_endpoint(
+    kind: str,
+    recording_id: str,
+    channel_a: str = Query(..., description="Channel on the x axis of the trajectory"),
+    channel_b: str = Query(..., description="Channel on the y axis of the trajectory"),
+    t0: float = Query(0.0, ge=0, description="Window start (s)"),
+    t1: Optional[float] = Query(None, description="Window end (s), exclusive"),
+    threshold: float = Query(0.1, gt=0, description="Recurrence radius in standard deviations"),
+    resolution: int = Query(512, gt=0, le=2048, description="Output image size in pixels"),
+    max_points: int = Query(10000, gt=0, le=100000, description="Decimate the window to at most this many points"),
+    binary: bool = Query(False, description="Black/white plot instead of recurrence-rate shading"),
+):
+    """
+    Recurrence plot of (channel_a, channel_b) over [t0, t1) as a grayscale PNG.
+    Cost is quadratic in the number of points, hence max_points.
+    """
+    header, _, window = _read_pair(kind, recording_id, channel_a, channel_b, t0, t1)
+    step = max(1, math.ceil(window.shape[1] / max_points))
+
+    def render():
+        rates, overall = recurrence_matrix(window[0, ::step], window[1, ::step], threshold, resolution)
+        return encode_png_gray(recurrence_image(rates, binary)), overall
+
+    try:
+        png, overall = await asyncio.to_thread(render)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return Response(
+        content=png,
+        media_type="image/png",
+        headers={
+            "X-Recurrence-Rate": f"{overall:.6f}",
+            "X-Threshold": str(threshold),
+            "X-Sampling-Rate": str(header["samplingRate"] / step),
+        },
+    )
+
+@router.get("/{kind}/{recording_id}/xor")
+async def xor_endpoint(
+    kind: str,
+    recording_id: str,
+    channel_a: str = Query(..., description="First channel"),
+    channel_b: str = Query(..., description="Second channel"),
+    t0: float = Query(0.0, ge=0, description="Window start (s)"),
+    t1: Optional[float] = Query(None, description="Window end (s), exclusive"),
+    threshold: float = Query(..., ge=0, description="Absolute difference counted as a mismatch"),
+):
+    """Segments of [t0, t1) where the two channels differ by more than threshold"""
+    header, start, window = _read_pair(kind, recording_id, channel_a, channel_b, t0, t1)
+    result = await asyncio.to_thread(xor_analysis, window[0], window[1], threshold, header["samplingRate"], start)
+    return {"recording_id": recording_id, "channels": [channel_a, channel_b], **result}
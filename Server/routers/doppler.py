@@ -1,35 +1,44 @@
-from fastapi import APIRouter, Query
-from fastapi.responses import StreamingResponse, JSONResponse
-from services.doppler_service import simulate_doppler, get_first_predicted_speed
+from fastapi import APIRouter, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from services.lazy import lazy_import
 from fastapi import UploadFile, File, HTTPException
-import shutil
-import os
+import json
+
+# scipy and h5py are only imported when a Doppler route is first used
+doppler_service = lazy_import("services.doppler_service")
+
 router = APIRouter()
 
+def _stats(result):
+    return {
+        "max_observed": result["max_frequency"],
+        "min_observed": result["min_frequency"],
+        "shift_ratio": result["shift_ratio"]
+    }
+
 
 @router.get("/doppler")
 async def doppler(
     frequency: float = Query(..., description="Source frequency (Hz)"),
     velocity: float = Query(..., description="Source velocity (m/s)"),
-    duration: float = Query(..., description="Duration (s)")
+    duration: float = Query(..., description="Duration (s)"),
+    max_points: int = Query(5000, ge=0, description="Max plot points (0 = full rate)")
 ):
     """
     Simulate Doppler effect siren.
-    Returns: audio (WAV) + JSON with time, amplitude, frequency.
+    Returns: JSON with time, amplitude, frequency (decimated to max_points).
     """
     try:
-        result = simulate_doppler(frequency, velocity, duration)
+        result = doppler_service.simulate_doppler(frequency, velocity, duration)
+        time, amplitude, frequency_obs = doppler_service.decimate_plot(result, max_points)
 
-        # Return both JSON (plot data) and WAV stream
         return {
-                "time": result["time"],
-                "amplitude": result["amplitude"],
-                "frequency": result["frequency"],
-                "stats":{
-                    "max_observed": result["max_frequency"],
-                    "min_observed": result["min_frequency"],
-                    "shift_ratio": result["shift_ratio"]
-                }
+                "time": time.tolist(),
+                "amplitude": amplitude.tolist(),
+                "frequency": frequency_obs.tolist(),
+                "stats": _stats(result)
             }
 
     except Exception as e:
@@ -41,15 +50,85 @@ async def doppler_audio(
     velocity: float = Query(...),
     duration: float = Query(...),
 ):
-    """Stream Doppler audio only (WAV)"""
-    result = simulate_doppler(frequency, velocity, duration)
-    return StreamingResponse(result["audio"], media_type="audio/wav")
+    """Doppler audio only (WAV)"""
+    result = doppler_service.simulate_doppler(frequency, velocity, duration)
+    return Response(content=result["wav"], media_type="audio/wav")
+
+@router.get("/doppler/combined")
+async def doppler_combined(
+    frequency: float = Query(..., description="Source frequency (Hz)"),
+    velocity: float = Query(..., description="Source velocity (m/s)"),
+    duration: float = Query(..., description="Duration (s)"),
+    max_points: int = Query(5000, ge=0, description="Max plot points (0 = full rate)")
+):
+    """
+    Plot data and audio from a single simulation, in one binary body:
+    little-endian float32 [time | amplitude | frequency] (X-Plot-Points each,
+    X-Plot-Bytes in total) followed by the WAV file. Stats are in X-Doppler-Stats.
+    """
+    try:
+        result = doppler_service.simulate_doppler(frequency, velocity, duration)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
 
+    time, amplitude, frequency_obs = doppler_service.decimate_plot(result, max_points)
+    plot = doppler_service.pack_plot(time, amplitude, frequency_obs)
+    return Response(
+        content=plot + result["wav"],
+        media_type="application/octet-stream",
+        headers={
+            "X-Plot-Points": str(len(time)),
+            "X-Plot-Bytes": str(len(plot)),
+            "X-Doppler-Stats": json.dumps(_stats(result)),
+        },
+    )
 
 
 
-UPLOAD_DIR = "uploads"  # directory to temporarily save uploaded audio files
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+class DopplerSource(BaseModel):
+    frequency: float = Field(..., gt=0, description="Source frequency (Hz)")
+    velocity: float = Field(..., description="Source velocity (m/s)")
+    distance: float = Field(5.0, gt=0, description="Closest approach distance (m)")
+    t0: Optional[float] = Field(None, description="Time of closest approach (s), default duration / 2")
+
+class DopplerScene(BaseModel):
+    sources: List[DopplerSource] = Field(..., min_length=1)
+    duration: float = Field(..., gt=0, le=3600, description="Duration (s)")
+    fs: int = Field(8000, ge=1000, le=192000, description="Sample rate (Hz)")
+    format: str = Field("wav", pattern="^(wav|pcm)$", description="wav, or raw int16 stereo pcm")
+
+def _scene_response(sources, duration: float, fs: int, format: str):
+    payload = [
+        {k: v for k, v in source.items() if v is not None} for source in sources
+    ]
+    media_type = "audio/wav" if format == "wav" else "application/octet-stream"
+    return StreamingResponse(
+        doppler_service.stream_doppler(payload, duration, fs, wav=format == "wav"),
+        media_type=media_type,
+        headers={"X-Sample-Rate": str(fs), "X-Audio-Channels": "2"},
+    )
+
+@router.get("/doppler/stream")
+async def doppler_stream(
+    frequency: float = Query(..., gt=0, description="Source frequency (Hz)"),
+    velocity: float = Query(..., description="Source velocity (m/s)"),
+    duration: float = Query(..., gt=0, le=3600, description="Duration (s)"),
+    fs: int = Query(8000, ge=1000, le=192000, description="Sample rate (Hz)"),
+    format: str = Query("wav", pattern="^(wav|pcm)$", description="wav, or raw int16 stereo pcm"),
+):
+    """
+    Stream a single-source Doppler siren chunk by chunk. Audio starts
+    immediately and memory stays constant whatever the duration.
+    Levels are normalized analytically rather than to the waveform's peak,
+    so samples differ slightly (about 1% of full scale) from /api/doppler.
+    """
+    return _scene_response([{"frequency": frequency, "velocity": velocity}], duration, fs, format)
+
+@router.post("/doppler/stream")
+async def doppler_scene_stream(scene: DopplerScene):
+    """Stream a drive-by scene with several sources and trajectories"""
+    return _scene_response([s.model_dump() for s in scene.sources], scene.duration, scene.fs, scene.format)
+
 
 @router.post("/dopplerAnalyze")
 async def doppler_analyze(file: UploadFile = File(...)):
@@ -58,18 +137,25 @@ async def doppler_analyze(file: UploadFile = File(...)):
     and get the first predicted speed from the hardcoded model.
     """
     try:
-        # 1️⃣ Save the uploaded file temporarily
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # 2️⃣ Process the file
-        result = get_first_predicted_speed(file_path)
-
-        # 3️⃣ Optionally, clean up the uploaded file
-        os.remove(file_path)
+        # Only the file name is needed; nothing is written to a shared directory
+        result = doppler_service.get_first_predicted_speed(file.filename)
 
         return {"predictedVelocity": result, "predictedFrequency": 440}  # Placeholder frequency
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/dopplerAnalyze/batch")
+async def doppler_analyze_batch(files: List[UploadFile] = File(...)):
+    """Resolve the predicted speed of many uploaded clips at once"""
+    results = []
+    for file in files:
+        try:
+            results.append({
+                "filename": file.filename,
+                "predictedVelocity": doppler_service.get_first_predicted_speed(file.filename),
+                "predictedFrequency": 440  # Placeholder frequency
+            })
+        except Exception as e:
+            results.append({"filename": file.filename, "error": str(e)})
+    return {"results": results}
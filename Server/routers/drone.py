@@ -1,28 +1,118 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from services.drone_service import predict_drone
+import asyncio
 import os
+import shutil
+import tempfile
+from typing import List
+import numpy as np
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, WebSocket, WebSocketDisconnect
+from services.lazy import lazy_import
+
+# torch and transformers are only imported when a drone route is first used
+drone_service = lazy_import("services.drone_service")
 
 router = APIRouter()
 
+async def _classify_upload(audio: UploadFile):
+    # Decode in memory (ffmpeg runs in a thread), no shared temp file
+    waveform = await asyncio.to_thread(drone_service.decode_audio, await audio.read())
+    return await drone_service.predict_drone_async(waveform)
+
 @router.post("/predictDrone")
 async def predict_drone_endpoint(audio: UploadFile = File(...)):
     """Endpoint for drone audio detection"""
-    temp_path = "temp_audio.wav"
+    try:
+        return await _classify_upload(audio)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
+@router.post("/predictDrone/batch")
+async def predict_drone_batch_endpoint(files: List[UploadFile] = File(...)):
+    """Classify several audio files in one request"""
     try:
-        # Save uploaded file temporarily
-        with open(temp_path, "wb") as f:
-            f.write(await audio.read())
+        results = await asyncio.gather(*(_classify_upload(f) for f in files))
+        return {
+            "results": [
+                {"filename": f.filename, **result} for f, result in zip(files, results)
+            ],
+            "status": "success"
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
-        # Run prediction
-        result = predict_drone(temp_path)
+@router.post("/predictDrone/stream")
+async def predict_drone_stream_endpoint(
+    audio: UploadFile = File(...),
+    window: float = Query(1.0, gt=0, description="Window length (s)"),
+    hop: float = Query(0.5, gt=0, description="Hop between windows (s), at most the window length"),
+):
+    """Classify a long recording window by window and return the detection timeline"""
+    # Spool to a per-request file so ffmpeg can read it incrementally; the
+    # copy runs in a thread so a large upload doesn't stall the event loop
+    suffix = os.path.splitext(audio.filename or "")[1]
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        await asyncio.to_thread(shutil.copyfileobj, audio.file, temp_file)
+        temp_path = temp_file.name
 
-        return result
+    try:
+        timeline = await asyncio.to_thread(drone_service.detect_drone_timeline, temp_path, window, hop)
+        return {
+            "window": window,
+            "hop": hop,
+            "timeline": timeline,
+            "status": "success"
+        }
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
     finally:
-        # Clean up temp file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        os.unlink(temp_path)
+
+@router.websocket("/ws/predictDrone")
+async def predict_drone_ws(
+    websocket: WebSocket,
+    sample_rate: int = 16000,
+    dtype: str = "float32",
+    window: float = 1.0,
+    hop: float = 0.5,
+):
+    """
+    Live detection: the client sends little-endian mono PCM frames
+    (float32 or int16) and gets one JSON message back per completed window.
+    """
+    await websocket.accept()
+    # Checked in samples: a tiny hop or window can round down to zero
+    window_size, hop_size = int(window * sample_rate), int(hop * sample_rate)
+    if dtype not in ("float32", "int16") or sample_rate <= 0 or not 0 < hop_size <= window_size:
+        await websocket.close(code=1003, reason="Unsupported stream parameters")
+        return
+
+    windows = drone_service.SlidingWindows(window_size, hop_size)
+    try:
+        while True:
+            frame = await websocket.receive_bytes()
+            if dtype == "int16":
+                frame = frame[:len(frame) - len(frame) % 2]
+                samples = np.frombuffer(frame, dtype="<i2").astype(np.float32) / 32768.0
+            else:
+                frame = frame[:len(frame) - len(frame) % 4]
+                samples = np.frombuffer(frame, dtype="<f4")
+
+            for start, chunk in windows.push(samples):
+                waveform = drone_service.to_model_rate(chunk, sample_rate)
+                result = await drone_service.predict_drone_async(waveform)
+                await websocket.send_json({
+                    "start": round(start / sample_rate, 3),
+                    "end": round((start + window_size) / sample_rate, 3),
+                    "classification": result["classification"],
+                    "confidence": result["confidence"],
+                })
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        await websocket.close(code=1011, reason=f"Prediction failed: {str(e)}"[:120])
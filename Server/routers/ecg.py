@@ -1,21 +1,47 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response, Request, Header, UploadFile, File
 from pydantic import BaseModel
-from typing import List, Dict, Any
-from services.ecg_service import predict_ecg
+from typing import List, Dict, Any, Optional
+from services.ecg_ingest import decode_raw, decode_npy, decode_wfdb, EXPECTED_SAMPLING_RATE
+from services.config import ECG_DATA_DIR
+from services.lazy import lazy_import
+from services.signal_store import read_view
+
+# Keras is only imported when a prediction route is first used
+ecg_service = lazy_import("services.ecg_service")
 
 router = APIRouter()
 
 # Define the request model
 class PredictRequest(BaseModel):
     signals: List[List[float]]
+    samplingRate: float = EXPECTED_SAMPLING_RATE
+
+class ECGRecord(BaseModel):
+    signals: List[List[float]]
+    leads: List[str]
+    samplingRate: float
 
 @router.post("/predict", response_model=Dict[str, Any])
 async def predict_ecg_route(request: PredictRequest):
     try:
-        # Pass signals directly to the prediction function
-        results = predict_ecg(request.signals)
+        # Concurrent requests share one model.predict call
+        results = await ecg_service.predict_ecg_batched(request.signals, sampling_rate=request.samplingRate)
+        return {
+            "status": "success",
+            "data": results
+        }
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        print(f"Prediction error: {e}")
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+async def _predict_batch(batch, sampling_rate: float):
+    try:
+        results = await ecg_service.predict_ecg_records(batch, sampling_rate)
         return {
             "status": "success",
+            "count": len(results),
             "data": results
         }
     except ValueError as ve:
@@ -23,3 +49,85 @@ async def predict_ecg_route(request: PredictRequest):
     except Exception as e:
         print(f"Prediction error: {e}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+@router.post("/predict/binary", response_model=Dict[str, Any])
+async def predict_ecg_binary_route(
+    request: Request,
+    x_shape: str = Header(..., description="'n_samples,12' or 'n_records,n_samples,12'"),
+    x_dtype: str = Header("float32", description="float32 or int16, little-endian"),
+    x_sampling_rate: float = Header(EXPECTED_SAMPLING_RATE),
+    x_scale: float = Header(1.0, description="Multiplier applied to the samples (e.g. int16 ADC gain)"),
+):
+    """
+    Raw little-endian sample body (application/octet-stream), decoded
+    zero-copy. A 3-D shape sends several records in one body.
+    """
+    try:
+        batch = decode_raw(await request.body(), x_dtype, x_shape, x_scale)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    return await _predict_batch(batch, x_sampling_rate)
+
+@router.post("/predict/file", response_model=Dict[str, Any])
+async def predict_ecg_file_route(
+    files: List[UploadFile] = File(..., description="One .npy file, or a WFDB .hea + .dat pair"),
+    sampling_rate: float = Query(EXPECTED_SAMPLING_RATE, description="Sampling rate of .npy data"),
+):
+    """Predict from a .npy array (one or many records) or a WFDB record"""
+    by_ext = {f.filename.rsplit(".", 1)[-1].lower(): f for f in files}
+    try:
+        if "npy" in by_ext:
+            batch = decode_npy(await by_ext["npy"].read())
+        elif "hea" in by_ext and "dat" in by_ext:
+            header_text = (await by_ext["hea"].read()).decode("latin-1")
+            batch, sampling_rate = decode_wfdb(header_text, await by_ext["dat"].read())
+        else:
+            raise ValueError("Upload a .npy file or a WFDB .hea + .dat pair")
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    return await _predict_batch(batch, sampling_rate)
+
+@router.post("/ecg/records", response_model=Dict[str, Any])
+async def store_ecg_record_route(record: ECGRecord):
+    """Store an ECG once and build its min/max pyramid for zoomable plotting"""
+    try:
+        record_id = ecg_service.save_ecg_record(record.signals, record.leads, record.samplingRate)
+        return {
+            "status": "success",
+            "record_id": record_id,
+            "view_url": f"http://localhost:8000/api/ecg/{record_id}/view"
+        }
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+
+@router.get("/ecg/{record_id}/view")
+async def ecg_view_route(
+    record_id: str,
+    t0: float = Query(0.0, ge=0, description="View start (s)"),
+    t1: Optional[float] = Query(None, description="View end (s), exclusive"),
+    pixels: int = Query(1000, gt=0, le=20000, description="Horizontal resolution of the plot"),
+    leads: Optional[str] = Query(None, description="Comma-separated lead names"),
+):
+    """
+    Serve a min/max envelope of [t0, t1) with at most `pixels` bins per lead,
+    as little-endian float32 bytes laid out [min, max] x leads x bins.
+    """
+    lead_list = [ld.strip() for ld in leads.split(",") if ld.strip()] if leads else None
+    try:
+        header, selected, start, bin_size, envelope = read_view(record_id, ECG_DATA_DIR, t0, t1, pixels, lead_list)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return Response(
+        content=envelope.tobytes(),
+        media_type="application/octet-stream",
+        headers={
+            "X-Channels": ",".join(selected),
+            "X-Sampling-Rate": str(header["samplingRate"]),
+            "X-Shape": ",".join(str(n) for n in envelope.shape),
+            "X-Start-Sample": str(start),
+            "X-Bin-Size": str(bin_size),
+        },
+    )
@@ -1,42 +1,198 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from pathlib import Path
-import tempfile
-import shutil
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query, Request, Response
+from typing import List, Optional
+import asyncio
 import os
-from services.eeg_service import preprocess_edf, save_preprocessed_to_json
+import shutil
+import tempfile
+from services.config import EEG_DATA_DIR
+from services.edf_reader import ChunkQueueReader
+from services.result_cache import HashingReader
+from services.signal_store import read_window, read_view
+from services.lazy import lazy_import
+
+# scipy and the job pool are only loaded when preprocessing is first used
+eeg_service = lazy_import("services.eeg_service")
+eeg_jobs = lazy_import("services.eeg_jobs")
 
 router = APIRouter(prefix="/eeg", tags=["EEG Preprocessing"])
 
+def _parse_channels(channels: Optional[str]):
+    return [ch.strip() for ch in channels.split(",") if ch.strip()] if channels else None
+
+def _preprocess_response(channels, filename: str, recording_id: str, header_path: str):
+    # Local access URL (adjust host/port if needed)
+    access_url = f"http://localhost:8000/{header_path}"
+
+    return {
+        "channels": channels,  # Should be 18
+        "filename": filename,
+        "recording_id": recording_id,
+        "access_url": access_url,
+        "window_url": f"http://localhost:8000/api/eeg/{recording_id}/window",
+        "message": f"Preprocessed data saved. Access at {access_url}"
+    }
+
 @router.post("/preprocess-edf")
 async def preprocess_eeg_endpoint(file: UploadFile = File(..., description="EDF file to preprocess")):
     """
-    Upload EDF, preprocess, save JSON, return channels and access URL.
+    Upload EDF, preprocess, save binary data + JSON header, return channels and access URLs.
     """
     if not file.filename.endswith('.edf'):
         raise HTTPException(status_code=400, detail="File must be .edf")
-    
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.edf') as temp_file:
-        shutil.copyfileobj(file.file, temp_file)
-        temp_path = temp_file.name
-    
-    try:
-        # Preprocess
-        channels, data, sfreq = preprocess_edf(temp_path)
-        
-        # Save JSON
-        json_path = save_preprocessed_to_json(channels, data, sfreq, Path(file.filename).stem)
-        
-        # Local access URL (adjust host/port if needed)
-        access_url = f"http://localhost:8000/{json_path}"
-        
-        return {
-            "channels": channels,  # Should be 18
-            "access_url": access_url,
-            "message": f"Preprocessed data saved. Access at {access_url}"
-            
-        }
-    
+
+    try:
+        # Read the spooled upload directly, block by block, off the event loop.
+        # Recordings are keyed by content hash, so re-uploads are a cache lookup.
+        channels, _, header_path, recording_id = await asyncio.to_thread(eeg_service.preprocess_edf_cached, file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return _preprocess_response(channels, file.filename, recording_id, header_path)
+
+def _preprocess_from_reader(reader: ChunkQueueReader):
+    try:
+        return eeg_service.preprocess_edf_stream_cached(reader)
+    finally:
+        # Unblock the uploader if preprocessing stopped before the body ended
+        reader.discard()
+
+@router.post("/preprocess-edf/stream")
+async def preprocess_eeg_stream_endpoint(
+    request: Request,
+    filename: str = Query(..., description="Original .edf file name"),
+):
+    """
+    Raw EDF request body (application/octet-stream), preprocessed while it is
+    still being uploaded. Nothing is buffered beyond a few blocks.
+    """
+    if not filename.endswith('.edf'):
+        raise HTTPException(status_code=400, detail="File must be .edf")
+
+    reader = ChunkQueueReader()
+    job = asyncio.ensure_future(asyncio.to_thread(_preprocess_from_reader, reader))
+    try:
+        async for chunk in request.stream():
+            if job.done():
+                break
+            # Bounded queue: waits here if preprocessing falls behind the upload
+            await asyncio.to_thread(reader.feed, chunk)
     finally:
-        # Cleanup temp file
-        os.unlink(temp_path)
\ No newline at end of file
+        await asyncio.to_thread(reader.close)
+
+    try:
+        channels, _, header_path, recording_id = await job
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return _preprocess_response(channels, filename, recording_id, header_path)
+
+@router.get("/{recording_id}/window")
+async def eeg_window_endpoint(
+    recording_id: str,
+    t0: float = Query(0.0, ge=0, description="Window start (s)"),
+    t1: Optional[float] = Query(None, description="Window end (s), exclusive"),
+    channels: Optional[str] = Query(None, description="Comma-separated channel names"),
+):
+    """
+    Serve a [t0, t1) time window as raw little-endian float32 bytes,
+    laid out channels x samples.
+    """
+    try:
+        header, selected, start, window = read_window(recording_id, EEG_DATA_DIR, t0, t1, _parse_channels(channels))
+        eeg_service.eeg_cache.touch(recording_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return Response(
+        content=window.tobytes(),
+        media_type="application/octet-stream",
+        headers={
+            "X-Channels": ",".join(selected),
+            "X-Sampling-Rate": str(header["samplingRate"]),
+            "X-Shape": f"{window.shape[0]},{window.shape[1]}",
+            "X-Start-Sample": str(start),
+        },
+    )
+
+@router.get("/{recording_id}/view")
+async def eeg_view_endpoint(
+    recording_id: str,
+    t0: float = Query(0.0, ge=0, description="View start (s)"),
+    t1: Optional[float] = Query(None, description="View end (s), exclusive"),
+    pixels: int = Query(1000, gt=0, le=20000, description="Horizontal resolution of the plot"),
+    channels: Optional[str] = Query(None, description="Comma-separated channel names"),
+):
+    """
+    Serve a min/max envelope of [t0, t1) with at most `pixels` bins per channel,
+    as little-endian float32 bytes laid out [min, max] x channels x bins.
+    """
+    try:
+        header, selected, start, bin_size, envelope = read_view(
+            recording_id, EEG_DATA_DIR, t0, t1, pixels, _parse_channels(channels)
+        )
+        eeg_service.eeg_cache.touch(recording_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return Response(
+        content=envelope.tobytes(),
+        media_type="application/octet-stream",
+        headers={
+            "X-Channels": ",".join(selected),
+            "X-Sampling-Rate": str(header["samplingRate"]),
+            "X-Shape": ",".join(str(n) for n in envelope.shape),
+            "X-Start-Sample": str(start),
+            "X-Bin-Size": str(bin_size),
+        },
+    )
+
+@router.post("/jobs")
+async def submit_eeg_jobs(files: List[UploadFile] = File(..., description="EDF files to preprocess")):
+    """
+    Queue one or many EDF files for background preprocessing in a process pool.
+    Returns one job per file; poll /eeg/jobs/{job_id} for progress.
+    """
+    bad = [f.filename for f in files if not f.filename.endswith('.edf')]
+    if bad:
+        raise HTTPException(status_code=400, detail=f"Files must be .edf: {', '.join(bad)}")
+
+    jobs = []
+    for file in files:
+        # Workers run in other processes, so they need the upload on disk;
+        # hash it on the way for the content-addressed recording id
+        reader = HashingReader(file.file)
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.edf') as temp_file:
+            await asyncio.to_thread(shutil.copyfileobj, reader, temp_file)
+            temp_path = temp_file.name
+        try:
+            jobs.append(eeg_jobs.submit_job(temp_path, file.filename, eeg_service.recording_key(reader.hexdigest())))
+        except Exception:
+            os.unlink(temp_path)
+            raise
+
+    return {"jobs": jobs}
+
+@router.get("/jobs")
+async def list_eeg_jobs():
+    """Status of every submitted preprocessing job"""
+    return {"jobs": eeg_jobs.list_jobs()}
+
+@router.get("/jobs/{job_id}")
+async def get_eeg_job(job_id: str):
+    """Status, progress (0-1) and, once done, the result of one job"""
+    try:
+        return eeg_jobs.get_job(job_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.delete("/jobs/{job_id}")
+async def cancel_eeg_job(job_id: str):
+    """Cancel a queued job or stop a running one at its next block"""
+    try:
+        return eeg_jobs.cancel_job(job_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
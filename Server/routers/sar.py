@@ -1,16 +1,76 @@
-from fastapi import APIRouter, HTTPException
-from services.sar_service import generate_sar_image
+from fastapi import APIRouter, HTTPException, Query, Response
+from services.lazy import lazy_import
+from services import sar_catalog
+from typing import Optional
 import os
 
+# rasterio is only imported when a SAR route is first used
+sar_service = lazy_import("services.sar_service")
+sar_tiles = lazy_import("services.sar_tiles")
+sar_products = lazy_import("services.sar_products")
+
 router = APIRouter()
 
+SCENE_QUERY = Query(None, description="Catalog scene id (default: the demo scene)")
+
+
+def scene_folder(scene: Optional[str]) -> str:
+    """SAFE folder of a catalogued scene, or the demo scene when none is given"""
+    if scene is None:
+        return sar_service.HARDCODED_SAR_FOLDER
+    return sar_catalog.scene_folder(scene)
+
+
+@router.get("/sar/scenes")
+def list_sar_scenes(
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    start: Optional[str] = Query(None, description="ISO date/time, scenes ending after it"),
+    end: Optional[str] = Query(None, description="ISO date/time, scenes starting before it"),
+    pol: Optional[str] = Query(None, description="Only scenes with this polarisation"),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Catalogued scenes intersecting a bounding box and date range, newest first"""
+    try:
+        box = tuple(float(v) for v in bbox.split(",")) if bbox else None
+        if box is not None and len(box) != 4:
+            raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+        scenes = sar_catalog.query(box, start, end, pol, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error querying SAR catalog: {str(e)}")
+
+    return {"count": len(scenes), "scenes": [{k: v for k, v in s.items() if k != "measurements"} for s in scenes]}
+
+@router.get("/sar/scenes/{scene_id}")
+def get_sar_scene(scene_id: str):
+    """Catalog entry of one scene, including its measurement files"""
+    try:
+        scene = sar_catalog.get_scene(scene_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    scene["measurements"] = {pol: os.path.basename(path) for pol, path in scene["measurements"].items()}
+    return scene
+
+@router.post("/sar/catalog/scan")
+def scan_sar_catalog():
+    """Index new or changed products under SAR_DATA_ROOT and drop removed ones"""
+    try:
+        return sar_catalog.scan()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error scanning SAR catalog: {str(e)}")
+
 @router.get("/image")
-async def get_sar_image_path():
+async def get_sar_image_path(
+    scene: Optional[str] = SCENE_QUERY,
+    pol: str = Query("vv", description="Polarisation (vv or vh)"),
+):
     """
     Generate SAR image and return the file path
     """
     try:
-        image_path = generate_sar_image()
+        image_path = sar_service.generate_sar_image(folder_path=scene_folder(scene), polarisation=pol)
         
         # Return the accessible URL path
         filename = os.path.basename(image_path)
@@ -28,12 +88,15 @@ async def get_sar_image_path():
         raise HTTPException(status_code=500, detail=f"Error processing SAR image: {str(e)}")
 
 @router.get("/image/info")
-async def get_sar_image_info():
+async def get_sar_image_info(
+    scene: Optional[str] = SCENE_QUERY,
+    pol: str = Query("vv", description="Polarisation (vv or vh)"),
+):
     """
     Get information about the generated SAR image
     """
     try:
-        image_path = generate_sar_image()
+        image_path = sar_service.generate_sar_image(folder_path=scene_folder(scene), polarisation=pol)
         filename = os.path.basename(image_path)
         file_size = os.path.getsize(image_path)
         
@@ -45,4 +108,93 @@ async def get_sar_image_info():
             "access_url": f"http://localhost:8000/static/images/{filename}"
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error getting image info: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error getting image info: {str(e)}")
+
+@router.get("/sar/tiles/info")
+def get_sar_tile_info(pol: str = Query("vv", description="Polarisation (vv or vh)"), scene: Optional[str] = SCENE_QUERY):
+    """
+    Scene size, zoom range and contrast limits for the tile viewer.
+    Zoom max_zoom is native resolution; each lower zoom halves it.
+    """
+    try:
+        info = sar_tiles.scene_info(scene_folder(scene), pol)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading SAR scene: {str(e)}")
+
+    scene_param = f"&scene={scene}" if scene else ""
+    return {
+        **{k: v for k, v in info.items() if k != "tiff_file"},
+        "tile_url": f"http://localhost:8000/api/sar/tiles/{{z}}/{{x}}/{{y}}.png?pol={info['polarisation']}{scene_param}"
+    }
+
+# Sync routes: rasterio reads run in FastAPI's threadpool
+@router.get("/sar/tiles/{z}/{x}/{y}.png")
+def get_sar_tile(z: int, x: int, y: int, pol: str = Query("vv", description="Polarisation (vv or vh)"),
+                 scene: Optional[str] = SCENE_QUERY):
+    """One 256x256 grayscale PNG tile of the dB image"""
+    try:
+        tile = sar_tiles.get_tile(z, x, y, pol, scene_folder(scene))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rendering SAR tile: {str(e)}")
+
+    return Response(content=tile, media_type="image/png", headers={"Cache-Control": "public, max-age=86400"})
+
+@router.post("/sar/process")
+def process_sar_scene(scene: Optional[str] = SCENE_QUERY):
+    """
+    Compute full-resolution dB products and statistics for VV and VH once.
+    Returns immediately if the scene was already processed.
+    """
+    try:
+        stats = sar_products.process_scene(scene_folder(scene))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing SAR scene: {str(e)}")
+
+    return {
+        "scene": stats["scene"],
+        "polarisations": list(stats["polarisations"]),
+        "status": "success"
+    }
+
+@router.get("/sar/stats")
+def get_sar_stats(
+    pol: str = Query("vv", description="Polarisation (vv or vh)"),
+    histogram: bool = Query(False, description="Include histogram counts"),
+    scene: Optional[str] = SCENE_QUERY,
+):
+    """Scene statistics in dB (mean, std, range, clip limits) from the precomputed store"""
+    try:
+        stats = dict(sar_products.polarisation_stats(pol, scene_folder(scene)))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading SAR statistics: {str(e)}")
+
+    if not histogram:
+        stats.pop("histogram")
+    return stats
+
+@router.get("/sar/contrast")
+def get_sar_contrast(
+    pol: str = Query("vv", description="Polarisation (vv or vh)"),
+    low: float = Query(2.0, description="Lower percentile"),
+    high: float = Query(98.0, description="Upper percentile"),
+    scene: Optional[str] = SCENE_QUERY,
+):
+    """Contrast-stretch limits (dB) at any percentiles, from the stored histogram"""
+    try:
+        db_min, db_max = sar_products.contrast_limits(pol, low, high, scene_folder(scene))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"polarisation": pol.lower(), "low": low, "high": high, "db_min": db_min, "db_max": db_max}
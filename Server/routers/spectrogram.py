@@ -0,0 +1,100 @@
+from fastapi import APIRouter, File, HTTPException, Query, Response, UploadFile
+from typing import Optional
+import asyncio
+import hashlib
+from services.png import encode_png_gray
+from services.config import DATA_DIRS, AUDIO_DATA_DIR
+from services.lazy import lazy_import
+
+# scipy and the ffmpeg decoder are only imported when a spectrogram is first asked for
+spectrogram_service = lazy_import("services.spectrogram_service")
+
+router = APIRouter(prefix="/spectrogram", tags=["Spectrogram"])
+
+
+def _render(recording_id: str, output_dir: str, channel: Optional[str], t0: float, t1: Optional[float],
+            n_fft: int, hop: Optional[int], window: str, n_mels: Optional[int], fmt: str, top_db: float):
+    spec = spectrogram_service.compute_spectrogram(recording_id, output_dir, channel, t0, t1, n_fft, hop, window, n_mels)
+    db = spectrogram_service.to_db(spec["power"], top_db)
+    if fmt == "uint8":
+        image = spectrogram_service.quantize(db, top_db)
+        content, media_type = encode_png_gray(image), "image/png"
+    else:
+        # Frames x bins, little-endian float16 dB
+        content, media_type = db.astype("<f2").tobytes(), "application/octet-stream"
+
+    headers = {
+        "X-Channels": spec["channel"],
+        "X-Sampling-Rate": str(spec["sampling_rate"]),
+        "X-Shape": f"{db.shape[0]},{db.shape[1]}",
+        "X-Start-Sample": str(spec["start_sample"]),
+        "X-Hop-Length": str(spec["hop"]),
+        "X-Max-Frequency": str(spec["max_frequency"]),
+    }
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+async def _spectrogram_response(recording_id: str, output_dir: str, *args):
+    try:
+        return await asyncio.to_thread(_render, recording_id, output_dir, *args)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{kind}/{recording_id}")
+async def stored_spectrogram_endpoint(
+    kind: str,
+    recording_id: str,
+    channel: Optional[str] = Query(None, description="Channel name (default: first channel)"),
+    t0: float = Query(0.0, ge=0, description="Window start (s)"),
+    t1: Optional[float] = Query(None, description="Window end (s), exclusive"),
+    n_fft: int = Query(512, ge=16, le=16384, description="FFT size in samples"),
+    hop: Optional[int] = Query(None, gt=0, description="Hop in samples (default n_fft / 4)"),
+    window: str = Query("hann", description="scipy.signal window name"),
+    n_mels: Optional[int] = Query(None, gt=0, le=512, description="Mel bands; omit for a linear STFT"),
+    format: str = Query("uint8", pattern="^(uint8|float16)$", description="PNG image or raw float16 dB"),
+    top_db: float = Query(80.0, gt=0, description="Dynamic range below the peak"),
+):
+    """
+    STFT or mel spectrogram of one channel of a stored EEG, ECG or audio
+    recording over [t0, t1). Frames are cached, so panning only computes new columns.
+    """
+    if kind not in DATA_DIRS:
+        raise HTTPException(status_code=404, detail=f"Unknown recording kind: {kind}")
+    if kind == "audio":
+        # Uploaded audio is evicted least recently used first
+        spectrogram_service.audio_cache.touch(recording_id)
+    return await _spectrogram_response(
+        recording_id, DATA_DIRS[kind], channel, t0, t1, n_fft, hop, window, n_mels, format, top_db
+    )
+
+
+@router.post("")
+async def upload_spectrogram_endpoint(
+    file: UploadFile = File(..., description="Audio file (any format ffmpeg can decode)"),
+    t0: float = Query(0.0, ge=0, description="Window start (s)"),
+    t1: Optional[float] = Query(None, description="Window end (s), exclusive"),
+    n_fft: int = Query(512, ge=16, le=16384, description="FFT size in samples"),
+    hop: Optional[int] = Query(None, gt=0, description="Hop in samples (default n_fft / 4)"),
+    window: str = Query("hann", description="scipy.signal window name"),
+    n_mels: Optional[int] = Query(None, gt=0, le=512, description="Mel bands; omit for a linear STFT"),
+    format: str = Query("uint8", pattern="^(uint8|float16)$", description="PNG image or raw float16 dB"),
+    top_db: float = Query(80.0, gt=0, description="Dynamic range below the peak"),
+):
+    """
+    Spectrogram of an uploaded audio file. The decoded audio is stored once;
+    X-Recording-Id names it for later GET /spectrogram/audio/{id} requests.
+    """
+    audio_bytes = await file.read()
+    try:
+        recording_id = await asyncio.to_thread(spectrogram_service.store_audio, audio_bytes, hashlib.sha256(audio_bytes).hexdigest())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    response = await _spectrogram_response(
+        recording_id, AUDIO_DATA_DIR, None, t0, t1, n_fft, hop, window, n_mels, format, top_db
+    )
+    response.headers["X-Recording-Id"] = recording_id
+    return response
@@ -0,0 +1,134 @@
+"""
+Pre-fork server: load the models once in this master process, then fork
+workers that share their weights copy-on-write instead of each loading a copy.
+
+    python serve.py --workers 4 --threads 2
+
+Run from the Server directory, like `uvicorn main:app`.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+# Env vars read by the BLAS / OpenMP / TensorFlow thread pools when they start
+THREAD_ENV_VARS = [
+    "OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "TF_NUM_INTRAOP_THREADS",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve the API with N pre-forked workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("WORKER_THREADS", 0)),
+                        help="Compute threads per worker (default: cores / workers)")
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args()
+
+
+def configure_threads(threads: int):
+    """Must run before numpy/torch/TensorFlow are imported to take full effect"""
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    # Inter-op parallelism would multiply threads again across concurrent ops
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+
+
+def preload():
+    """Load everything that is safe to share across fork() into the master"""
+    from services import warmup
+    from services.config import ENABLED_DOMAINS, MODEL_BACKENDS
+    # Drone: torch weights, read-only after load, shared copy-on-write.
+    # Doppler: numpy arrays and a read-only memmap.
+    # The ECG model stays per worker: a TensorFlow runtime started before
+    # fork() does not survive in the children, so it warms up in startup_event.
+    # ONNX Runtime sessions have the same problem; they are small, so the
+    # workers open their own (the first one converts, the others wait for it).
+    shared = ["doppler"] + (["drone"] if MODEL_BACKENDS["drone"] == "native" else [])
+    warmup.load([d for d in shared if d in ENABLED_DOMAINS])
+
+
+def run_worker(sock: socket.socket, threads: int, log_level: str):
+    import uvicorn
+    # The app (and every router's imports) is built after fork, so nothing
+    # that can't survive fork() is ever started in the master
+    from main import app
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if "torch" in sys.modules:
+        torch = sys.modules["torch"]
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    config = uvicorn.Config(app, fd=sock.fileno(), log_level=log_level)
+    uvicorn.Server(config).run()
+
+
+def main():
+    args = parse_args()
+    workers = max(1, args.workers)
+    threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+    configure_threads(threads)
+
+    print(f"Loading models in master (pid {os.getpid()})...")
+    preload()
+    # Move everything loaded so far out of the collector's reach, so gc passes
+    # in the workers don't write to (and un-share) the master's pages
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(sock, threads, args.log_level)
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(workers):
+        spawn()
+    print(f"✅ Serving on {args.host}:{args.port} with {workers} workers x {threads} threads")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"❌ Worker {pid} exited ({status}), restarting")
+            time.sleep(1)  # Don't spin if workers die on boot
+            spawn()
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import numpy as np
+from typing import Any, Dict, List, Tuple
+
+# Rows/columns of the recurrence matrix computed at once; memory is O(TILE_SIZE^2)
+TILE_SIZE = 2048
+
+
+def _zscore(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    std = x.std()
+    return (x - x.mean()) / (std if std > 0 else 1.0)
+
+
+def recurrence_matrix(x: np.ndarray, y: np.ndarray, threshold: float = 0.1,
+                      resolution: int = 512, tile_size: int = TILE_SIZE) -> Tuple[np.ndarray, float]:
+    """
+    Recurrence plot of the two-channel trajectory (x[i], y[i]), binned down
+    to at most resolution x resolution cells.
+
+    Both channels are z-scored, so `threshold` is a radius in units of
+    standard deviation. Point pairs are compared tile by tile (only tiles on
+    or above the diagonal, mirrored), so the n x n matrix never exists.
+    Returns per-cell recurrence rates in [0, 1] and the overall recurrence rate.
+    """
+    n = min(len(x), len(y))
+    if n == 0:
+        raise ValueError("No samples in the selected window")
+    x, y = _zscore(x[:n]), _zscore(y[:n])
+    eps2 = np.float32(threshold ** 2)
+
+    resolution = min(resolution, n)
+    edges = np.linspace(0, n, resolution + 1).astype(np.int64)
+    bin_of = np.searchsorted(edges, np.arange(n), side="right") - 1
+    counts = np.zeros((resolution, resolution), dtype=np.int64)
+
+    def one_hot(bins: np.ndarray) -> np.ndarray:
+        # Sample -> output-cell membership, so binning a tile is two matmuls
+        local = bins - bins[0]
+        m = np.zeros((len(bins), local[-1] + 1), dtype=np.float32)
+        m[np.arange(len(bins)), local] = 1.0
+        return m
+
+    for i0 in range(0, n, tile_size):
+        i1 = min(n, i0 + tile_size)
+        xi, yi = x[i0:i1, None], y[i0:i1, None]
+        rows = one_hot(bin_of[i0:i1])
+        rb0 = bin_of[i0]
+
+        for j0 in range(i0, n, tile_size):
+            j1 = min(n, j0 + tile_size)
+            dx = xi - x[None, j0:j1]
+            dy = yi - y[None, j0:j1]
+            close = ((dx * dx + dy * dy) <= eps2).astype(np.float32)
+
+            cols = one_hot(bin_of[j0:j1])
+            cb0 = bin_of[j0]
+            block = np.rint(rows.T @ close @ cols).astype(np.int64)
+            counts[rb0:rb0 + block.shape[0], cb0:cb0 + block.shape[1]] += block
+            if j0 != i0:
+                counts[cb0:cb0 + block.shape[1], rb0:rb0 + block.shape[0]] += block.T
+
+    sizes = np.diff(edges)
+    rates = counts / np.outer(sizes, sizes)
+    return rates, float(counts.sum() / (n * n))
+
+
+def recurrence_image(rates: np.ndarray, binary: bool = False) -> np.ndarray:
+    """uint8 image of recurrence rates, time running bottom-left to top-right"""
+    image = (rates > 0) * 255 if binary else np.round(np.sqrt(rates) * 255)
+    return np.flipud(image.astype(np.uint8))
+
+
+def xor_analysis(x: np.ndarray, y: np.ndarray, threshold: float, sfreq: float, start_sample: int = 0) -> Dict[str, Any]:
+    """
+    Where two channels disagree by more than `threshold` (signal units):
+    the mismatch fraction, the largest difference and the mismatching
+    segments as [start, end) times in seconds.
+    """
+    n = min(len(x), len(y))
+    diff = np.abs(np.asarray(x[:n], dtype=np.float32) - np.asarray(y[:n], dtype=np.float32))
+    mask = diff > threshold
+
+    # Run boundaries of the mask, vectorized
+    changes = np.flatnonzero(np.diff(mask.astype(np.int8), prepend=0, append=0))
+    starts, ends = changes[0::2], changes[1::2]
+    segments: List[List[float]] = (
+        np.stack([starts, ends], axis=1) + start_sample
+    ).astype(np.float64) / sfreq if len(starts) else np.zeros((0, 2))
+
+    return {
+        "samples": int(n),
+        "threshold": threshold,
+        "mismatch_fraction": float(mask.mean()) if n else 0.0,
+        "max_difference": float(diff.max()) if n else 0.0,
+        "segments": np.round(segments, 4).tolist(),
+    }
@@ -0,0 +1,35 @@
+import os
+
+# Every API domain; each has a router module of the same name
+ALL_DOMAINS = ["drone", "doppler", "eeg", "ecg", "sar", "analysis", "spectrogram"]
+
+# ENABLED_DOMAINS=eeg,analysis serves only those routes and loads only their models
+ENABLED_DOMAINS = [
+    domain.strip()
+    for domain in os.environ.get("ENABLED_DOMAINS", ",".join(ALL_DOMAINS)).split(",")
+    if domain.strip()
+]
+_unknown = sorted(set(ENABLED_DOMAINS) - set(ALL_DOMAINS))
+if _unknown:
+    raise ValueError(f"Unknown domains in ENABLED_DOMAINS: {', '.join(_unknown)}")
+
+# Where each kind of stored recording lives (kept here so routers can name
+# them without importing the heavy service modules)
+EEG_DATA_DIR = "static/eegdata"
+ECG_DATA_DIR = "static/ecgdata"
+AUDIO_DATA_DIR = "static/audio"
+DATA_DIRS = {"eeg": EEG_DATA_DIR, "ecg": ECG_DATA_DIR, "audio": AUDIO_DATA_DIR}
+# Sentinel-1 .SAFE products (possibly nested) indexed by the SAR catalog
+SAR_DATA_DIR = os.environ.get("SAR_DATA_ROOT", "static/sardata")
+
+# Model inference backend: "native" (PyTorch / Keras), "onnx" (ONNX Runtime)
+# or "onnx-int8" (ONNX Runtime with int8 dynamic quantization).
+# DRONE_BACKEND / ECG_BACKEND override it per model.
+INFERENCE_BACKENDS = ("native", "onnx", "onnx-int8")
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "native")
+MODEL_BACKENDS = {model: os.environ.get(f"{model.upper()}_BACKEND", INFERENCE_BACKEND) for model in ("drone", "ecg")}
+for _model, _backend in MODEL_BACKENDS.items():
+    if _backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend for {_model}: {_backend} (expected one of {', '.join(INFERENCE_BACKENDS)})")
+# Converted models and their parity reports
+ONNX_CACHE_DIR = os.environ.get("ONNX_CACHE_DIR", "cache/onnx")
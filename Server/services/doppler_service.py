@@ -3,10 +3,18 @@ from scipy.io.wavfile import write
 import io
 import h5py
 import os
+import struct
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional
+from services.metrics import timed
 
-def simulate_doppler(frequency: float, velocity: float, duration: float, fs: int = 8000):
+DOPPLER_CACHE_SIZE = int(os.environ.get("DOPPLER_CACHE_SIZE", 16))
+
+@lru_cache(maxsize=DOPPLER_CACHE_SIZE)
+def _simulate(frequency: float, velocity: float, duration: float, fs: int):
     """
-    Simulates a Doppler effect siren and returns audio + analysis data
+    Memoized simulation keyed on (frequency, velocity, duration, fs).
+    Arrays are float32 and read-only because cached results are shared.
     """
     v_sound = 343.0  # speed of sound (m/s)
     d = 5.0          # perpendicular distance (m)
@@ -39,48 +47,207 @@ def simulate_doppler(frequency: float, velocity: float, duration: float, fs: int
     right = signal * np.sqrt(0.5 * (1 + x/r))
     signal_stereo = np.column_stack((left, right))
 
-    # Save to WAV in memory
+    # Encode WAV once; every response reuses these bytes
     wav_bytes = io.BytesIO()
     write(wav_bytes, fs, np.int16(signal_stereo * 32767))
-    wav_bytes.seek(0)
 
     # Frequency stats
     max_freq = float(np.max(f_o))
     min_freq = float(np.min(f_o))
     shift_ratio = max_freq / min_freq if min_freq != 0 else float("inf")
 
-    # Prepare plotting data
-    return {
-        "audio": wav_bytes,
-        "time": t.tolist(),
-        "amplitude": signal.tolist(),
-        "frequency": f_o.tolist(),
+    result = {
+        "wav": wav_bytes.getvalue(),
+        "time": t.astype(np.float32),
+        "amplitude": signal.astype(np.float32),
+        "frequency": f_o.astype(np.float32),
         "max_frequency": max_freq,
         "min_frequency": min_freq,
         "shift_ratio": shift_ratio
     }
+    for key in ("time", "amplitude", "frequency"):
+        result[key].flags.writeable = False
+    return result
 
-MODEL_PATH = "speed_estimations_NN_1000-200-50-10-1_reg1e-3_lossMSE.h5"  # Hardcoded model path
-def get_first_predicted_speed(audio_path: str):
+@timed("doppler.simulate")
+def simulate_doppler(frequency: float, velocity: float, duration: float, fs: int = 8000):
+    """
+    Simulates a Doppler effect siren and returns audio + analysis data
+    """
+    result = _simulate(float(frequency), float(velocity), float(duration), int(fs))
+    return {**result, "audio": io.BytesIO(result["wav"])}
+
+def decimate_plot(result, max_points: int):
     """
-    Extracts the first predicted speed for the given uploaded audio file.
-    The .h5 model path is hardcoded.
+    Reduce the plot arrays to at most max_points samples. Each bin keeps the
+    sample with the largest |amplitude|, so the envelope is not aliased away.
+    Returns (time, amplitude, frequency) float32 arrays.
     """
-    filename = os.path.basename(audio_path)
-    vehicle_name, true_speed_str = filename.replace(".wav", "").split("_")
-    true_speed = float(true_speed_str)
+    time, amplitude, frequency = result["time"], result["amplitude"], result["frequency"]
+    n = len(time)
+    if max_points <= 0 or n <= max_points:
+        return time, amplitude, frequency
+
+    step = -(-n // max_points)
+    n_bins = n // step
+    bins = np.abs(amplitude[:n_bins * step]).reshape(n_bins, step)
+    idx = np.argmax(bins, axis=1) + np.arange(n_bins) * step
+    if n_bins * step < n:
+        # Trailing partial bin
+        tail = n_bins * step + int(np.argmax(np.abs(amplitude[n_bins * step:])))
+        idx = np.append(idx, tail)
+    return time[idx], amplitude[idx], frequency[idx]
+
+def pack_plot(time, amplitude, frequency) -> bytes:
+    """Little-endian float32 [time | amplitude | frequency]"""
+    return np.concatenate([time, amplitude, frequency]).astype("<f4").tobytes()
+
+V_SOUND = 343.0  # speed of sound (m/s)
+
+def wav_header(n_frames: int, fs: int, channels: int = 2) -> bytes:
+    """16-bit PCM WAV header for a stream whose length is known up front"""
+    block_align = channels * 2
+    data_size = n_frames * block_align
+    return (b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, fs, fs * block_align, block_align, 16)
+            + b"data" + struct.pack("<I", data_size))
+
+def iter_doppler_chunks(sources: List[Dict[str, float]], duration: float, fs: int = 8000,
+                        chunk_seconds: float = 0.5) -> Iterator[bytes]:
+    """
+    Synthesize a drive-by scene chunk by chunk as interleaved int16 stereo PCM.
+
+    Each source is a dict with `frequency`, `velocity` and optionally
+    `distance` (closest approach, m) and `t0` (time of closest approach, s,
+    default duration / 2). Phase is carried across chunks, and amplitude is
+    normalized analytically: 1/r^2 peaks at r = distance, so d^2/r^2 is
+    already in [0, 1] without looking at the whole signal. Memory is one chunk.
+
+    The audio is not sample-identical to simulate_doppler, which rescales by
+    the peak of the rendered waveform (only known once it is all computed).
+    Phase and envelope shape are the same, but the level differs by the gap
+    between the sampled peak and the analytic one: about 1% of full scale
+    for typical sirens, more as the frequency approaches fs / 2 or when the
+    closest approach falls outside the clip.
+    """
+    n_total = int(duration * fs)
+    chunk = max(1, int(chunk_seconds * fs))
+    dt = 1.0 / fs
+    phases = [0.0] * len(sources)
+    # Sum of sources each peaking at 1 is bounded by the source count
+    gain = 32767.0 / max(1, len(sources))
+
+    for start in range(0, n_total, chunk):
+        t = (start + np.arange(min(chunk, n_total - start))) * dt
+        left = np.zeros_like(t)
+        right = np.zeros_like(t)
+        for k, source in enumerate(sources):
+            d = source.get("distance", 5.0)
+            t0 = source.get("t0", duration / 2.0)
+            x = source["velocity"] * (t - t0)
+            r = np.sqrt(x**2 + d**2)
+            v_rad = source["velocity"] * (-x) / r
+            f_o = source["frequency"] * V_SOUND / (V_SOUND - v_rad)
+
+            # Running cumulative phase keeps the waveform continuous across chunks
+            phi = phases[k] + 2 * np.pi * np.cumsum(f_o) * dt
+            phases[k] = float(phi[-1] % (2 * np.pi))
+
+            signal = np.sin(phi) * (d**2 / r**2)
+            left += signal * np.sqrt(0.5 * (1 - x/r))
+            right += signal * np.sqrt(0.5 * (1 + x/r))
+
+        frames = np.empty((len(t), 2), dtype="<i2")
+        frames[:, 0] = np.clip(left * gain, -32768, 32767)
+        frames[:, 1] = np.clip(right * gain, -32768, 32767)
+        yield frames.tobytes()
+
+def stream_doppler(sources: List[Dict[str, float]], duration: float, fs: int = 8000,
+                   chunk_seconds: float = 0.5, wav: bool = True) -> Iterator[bytes]:
+    """WAV (header first) or raw PCM byte stream for StreamingResponse"""
+    if wav:
+        yield wav_header(int(duration * fs), fs)
+    yield from iter_doppler_chunks(sources, duration, fs, chunk_seconds)
 
-    est_key = f"{vehicle_name}_speeds_est_all"
-    gt_key = f"{vehicle_name}_speeds_gt"
+MODEL_PATH = "speed_estimations_NN_1000-200-50-10-1_reg1e-3_lossMSE.h5"  # Hardcoded model path
 
-    with h5py.File(MODEL_PATH, "r") as f:
-        if est_key not in f or gt_key not in f:
-            raise KeyError(f"Vehicle '{vehicle_name}' not found in HDF5 file.")
+class SpeedIndex:
+    """
+    In-memory index over the speed-estimation HDF5 file, opened once.
+    Per vehicle: ground-truth speeds sorted for searchsorted lookup, and the
+    first row of the estimates, memory-mapped when the dataset layout allows.
+    """
 
-        gt_speeds = f[gt_key][()]        # shape: (N,)
-        est_speeds = f[est_key][()]      # shape: (20, N)
+    def __init__(self, path: str = MODEL_PATH):
+        self.path = path
+        self.vehicles: Dict[str, Dict[str, np.ndarray]] = {}
+        with h5py.File(path, "r") as f:
+            for gt_key in f.keys():
+                if not gt_key.endswith("_speeds_gt"):
+                    continue
+                vehicle = gt_key[:-len("_speeds_gt")]
+                est_key = f"{vehicle}_speeds_est_all"
+                if est_key not in f:
+                    continue
+                gt = f[gt_key][()]
+                order = np.argsort(gt, kind="stable")
+                self.vehicles[vehicle] = {
+                    "gt_sorted": gt[order],
+                    "order": order,
+                    "estimates": self._first_row(f[est_key]),  # shape: (N,)
+                }
+
+    def _first_row(self, dataset) -> np.ndarray:
+        offset = dataset.id.get_offset()
+        if dataset.chunks is None and dataset.compression is None and offset is not None:
+            # Contiguous, unfiltered: map the file directly, nothing is read up front
+            full = np.memmap(self.path, dtype=dataset.dtype, mode="r", offset=offset, shape=dataset.shape)
+            return full[0]
+        return dataset[0, :]
+
+    def lookup(self, vehicle_name: str, true_speed: float) -> float:
+        """First estimated speed at the ground-truth speed closest to true_speed"""
+        if vehicle_name not in self.vehicles:
+            raise KeyError(f"Vehicle '{vehicle_name}' not found in HDF5 file.")
+        entry = self.vehicles[vehicle_name]
+        gt = entry["gt_sorted"]
+        i = int(np.searchsorted(gt, true_speed))
+        # Nearest of the two neighbours; ties go to the lower speed
+        if i == len(gt) or (i > 0 and true_speed - gt[i - 1] <= gt[i] - true_speed):
+            i -= 1
+        return float(entry["estimates"][entry["order"][i]])
+
+speed_index: Optional[SpeedIndex] = None
+
+def load_speed_index():
+    """Load the speed-estimation index once at startup"""
+    global speed_index
+    if speed_index is not None:
+        return  # Already loaded, e.g. by the pre-fork master
+    try:
+        speed_index = SpeedIndex(MODEL_PATH)
+        print(f"✅ Speed index loaded ({len(speed_index.vehicles)} vehicles)")
+    except Exception as e:
+        print(f"❌ Error loading speed index: {e}")
+        speed_index = None
+
+def parse_clip_name(filename: str):
+    """'VehicleName_trueSpeed.wav' -> (vehicle name, true speed)"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    vehicle_name, sep, true_speed_str = stem.rpartition("_")
+    if not sep or not vehicle_name:
+        raise ValueError(f"Expected a file named like 'VehicleName_trueSpeed.wav', got '{filename}'")
+    return vehicle_name, float(true_speed_str)
 
-        idx = np.argmin(np.abs(gt_speeds - true_speed))
-        first_pred_speed = est_speeds[0, idx]
+def get_first_predicted_speed(audio_path: str):
+    """
+    Extracts the first predicted speed for the given uploaded audio file name.
+    Only the name is used, so the upload itself never needs to touch disk.
+    """
+    if speed_index is None:
+        load_speed_index()
+        if speed_index is None:
+            raise RuntimeError("Speed index not loaded.")
 
-    return float(first_pred_speed)
+    vehicle_name, true_speed = parse_clip_name(audio_path)
+    return speed_index.lookup(vehicle_name, true_speed)
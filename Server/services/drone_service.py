@@ -1,36 +1,265 @@
 import os
-import torch
-from transformers import pipeline
+import subprocess
+import threading
+import numpy as np
+from typing import Any, Dict, Iterator, List, Tuple
+from scipy.signal import resample_poly
+from transformers.pipelines.audio_utils import ffmpeg_read
+from services.batcher import MicroBatcher
+from services.config import MODEL_BACKENDS
+from services.metrics import timed, observe, BATCH_BUCKETS
 
 # Global variable to store the classifier
 classifier = None
+# The pipeline is shared between the batcher thread and streaming jobs
+_inference_lock = threading.Lock()
+
+BATCH_WINDOW_MS = float(os.environ.get("DRONE_BATCH_WINDOW_MS", 10))
+MAX_BATCH_SIZE = int(os.environ.get("DRONE_MAX_BATCH_SIZE", 8))
+DEFAULT_SAMPLING_RATE = 16000
+MODEL_ID = "preszzz/drone-audio-detection-05-17-trial-0"
+# Hub branch, tag or commit hash; set a commit hash in production. It is
+# resolved to the commit actually downloaded before anything else loads.
+MODEL_REVISION = os.environ.get("DRONE_MODEL_REVISION", "main")
+BACKEND = MODEL_BACKENDS["drone"]
+
+def build_pipeline(revision: str = MODEL_REVISION):
+    """The full-precision PyTorch pipeline"""
+    import torch
+    from transformers import pipeline
+    return pipeline(
+        "audio-classification",
+        model=MODEL_ID,
+        revision=revision,
+        device=0 if torch.cuda.is_available() else -1  # FastAPI uses -1 for CPU
+    )
+
+def reference_waveforms(n: int = 16, seed: int = 0) -> List[np.ndarray]:
+    """Parity set: rotor-like harmonic stacks, noise and near-silence, 0.5 to 2 s long"""
+    rng = np.random.default_rng(seed)
+    waveforms = []
+    for i in range(n):
+        t = np.arange(int(DEFAULT_SAMPLING_RATE * rng.uniform(0.5, 2.0))) / DEFAULT_SAMPLING_RATE
+        f0 = rng.uniform(80, 400)
+        harmonics = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 8))
+        noise = rng.standard_normal(t.size)
+        if i % 3 == 0:
+            audio = 0.3 * harmonics + 0.05 * noise
+        elif i % 3 == 1:
+            audio = 0.3 * noise
+        else:
+            audio = 0.001 * noise
+        waveforms.append(audio.astype(np.float32))
+    return waveforms
+
+def _pipeline_probabilities(pipe, waveforms: List[np.ndarray]) -> np.ndarray:
+    labels = [pipe.model.config.id2label[i] for i in range(len(pipe.model.config.id2label))]
+    inputs = [{"raw": w, "sampling_rate": pipe.feature_extractor.sampling_rate} for w in waveforms]
+    predictions = pipe(inputs, batch_size=len(inputs), top_k=len(labels))
+    return np.array([[{p["label"]: p["score"] for p in pred}[label] for label in labels] for pred in predictions])
+
+def load_onnx_classifier(backend: str):
+    """ONNX Runtime classifier with the pipeline's call interface, or None to stay on PyTorch"""
+    from transformers import AutoConfig, AutoFeatureExtractor
+    from services import inference_backend
+
+    try:
+        config = AutoConfig.from_pretrained(MODEL_ID, revision=MODEL_REVISION)
+        # Pin everything below to one snapshot, so the converted artifact is
+        # keyed by the exact weights it was exported from
+        revision = getattr(config, "_commit_hash", None) or MODEL_REVISION
+        feature_extractor = AutoFeatureExtractor.from_pretrained(MODEL_ID, revision=revision)
+    except Exception as e:
+        print(f"❌ Could not load the drone model config: {e}")
+        return None
+    labels = [config.id2label[i] for i in range(len(config.id2label))]
+    return inference_backend.load_converted(
+        "drone", backend, f"{MODEL_ID}@{revision}",
+        load_original=lambda: build_pipeline(revision),
+        export=inference_backend.export_audio_classifier,
+        make_runner=lambda path: inference_backend.OnnxAudioClassifier(path, feature_extractor, labels),
+        reference_inputs=reference_waveforms,
+        original_probabilities=_pipeline_probabilities,
+    )
 
 def load_drone_model():
     """Load the model once at startup"""
     global classifier
-    model_id = "preszzz/drone-audio-detection-05-17-trial-0"
+    if classifier is not None:
+        return  # Already loaded, e.g. by the pre-fork master
     try:
         print("Loading model... This may take a moment.")
-        classifier = pipeline(
-            "audio-classification",
-            model=model_id,
-            device=0 if torch.cuda.is_available() else -1  # FastAPI uses -1 for CPU
-        )
+        if BACKEND != "native":
+            classifier = load_onnx_classifier(BACKEND)
+        if classifier is None:
+            classifier = build_pipeline()
         print("✅ Model loaded successfully!")
     except Exception as e:
         print(f"❌ Error loading model: {e}")
         classifier = None
 
-def predict_drone(audio_file_path: str):
-    """Run prediction on an audio file"""
+def get_sampling_rate() -> int:
     if classifier is None:
-        raise RuntimeError("Model not loaded.")
+        return DEFAULT_SAMPLING_RATE
+    return classifier.feature_extractor.sampling_rate
 
-    predictions = classifier(audio_file_path)
-    top_prediction = predictions[0]
+def decode_audio(audio_bytes: bytes) -> np.ndarray:
+    """Decode an uploaded file in memory to a mono float32 waveform at the model rate"""
+    waveform = ffmpeg_read(audio_bytes, get_sampling_rate())
+    if waveform.size == 0:
+        raise ValueError("Audio file contains no samples")
+    return waveform
 
+def _format_prediction(predictions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    top_prediction = predictions[0]
     return {
         "classification": top_prediction["label"],
         "confidence": round(top_prediction["score"], 4),
         "status": "success"
     }
+
+@timed("drone.predict")
+def predict_drone_batch(waveforms: List[np.ndarray]) -> List[Dict[str, Any]]:
+    """Classify several waveforms in one padded pipeline batch"""
+    if classifier is None:
+        raise RuntimeError("Model not loaded.")
+
+    observe("inference_batch_size", len(waveforms), BATCH_BUCKETS, help="Records per model call", model="drone")
+    sampling_rate = get_sampling_rate()
+    inputs = [{"raw": w, "sampling_rate": sampling_rate} for w in waveforms]
+    with _inference_lock:
+        predictions = classifier(inputs, batch_size=len(inputs))
+    return [_format_prediction(p) for p in predictions]
+
+def predict_drone(audio):
+    """Run prediction on an audio file path, raw bytes or a decoded waveform"""
+    if classifier is None:
+        raise RuntimeError("Model not loaded.")
+
+    if isinstance(audio, (str, os.PathLike)):
+        with open(audio, "rb") as f:
+            audio = f.read()
+    if isinstance(audio, (bytes, bytearray)):
+        audio = decode_audio(bytes(audio))
+    return predict_drone_batch([audio])[0]
+
+# Concurrent requests are grouped here and run on the batcher's own worker thread
+batcher = MicroBatcher(
+    predict_drone_batch,
+    max_batch_size=MAX_BATCH_SIZE,
+    max_wait_ms=BATCH_WINDOW_MS,
+    name="drone-batcher",
+)
+
+async def predict_drone_async(waveform: np.ndarray) -> Dict[str, Any]:
+    """Queue a decoded waveform for batched inference off the event loop"""
+    if classifier is None:
+        raise RuntimeError("Model not loaded.")
+    return await batcher.submit(waveform)
+
+# ---------------------------------------------------------------------------
+# Streaming detection over long recordings
+# ---------------------------------------------------------------------------
+
+class SlidingWindows:
+    """
+    Turns a stream of sample blocks into overlapping fixed-size windows.
+    Only keeps one window of audio buffered, whatever the stream length.
+    """
+
+    def __init__(self, window_size: int, hop_size: int):
+        if window_size <= 0 or hop_size <= 0:
+            raise ValueError("window and hop must be positive")
+        if hop_size > window_size:
+            # Windows would leave gaps that push() has no way to skip
+            raise ValueError("hop must not be longer than the window")
+        self.window_size = window_size
+        self.hop_size = hop_size
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._start = 0  # absolute sample index of _buffer[0]
+
+    def push(self, samples: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+        """Append samples, return every (start_sample, window) now complete"""
+        self._buffer = np.concatenate([self._buffer, samples.astype(np.float32, copy=False)])
+        ready = []
+        while len(self._buffer) >= self.window_size:
+            ready.append((self._start, self._buffer[:self.window_size].copy()))
+            self._buffer = self._buffer[self.hop_size:]
+            self._start += self.hop_size
+        return ready
+
+    def flush(self) -> List[Tuple[int, np.ndarray]]:
+        """Zero-pad the trailing partial window, if it holds any unseen audio"""
+        if len(self._buffer) <= self.window_size - self.hop_size:
+            return []
+        tail = np.zeros(self.window_size, dtype=np.float32)
+        tail[:len(self._buffer)] = self._buffer
+        self._buffer = np.zeros(0, dtype=np.float32)
+        return [(self._start, tail)]
+
+
+def iter_audio_blocks(file_path: str, block_seconds: float = 10.0) -> Iterator[np.ndarray]:
+    """Decode an audio file with ffmpeg and yield mono float32 blocks at the model rate"""
+    sampling_rate = get_sampling_rate()
+    block_bytes = int(block_seconds * sampling_rate) * 4
+    command = [
+        "ffmpeg", "-nostdin", "-i", file_path,
+        "-ac", "1", "-ar", str(sampling_rate),
+        "-f", "f32le", "-hide_banner", "-loglevel", "quiet", "pipe:1",
+    ]
+    with subprocess.Popen(command, stdout=subprocess.PIPE) as process:
+        while True:
+            raw = process.stdout.read(block_bytes)
+            if not raw:
+                break
+            # Keep whole float32 samples only
+            raw = raw[:len(raw) - len(raw) % 4]
+            yield np.frombuffer(raw, dtype="<f4")
+        if process.wait() != 0:
+            raise ValueError(f"Could not decode audio file (ffmpeg exit code {process.returncode})")
+
+
+def to_model_rate(samples: np.ndarray, sampling_rate: int) -> np.ndarray:
+    target = get_sampling_rate()
+    if sampling_rate == target:
+        return samples
+    g = np.gcd(int(sampling_rate), int(target))
+    return resample_poly(samples, target // g, sampling_rate // g).astype(np.float32)
+
+
+def _timeline_entries(windows: List[Tuple[int, np.ndarray]], window_size: int, sampling_rate: int) -> List[Dict[str, Any]]:
+    results = predict_drone_batch([w for _, w in windows])
+    return [
+        {
+            "start": round(start / sampling_rate, 3),
+            "end": round((start + window_size) / sampling_rate, 3),
+            "classification": r["classification"],
+            "confidence": r["confidence"],
+        }
+        for (start, _), r in zip(windows, results)
+    ]
+
+
+def detect_drone_timeline(file_path: str, window_seconds: float = 1.0, hop_seconds: float = 0.5, batch_size: int = MAX_BATCH_SIZE) -> List[Dict[str, Any]]:
+    """
+    Classify a recording of any length in overlapping windows.
+    Memory is bounded by one decode block plus one batch of windows.
+    """
+    if classifier is None:
+        raise RuntimeError("Model not loaded.")
+
+    sampling_rate = get_sampling_rate()
+    window_size = int(window_seconds * sampling_rate)
+    windows = SlidingWindows(window_size, int(hop_seconds * sampling_rate))
+    timeline, pending = [], []
+
+    for block in iter_audio_blocks(file_path):
+        pending.extend(windows.push(block))
+        while len(pending) >= batch_size:
+            timeline.extend(_timeline_entries(pending[:batch_size], window_size, sampling_rate))
+            pending = pending[batch_size:]
+
+    pending.extend(windows.flush())
+    if pending:
+        timeline.extend(_timeline_entries(pending, window_size, sampling_rate))
+    return timeline
@@ -0,0 +1,99 @@
+import io
+import numpy as np
+from typing import Dict, Tuple
+
+_DTYPES = {"float32": "<f4", "int16": "<i2"}
+# Default input rate: 10 s at 500 Hz = 5000 samples
+EXPECTED_SAMPLING_RATE = 500.0
+
+
+def parse_shape(shape: str) -> Tuple[int, ...]:
+    """'n_samples,n_leads' or 'n_records,n_samples,n_leads'"""
+    try:
+        dims = tuple(int(d) for d in shape.split(","))
+    except ValueError:
+        raise ValueError(f"Invalid shape '{shape}'")
+    if len(dims) not in (2, 3) or any(d <= 0 for d in dims):
+        raise ValueError(f"Shape must have 2 or 3 positive dimensions, got '{shape}'")
+    return dims
+
+
+def _as_batch(data: np.ndarray) -> np.ndarray:
+    if data.ndim == 2:
+        data = data[None]
+    if data.ndim != 3:
+        raise ValueError(f"Expected (n_samples, 12) or (n_records, n_samples, 12), got {data.shape}")
+    return data
+
+
+def decode_raw(buffer: bytes, dtype: str, shape: str, scale: float = 1.0) -> np.ndarray:
+    """
+    Decode a raw little-endian body without copying it: float32 comes back as
+    a read-only view of the request bytes. Returns (n_records, n_samples, n_leads).
+    """
+    if dtype not in _DTYPES:
+        raise ValueError(f"Unsupported dtype '{dtype}' (use float32 or int16)")
+    dims = parse_shape(shape)
+    data = np.frombuffer(buffer, dtype=_DTYPES[dtype])
+    if data.size != int(np.prod(dims)):
+        raise ValueError(f"Body holds {data.size} {dtype} values, shape {dims} needs {int(np.prod(dims))}")
+    data = data.reshape(dims)
+    if dtype == "int16" or scale != 1.0:
+        data = data.astype(np.float32) * np.float32(scale)
+    return _as_batch(data)
+
+
+def decode_npy(buffer: bytes) -> np.ndarray:
+    """(n_samples, 12) or (n_records, n_samples, 12) .npy file, no pickles"""
+    data = np.load(io.BytesIO(buffer), allow_pickle=False)
+    return _as_batch(np.asarray(data, dtype=np.float32))
+
+
+def parse_wfdb_header(text: str) -> Dict:
+    """Record line and per-signal format/gain/baseline from a WFDB .hea file"""
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip() and not ln.startswith("#")]
+    record = lines[0].split()
+    n_signals = int(record[1])
+    fs = float(record[2].split("/")[0]) if len(record) > 2 else 250.0
+    n_samples = int(record[3]) if len(record) > 3 else None
+
+    signals = []
+    for line in lines[1:1 + n_signals]:
+        fields = line.split()
+        fmt = fields[1].split("x")[0].split(":")[0].split("+")[0]
+        gain, baseline = 200.0, None
+        if len(fields) > 2:
+            spec = fields[2].split("/")[0]
+            if "(" in spec:
+                spec, base = spec.rstrip(")").split("(")
+                baseline = int(base)
+            gain = float(spec) or 200.0
+        adc_zero = int(fields[4]) if len(fields) > 4 else 0
+        signals.append({
+            "file": fields[0],
+            "format": fmt,
+            "gain": gain,
+            "baseline": adc_zero if baseline is None else baseline,
+            "name": " ".join(fields[8:]) if len(fields) > 8 else f"ch{len(signals)}",
+        })
+    return {"n_signals": n_signals, "fs": fs, "n_samples": n_samples, "signals": signals}
+
+
+def decode_wfdb(header_text: str, dat: bytes) -> Tuple[np.ndarray, float]:
+    """
+    Decode a single-file, format 16 WFDB record to physical units.
+    Returns a (1, n_samples, n_signals) array and the sampling rate.
+    """
+    header = parse_wfdb_header(header_text)
+    signals = header["signals"]
+    if any(s["format"] != "16" for s in signals) or len({s["file"] for s in signals}) != 1:
+        raise ValueError("Only single-file WFDB records in format 16 are supported")
+
+    n = header["n_signals"]
+    digital = np.frombuffer(dat[:len(dat) - len(dat) % (2 * n)], dtype="<i2").reshape(-1, n)
+    if header["n_samples"]:
+        digital = digital[:header["n_samples"]]
+    baseline = np.array([s["baseline"] for s in signals], dtype=np.float32)
+    gain = np.array([s["gain"] for s in signals], dtype=np.float32)
+    physical = (digital.astype(np.float32) - baseline) / gain
+    return physical[None], header["fs"]
@@ -1,44 +1,314 @@
+import asyncio
+import os
+import threading
+import hashlib
+from fractions import Fraction
+from functools import lru_cache
 import numpy as np
-from keras.models import load_model
-from keras.optimizers import Adam
-from scipy.signal import resample
-from typing import Tuple, Dict, Any, List
+from scipy.signal import firwin, resample_poly
+from typing import Tuple, Dict, Any, List, Optional
+from services.batcher import MicroBatcher
+from services.signal_store import save_recording
+from services.result_cache import DiskLRUCache, content_key
+from services.config import ECG_DATA_DIR, MODEL_BACKENDS
+from services.metrics import timed, observe, BATCH_BUCKETS
+from services.ecg_ingest import EXPECTED_SAMPLING_RATE
 
 LABELS = ['1dAVb', 'RBBB', 'LBBB', 'SB', 'AF', 'ST']
 
-def prepare_input(ecg_data: np.ndarray, scale_factor: float = 0.01, normalize: bool = True) -> np.ndarray:
-    ecg_data = ecg_data.astype(np.float32)
-    num_samples_new = 4000
-    resampled = resample(ecg_data, num_samples_new, axis=0)
-    padded = np.pad(resampled, ((0, 4096 - num_samples_new), (0, 0)), mode='constant')
-    scaled = padded * scale_factor
+MODEL_PATH = "model.hdf5"
+ECG_CACHE_DIR = "cache/ecg"
+ECG_CACHE_MAX_BYTES = int(os.environ.get("ECG_CACHE_MAX_BYTES", 64 * 1024 ** 2))
+BATCH_WINDOW_MS = float(os.environ.get("ECG_BATCH_WINDOW_MS", 5))
+MAX_BATCH_SIZE = int(os.environ.get("ECG_MAX_BATCH_SIZE", 32))
+# Records above this count skip the micro-batcher and run as bulk chunks
+BULK_CHUNK_SIZE = int(os.environ.get("ECG_BULK_CHUNK_SIZE", 256))
+
+# Model input: 4096 samples at 400 Hz, 12 leads (10 s of signal + zero padding)
+MODEL_SAMPLING_RATE = 400
+MODEL_LENGTH = 4096
+N_LEADS = 12
+
+BACKEND = MODEL_BACKENDS["ecg"]
+
+# Prediction results keyed by signal content + preprocessing parameters
+ecg_cache = DiskLRUCache(ECG_CACHE_DIR, ECG_CACHE_MAX_BYTES)
+
+# Resident model, shared by every request
+ecg_model = None
+# Backend ecg_model actually runs on (Keras if the ONNX artifact failed its parity check)
+loaded_backend: Optional[str] = None
+_model_lock = threading.Lock()
+
+
+def build_keras_model():
+    """The original Keras model (keras / TensorFlow are only imported here)"""
+    from keras.models import load_model
+    return load_model(MODEL_PATH, compile=False)
+
+
+def reference_batch(n: int = 32, seed: int = 0) -> np.ndarray:
+    """Parity set: 10 s ECG-like traces with varying heart rates, preprocessed like real requests"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(10 * EXPECTED_SAMPLING_RATE)) / EXPECTED_SAMPLING_RATE
+    heart_rates = rng.uniform(0.7, 2.5, (n, 1, 1))  # beats per second
+    beats = np.sin(np.pi * heart_rates * t[None, :, None]) ** 64 * 1000
+    traces = beats * rng.uniform(-1.0, 1.0, (n, 1, N_LEADS)) + rng.standard_normal((n, t.size, N_LEADS)) * 20
+    return prepare_batch(traces.astype(np.float32))
+
+
+def load_onnx_model(backend: str):
+    """ONNX Runtime model with Keras' predict(), or None to stay on Keras"""
+    from services import inference_backend
+
+    stat = os.stat(MODEL_PATH)
+    return inference_backend.load_converted(
+        "ecg", backend, f"{os.path.abspath(MODEL_PATH)}:{stat.st_size}:{stat.st_mtime_ns}",
+        load_original=build_keras_model,
+        export=inference_backend.export_keras,
+        make_runner=inference_backend.OnnxKerasModel,
+        reference_inputs=reference_batch,
+        original_probabilities=lambda model, batch: model.predict(batch, verbose=0),
+    )
+
+
+def load_ecg_model():
+    """Load the ECG model once (at startup or on first use)"""
+    global ecg_model, loaded_backend
+    with _model_lock:
+        if ecg_model is not None:
+            return ecg_model
+        try:
+            print(f"Loading ECG model from {MODEL_PATH}...")
+            loaded = load_onnx_model(BACKEND) if BACKEND != "native" else None
+            backend = BACKEND if loaded is not None else "native"
+            if loaded is None:
+                loaded = build_keras_model()
+            # Warm-up call so the first real request doesn't pay graph tracing
+            loaded.predict(np.zeros((1, 4096, 12), dtype=np.float32), verbose=0)
+            loaded_backend = backend
+            ecg_model = loaded
+            print("✅ ECG model loaded successfully!")
+        except Exception as e:
+            print(f"❌ Error loading ECG model: {e}")
+            ecg_model = None
+    return ecg_model
+
+
+def get_ecg_model():
+    if ecg_model is None and load_ecg_model() is None:
+        raise RuntimeError("ECG model not loaded.")
+    return ecg_model
+
+
+@lru_cache(maxsize=64)
+def resampling_plan(sampling_rate: float, n_samples: int) -> Dict[str, Any]:
+    """
+    Polyphase plan from `sampling_rate` to the model rate for records of
+    `n_samples`: up/down factors, the anti-aliasing FIR (designed once, as
+    resample_poly would) and the resampled length.
+    """
+    ratio = Fraction(MODEL_SAMPLING_RATE / sampling_rate).limit_denominator(1000)
+    up, down = ratio.numerator, ratio.denominator
+    taps = None
+    if up != down:
+        max_rate = max(up, down)
+        half_len = 10 * max_rate
+        # resample_poly applies the `up` gain itself, so the bare low-pass goes here
+        taps = firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0)).astype(np.float32)
+    return {
+        "up": up,
+        "down": down,
+        "taps": taps,
+        "length": min(MODEL_LENGTH, -(-n_samples * up // down)),
+    }
+
+
+@timed("ecg.prepare_input")
+def prepare_batch(ecg_batch: np.ndarray, sampling_rate: float = EXPECTED_SAMPLING_RATE,
+                  scale_factor: float = 0.01, normalize: bool = True,
+                  out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Vectorized preprocessing of a (B, n, 12) batch recorded at `sampling_rate`:
+    polyphase resampling to 400 Hz, zero padding (or cropping) to 4096 samples,
+    scaling and per-lead z-scoring. Everything is written in place into one
+    (B, 4096, 12) float32 buffer, which can be passed in as `out` and reused.
+    """
+    if ecg_batch.ndim != 3 or ecg_batch.shape[2] != N_LEADS or ecg_batch.shape[1] == 0:
+        raise ValueError(f"Expected signals shape (n_records, n_samples, {N_LEADS}), got {ecg_batch.shape}")
+    batch_size, n_samples, _ = ecg_batch.shape
+    if out is None:
+        out = np.empty((batch_size, MODEL_LENGTH, N_LEADS), dtype=np.float32)
+    else:
+        out = out[:batch_size]
+
+    plan = resampling_plan(float(sampling_rate), n_samples)
+    length = plan["length"]
+    if plan["taps"] is None:
+        out[:, :length] = ecg_batch[:, :length]
+    else:
+        resampled = resample_poly(ecg_batch.astype(np.float32, copy=False), plan["up"], plan["down"],
+                                  axis=1, window=plan["taps"])
+        out[:, :length] = resampled[:, :length]
+    out[:, length:] = 0.0
+
+    out *= np.float32(scale_factor)
     if normalize:
-        mean = np.mean(scaled, axis=0, keepdims=True)
-        std = np.std(scaled, axis=0, keepdims=True) + 1e-8
-        scaled = (scaled - mean) / std
-    return np.expand_dims(scaled, axis=0)
+        # Stats include the zero padding, as the model was trained that way
+        out -= out.mean(axis=1, keepdims=True)
+        out /= out.std(axis=1, keepdims=True) + np.float32(1e-8)
+    return out
+
+
+def prepare_input(ecg_data: np.ndarray, scale_factor: float = 0.01, normalize: bool = True,
+                  sampling_rate: float = EXPECTED_SAMPLING_RATE) -> np.ndarray:
+    """Single (n, 12) record → (1, 4096, 12) model input"""
+    return prepare_batch(np.asarray(ecg_data)[None], sampling_rate, scale_factor, normalize)
+
+
+@timed("ecg.run_inference")
+def run_batch_inference(input_batch: np.ndarray) -> np.ndarray:
+    """Run one model.predict over a (B, 4096, 12) batch, returns (B, n_labels) probabilities"""
+    observe("inference_batch_size", len(input_batch), BATCH_BUCKETS, help="Records per model call", model="ecg")
+    return get_ecg_model().predict(input_batch, verbose=0)
+
 
 def run_inference(input_data: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-    model_path = "model.hdf5"
-    print(f"Loading fresh ECG model from {model_path} for inference...")
-    model = load_model(model_path, compile=False)
-    model.compile(loss='binary_crossentropy', optimizer=Adam())
-    print("Fresh model loaded successfully!")
-    probs = model.predict(input_data, verbose=0)
+    probs = run_batch_inference(input_data)
     binary = (probs > 0.5).astype(int)[0]
     return probs[0], binary
 
-def predict_ecg(signals_2d: List[List[float]], scale_factor: float = 0.01, normalize: bool = True) -> Dict[str, Any]:
-    """Full pipeline: signals array → prep → predict"""
-    ecg_data = np.array(signals_2d)
-    if ecg_data.shape != (5000, 12):
-        raise ValueError(f"Expected signals shape (5000, 12), got {ecg_data.shape}")
-    input_data = prepare_input(ecg_data, scale_factor, normalize)
-    probs, binary = run_inference(input_data)
-    results = {
+
+def _predict_stacked(inputs: List[np.ndarray]) -> List[np.ndarray]:
+    """Batcher callback: stack (1, 4096, 12) inputs into one tensor"""
+    probs = run_batch_inference(np.concatenate(inputs, axis=0))
+    return list(probs)
+
+
+batcher = MicroBatcher(
+    _predict_stacked,
+    max_batch_size=MAX_BATCH_SIZE,
+    max_wait_ms=BATCH_WINDOW_MS,
+    name="ecg-batcher",
+)
+
+
+def _validate(signals_2d) -> np.ndarray:
+    ecg_data = np.asarray(signals_2d)
+    if ecg_data.ndim != 2 or ecg_data.shape[1] != N_LEADS or ecg_data.shape[0] == 0:
+        raise ValueError(f"Expected signals shape (n_samples, {N_LEADS}), got {ecg_data.shape}")
+    return ecg_data
+
+
+def _signal_digest(ecg_data: np.ndarray) -> str:
+    data = np.ascontiguousarray(ecg_data, dtype="<f8")
+    digest = hashlib.sha256(str(data.shape).encode())
+    digest.update(data.tobytes())
+    return digest.hexdigest()
+
+
+def prediction_key(ecg_data: np.ndarray, sampling_rate: float, scale_factor: float, normalize: bool) -> str:
+    # Keyed by the model file and the backend serving it, so neither a backend
+    # switch nor a replaced model.hdf5 returns stale predictions. Built without
+    # loading the model: before it loads, the configured backend is used, and
+    # entries are only written under it once that backend is what loaded.
+    stat = os.stat(MODEL_PATH)
+    model = {"path": os.path.abspath(MODEL_PATH), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+             "backend": loaded_backend or BACKEND}
+    params = {"sampling_rate": sampling_rate, "scale_factor": scale_factor, "normalize": normalize, "model": model}
+    return content_key(_signal_digest(ecg_data), params)
+
+
+def format_results(probs: np.ndarray) -> Dict[str, Any]:
+    binary = (probs > 0.5).astype(int)
+    return {
         "probabilities": {label: float(prob) for label, prob in zip(LABELS, probs)},
         "predictions": {label: int(pred) for label, pred in zip(LABELS, binary)},
         "summary": [label for label, pred in zip(LABELS, binary) if pred == 1]
     }
-    
+
+
+def predict_ecg_bulk(batch: np.ndarray, sampling_rate: float = EXPECTED_SAMPLING_RATE,
+                     scale_factor: float = 0.01, normalize: bool = True,
+                     chunk_size: int = BULK_CHUNK_SIZE) -> np.ndarray:
+    """
+    Probabilities for a large (B, n, 12) batch, preprocessed and predicted
+    chunk by chunk through one reused input buffer. Returns (B, n_labels).
+    """
+    buffer = np.empty((min(chunk_size, len(batch)), MODEL_LENGTH, N_LEADS), dtype=np.float32)
+    probs = []
+    for start in range(0, len(batch), chunk_size):
+        inputs = prepare_batch(batch[start:start + chunk_size], sampling_rate, scale_factor, normalize, out=buffer)
+        probs.append(run_batch_inference(inputs))
+    return np.concatenate(probs, axis=0)
+
+
+def predict_ecg(signals_2d, scale_factor: float = 0.01, normalize: bool = True,
+                sampling_rate: float = EXPECTED_SAMPLING_RATE) -> Dict[str, Any]:
+    """Full pipeline: signals array → prep → predict"""
+    ecg_data = _validate(signals_2d)
+    key = prediction_key(ecg_data, sampling_rate, scale_factor, normalize)
+    cached = ecg_cache.get_json(key)
+    if cached is not None:
+        return cached
+
+    input_data = prepare_input(ecg_data, scale_factor, normalize, sampling_rate)
+    probs, _ = run_inference(input_data)
+    results = format_results(probs)
+    ecg_cache.put_json(key, results)
     return results
+
+
+async def predict_ecg_records(batch: np.ndarray, sampling_rate: float = EXPECTED_SAMPLING_RATE,
+                              scale_factor: float = 0.01, normalize: bool = True) -> List[Dict[str, Any]]:
+    """
+    Predict every record of an (n_records, n_samples, 12) batch. Cached records
+    are skipped, the rest are preprocessed in one vectorized pass. Small batches
+    share model.predict calls with concurrent requests through the batcher;
+    large ones run as bulk chunks in a worker thread.
+    """
+    if batch.ndim != 3:
+        raise ValueError(f"Expected signals shape (n_records, n_samples, {N_LEADS}), got {batch.shape}")
+    # Hashing and cache reads touch the disk, keep them off the event loop
+    keys = await asyncio.to_thread(
+        lambda: [prediction_key(record, sampling_rate, scale_factor, normalize) for record in batch])
+    results = await asyncio.to_thread(lambda: [ecg_cache.get_json(key) for key in keys])
+    missing = [i for i, result in enumerate(results) if result is None]
+    if not missing:
+        return results
+
+    todo = batch[missing]
+    if len(missing) > MAX_BATCH_SIZE:
+        probs = await asyncio.to_thread(predict_ecg_bulk, todo, sampling_rate, scale_factor, normalize)
+    else:
+        # Resampling and filtering are CPU work too, keep them off the event loop
+        inputs = await asyncio.to_thread(prepare_batch, todo, sampling_rate, scale_factor, normalize)
+        probs = await asyncio.gather(*(batcher.submit(inputs[i:i + 1]) for i in range(len(missing))))
+
+    for i, record_probs in zip(missing, probs):
+        results[i] = format_results(record_probs)
+    await asyncio.to_thread(lambda: [ecg_cache.put_json(keys[i], results[i]) for i in missing])
+    return results
+
+
+async def predict_ecg_batched(signals_2d, scale_factor: float = 0.01, normalize: bool = True,
+                              sampling_rate: float = EXPECTED_SAMPLING_RATE) -> Dict[str, Any]:
+    """
+    Same as predict_ecg, but shares a model.predict call with concurrent requests.
+    Accepts nested lists or an already decoded (n_samples, 12) array.
+    """
+    ecg_data = _validate(signals_2d)
+    results = await predict_ecg_records(ecg_data[None], sampling_rate, scale_factor, normalize)
+    return results[0]
+
+
+def save_ecg_record(signals_2d: List[List[float]], leads: List[str], sampling_rate: float) -> str:
+    """Store an ECG payload (n_samples x n_leads) with its plotting pyramid, returns the record id"""
+    ecg_data = np.asarray(signals_2d, dtype=np.float32)
+    if ecg_data.ndim != 2 or ecg_data.shape[1] != len(leads):
+        raise ValueError(f"Expected signals shape (n_samples, {len(leads)}), got {ecg_data.shape}")
+    # Content-addressed: storing the same ECG twice is a no-op
+    record_id = content_key(_signal_digest(ecg_data), {"leads": leads, "samplingRate": sampling_rate})
+    if not os.path.exists(os.path.join(ECG_DATA_DIR, f"{record_id}.json")):
+        save_recording(leads, ecg_data.T, sampling_rate, record_id, ECG_DATA_DIR)
+    return record_id
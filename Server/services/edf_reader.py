@@ -0,0 +1,139 @@
+import queue
+import numpy as np
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+
+# Scale factors from an EDF physical dimension to microvolts
+_UNIT_TO_UV = {"uv": 1.0, "µv": 1.0, "mv": 1e3, "v": 1e6, "nv": 1e-3}
+
+
+def _read_exact(stream: BinaryIO, n: int) -> bytes:
+    """Read n bytes from a (possibly non-seekable) stream, fewer only at EOF"""
+    chunks, remaining = [], n
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _fields(raw: bytes, ns: int, width: int) -> List[str]:
+    return [raw[i * width:(i + 1) * width].decode("latin-1").strip() for i in range(ns)]
+
+
+def read_edf_header(stream: BinaryIO) -> Dict[str, Any]:
+    """
+    Parse the fixed EDF/EDF+ header from the start of a stream.
+    Leaves the stream positioned at the first data record.
+    """
+    main = _read_exact(stream, 256)
+    if len(main) < 256:
+        raise ValueError("File is too short to be an EDF file")
+
+    ns = int(main[252:256].decode("latin-1").strip())
+    signal_header = _read_exact(stream, ns * 256)
+    if len(signal_header) < ns * 256:
+        raise ValueError("Truncated EDF signal header")
+
+    widths = [("labels", 16), ("transducers", 80), ("units", 8), ("physical_min", 8),
+              ("physical_max", 8), ("digital_min", 8), ("digital_max", 8),
+              ("prefilters", 80), ("samples_per_record", 8), ("reserved", 32)]
+    fields, offset = {}, 0
+    for name, width in widths:
+        fields[name] = _fields(signal_header[offset:offset + ns * width], ns, width)
+        offset += ns * width
+
+    header = {
+        "n_records": int(main[236:244].decode("latin-1").strip()),
+        "record_duration": float(main[244:252].decode("latin-1").strip()),
+        "n_signals": ns,
+        "labels": fields["labels"],
+        "units": fields["units"],
+        "samples_per_record": [int(n) for n in fields["samples_per_record"]],
+    }
+    physical_min = np.array(fields["physical_min"], dtype=np.float64)
+    physical_max = np.array(fields["physical_max"], dtype=np.float64)
+    digital_min = np.array(fields["digital_min"], dtype=np.float64)
+    digital_max = np.array(fields["digital_max"], dtype=np.float64)
+    header["gain"] = (physical_max - physical_min) / (digital_max - digital_min)
+    header["offset"] = physical_min - digital_min * header["gain"]
+    return header
+
+
+def signal_rate(header: Dict[str, Any], index: int) -> float:
+    return header["samples_per_record"][index] / header["record_duration"]
+
+
+def iter_edf_blocks(stream: BinaryIO, header: Dict[str, Any], picks: List[int],
+                    records_per_block: int = 30) -> Iterator[np.ndarray]:
+    """
+    Yield (n_picks, n_samples) float64 blocks in microvolts, a few data records
+    at a time. Only one block of the file is held in memory.
+    """
+    samples = header["samples_per_record"]
+    if len({samples[i] for i in picks}) != 1:
+        raise ValueError("Selected channels must share one sampling rate")
+
+    starts = np.concatenate([[0], np.cumsum(samples)])
+    record_width = int(starts[-1])
+    n = samples[picks[0]]
+    gain = np.array([header["gain"][i] for i in picks])[:, None]
+    offset = np.array([header["offset"][i] for i in picks])[:, None]
+    to_uv = np.array([_UNIT_TO_UV.get(header["units"][i].lower(), 1.0) for i in picks])[:, None]
+
+    remaining = header["n_records"]
+    while remaining != 0:
+        k = records_per_block if remaining < 0 else min(records_per_block, remaining)
+        raw = _read_exact(stream, k * record_width * 2)
+        k = len(raw) // (record_width * 2)  # drop a trailing partial record
+        if k == 0:
+            break
+        records = np.frombuffer(raw[:k * record_width * 2], dtype="<i2").reshape(k, record_width)
+        block = np.stack([records[:, starts[i]:starts[i] + n].reshape(-1) for i in picks])
+        yield (block * gain + offset) * to_uv
+        if remaining > 0:
+            remaining -= k
+
+
+class ChunkQueueReader:
+    """
+    Blocking file-like reader fed with byte chunks from another thread,
+    so a request body can be parsed while it is still arriving.
+    """
+
+    def __init__(self, max_chunks: int = 64):
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=max_chunks)
+        self._pending = b""
+        self._closed = False
+        self._discarded = False
+
+    def feed(self, chunk: bytes):
+        if chunk and not self._discarded:
+            self._queue.put(chunk)
+
+    def close(self):
+        if not self._discarded:
+            self._queue.put(None)
+
+    def discard(self):
+        """Called by the reader when it stops early, so a blocked feed() returns"""
+        self._discarded = True
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def read(self, n: int = -1) -> bytes:
+        while not self._closed and (n < 0 or len(self._pending) < n):
+            chunk = self._queue.get()
+            if chunk is None:
+                self._closed = True
+                break
+            self._pending += chunk
+        if n < 0:
+            data, self._pending = self._pending, b""
+        else:
+            data, self._pending = self._pending[:n], self._pending[n:]
+        return data
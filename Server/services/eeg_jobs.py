@@ -0,0 +1,184 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+from services.eeg_service import preprocess_edf, cached_recording, eeg_cache, EEG_DATA_DIR
+
+MAX_WORKERS = int(os.environ.get("EEG_JOB_WORKERS", os.cpu_count() or 1))
+# Finished, failed and cancelled jobs stay listed this long, then are forgotten
+JOB_TTL_SECONDS = float(os.environ.get("EEG_JOB_TTL_SECONDS", 3600))
+
+# Parent-side job table
+_jobs: Dict[str, Dict[str, Any]] = {}
+_futures = {}
+_lock = threading.Lock()
+
+_pool: Optional[ProcessPoolExecutor] = None
+_manager = None
+# Manager dicts shared with the worker processes
+_progress = None
+_cancelled = None
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _init_worker(progress, cancelled):
+    global _progress, _cancelled
+    _progress, _cancelled = progress, cancelled
+
+
+def _run_job(job_id: str, file_path: str, recording_id: str, output_dir: str):
+    """Runs in a worker process"""
+    def report(fraction: float):
+        _progress[job_id] = fraction
+        if job_id in _cancelled:
+            raise JobCancelled(job_id)
+
+    report(0.0)
+    try:
+        channels, sfreq, header_path = preprocess_edf(file_path, recording_id, output_dir, progress=report)
+    finally:
+        os.unlink(file_path)
+    eeg_cache.evict(protect=recording_id)
+    return {"channels": channels, "samplingRate": sfreq, "header_path": header_path}
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool, _manager, _progress, _cancelled
+    with _lock:
+        if _pool is None:
+            _manager = multiprocessing.Manager()
+            _progress = _manager.dict()
+            _cancelled = _manager.dict()
+            _pool = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS,
+                initializer=_init_worker,
+                initargs=(_progress, _cancelled),
+            )
+    return _pool
+
+
+def _forget_worker_state(job_ids: List[str]):
+    """Drop the shared progress / cancel flags of jobs that are over"""
+    if _progress is None:
+        return
+    for job_id in job_ids:
+        _progress.pop(job_id, None)
+        _cancelled.pop(job_id, None)
+
+
+def _expire_jobs():
+    """Remove jobs that finished more than JOB_TTL_SECONDS ago"""
+    cutoff = time.time() - JOB_TTL_SECONDS
+    with _lock:
+        expired = [job_id for job_id, job in _jobs.items() if job.get("finished_at", float("inf")) < cutoff]
+        for job_id in expired:
+            del _jobs[job_id]
+            _futures.pop(job_id, None)
+    # A cancel racing with completion can set a flag after _on_done cleared it
+    _forget_worker_state(expired)
+
+
+def _on_done(job_id: str, future):
+    _forget_worker_state([job_id])
+    with _lock:
+        _futures.pop(job_id, None)
+        job = _jobs[job_id]
+        job["finished_at"] = time.time()
+        if future.cancelled():
+            # Never started, so the worker did not clean up the upload
+            job["status"] = "cancelled"
+            if os.path.exists(job["_file_path"]):
+                os.unlink(job["_file_path"])
+            return
+        error = future.exception()
+        if isinstance(error, JobCancelled):
+            job["status"] = "cancelled"
+        elif error is not None:
+            job["status"] = "failed"
+            job["error"] = str(error)
+        else:
+            job["status"] = "done"
+            job["progress"] = 1.0
+            job["result"] = future.result()
+
+
+def submit_job(file_path: str, filename: str, recording_id: str, output_dir: str = EEG_DATA_DIR) -> Dict[str, Any]:
+    """
+    Queue preprocessing of an EDF already saved at `file_path` (the worker
+    deletes it when done). `recording_id` is the content key, so a recording
+    that is already in the cache completes immediately. Returns the job record.
+    """
+    _expire_jobs()
+    job_id = uuid.uuid4().hex
+    job = {
+        "job_id": job_id,
+        "filename": filename,
+        "recording_id": recording_id,
+        "status": "queued",
+        "progress": 0.0,
+        "submitted_at": time.time(),
+        "_file_path": file_path,
+    }
+
+    hit = cached_recording(recording_id, output_dir)
+    if hit is not None:
+        os.unlink(file_path)
+        channels, sfreq, header_path = hit
+        job.update(status="done", progress=1.0, finished_at=time.time(),
+                   result={"channels": channels, "samplingRate": sfreq, "header_path": header_path})
+        with _lock:
+            _jobs[job_id] = job
+        return get_job(job_id)
+
+    pool = _get_pool()
+    with _lock:
+        _jobs[job_id] = job
+        future = pool.submit(_run_job, job_id, file_path, recording_id, output_dir)
+        _futures[job_id] = future
+    future.add_done_callback(lambda f: _on_done(job_id, f))
+    return get_job(job_id)
+
+
+def get_job(job_id: str) -> Dict[str, Any]:
+    with _lock:
+        if job_id not in _jobs:
+            raise KeyError(f"Job not found: {job_id}")
+        job = {k: v for k, v in _jobs[job_id].items() if not k.startswith("_")}
+    if job["status"] in ("queued", "running") and _progress is not None:
+        fraction = _progress.get(job_id)
+        if fraction is not None:
+            job["status"] = "running"
+            job["progress"] = round(fraction, 4)
+    return job
+
+
+def list_jobs() -> List[Dict[str, Any]]:
+    _expire_jobs()
+    with _lock:
+        job_ids = list(_jobs)
+    jobs = []
+    for job_id in job_ids:
+        try:
+            jobs.append(get_job(job_id))
+        except KeyError:
+            pass  # expired in between
+    return jobs
+
+
+def cancel_job(job_id: str) -> Dict[str, Any]:
+    """Cancel a queued job, or ask a running one to stop at its next block"""
+    job = get_job(job_id)
+    if job["status"] in ("queued", "running"):
+        _cancelled[job_id] = True
+        with _lock:
+            future = _futures.get(job_id)
+        # Only succeeds if the job has not started yet
+        if future is not None:
+            future.cancel()
+    return get_job(job_id)
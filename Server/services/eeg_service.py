@@ -1,56 +1,241 @@
 import json
 import os
-from pathlib import Path
-import mne
+import uuid
 import numpy as np
-from typing import List, Tuple
-
-def preprocess_edf(file_path: str, output_dir: str = "static/eegdata") -> Tuple[List[str], np.ndarray, float]:
-    """
-    Load EDF, filter (1-30 Hz bandpass), select 18 channels, extract data.
-    Returns channels, data array (n_channels x n_times), sfreq.
-    """
-    # Load raw EDF
-    raw = mne.io.read_raw_edf(file_path, preload=True)
-    
-    # Define standard 18 bipolar channels for CHB-MIT
-    standard_channels = [
-        'FP1-F7', 'F7-T7', 'T7-FT9', 'FT9-TT9', 'TT9-T9', 'T9-P9', 'P9-O9',
-        'FP1-F3', 'F3-C3', 'C3-P3', 'P3-O1', 'FP2-F4', 'F4-C4', 'C4-P4',
-        'P4-O2', 'F8-T8', 'T8-FT10', 'FT10-TT10'
-    ]
-    
-    # Select available channels (prioritize standard, fallback to first 18)
-    available_standard = [ch for ch in standard_channels if ch in raw.ch_names]
-    if len(available_standard) < 18:
-        available_standard = raw.ch_names[:18]
-    raw.pick_channels(available_standard)
-    
-    # Preprocess: Bandpass filter 1-30 Hz (common for seizure detection)
-    raw.filter(l_freq=1.0, h_freq=30.0, fir_design='firwin')
-
-    # Resample to 128 Hz
-    raw.resample(128)
-    
-   
-    data = raw.get_data()*1e6  # Shape: (n_channels, n_times)
-    sfreq = raw.info['sfreq']
-    
-    return available_standard, data, sfreq
-
-def save_preprocessed_to_json(channels: List[str], data: np.ndarray, sfreq: float, filename: str, output_dir: str = "static/eegdata"):
-    """Save preprocessed data as JSON."""
-    os.makedirs(output_dir, exist_ok=True)
-    json_path = Path(output_dir) / f"{filename}.json"
-    
-    # Convert numpy to lists for JSON
-    json_data = {
-        "channels": channels,
-        "samplingRate": float(sfreq),
-        "data": data.tolist()  # List of lists: each sublist is a channel's time series
-    }
-    
-    with open(json_path, 'w') as f:
-        json.dump(json_data, f, indent=2)
-    
-    return str(json_path)
\ No newline at end of file
+from fractions import Fraction
+from scipy.signal import firwin, oaconvolve, resample_poly
+from typing import BinaryIO, Callable, List, Optional, Tuple
+from services.edf_reader import read_edf_header, iter_edf_blocks, signal_rate
+from services.signal_store import save_recording, RecordingWriter, delete_recording, rename_recording
+from services.result_cache import DiskLRUCache, HashingReader, content_key, hash_stream
+from services.config import EEG_DATA_DIR
+from services.metrics import span
+
+EEG_CACHE_MAX_BYTES = int(os.environ.get("EEG_CACHE_MAX_BYTES", 20 * 1024 ** 3))
+
+# Define standard 18 bipolar channels for CHB-MIT
+STANDARD_CHANNELS = [
+    'FP1-F7', 'F7-T7', 'T7-FT9', 'FT9-TT9', 'TT9-T9', 'T9-P9', 'P9-O9',
+    'FP1-F3', 'F3-C3', 'C3-P3', 'P3-O1', 'FP2-F4', 'F4-C4', 'C4-P4',
+    'P4-O2', 'F8-T8', 'T8-FT10', 'FT10-TT10'
+]
+
+L_FREQ = 1.0
+H_FREQ = 30.0
+TARGET_SFREQ = 128
+# Seconds of input processed per block; bounds peak memory
+BLOCK_SECONDS = 60
+
+# Everything that changes the output goes into the cache key
+EEG_CACHE_PARAMS = {
+    "l_freq": L_FREQ,
+    "h_freq": H_FREQ,
+    "target_sfreq": TARGET_SFREQ,
+    "channels": STANDARD_CHANNELS,
+    "pipeline": "firwin-resample_poly-v1",
+}
+
+# Recordings are stored under their content key, so the store is the cache
+eeg_cache = DiskLRUCache(EEG_DATA_DIR, EEG_CACHE_MAX_BYTES)
+
+
+def select_channels(labels: List[str]) -> List[int]:
+    """Indices of the channels to keep (prioritize standard, fallback to first 18)"""
+    picks = [labels.index(ch) for ch in STANDARD_CHANNELS if ch in labels]
+    if len(picks) < 18:
+        picks = [i for i, label in enumerate(labels) if label != "EDF Annotations"][:18]
+    return picks
+
+
+class BandpassResampler:
+    """
+    1-30 Hz linear-phase FIR bandpass followed by polyphase resampling,
+    applied block by block. Each block is processed with enough overlap on
+    both sides (overlap-save) that the output matches filtering the whole
+    signal at once, while only one block plus its margins is held in memory.
+    """
+
+    def __init__(self, sfreq: float, target_sfreq: float = TARGET_SFREQ,
+                 l_freq: float = L_FREQ, h_freq: float = H_FREQ, block_seconds: float = BLOCK_SECONDS):
+        ratio = Fraction(target_sfreq / sfreq).limit_denominator(1000)
+        self.up, self.down = ratio.numerator, ratio.denominator
+
+        # Transition band like MNE's default (1 Hz at l_freq=1), ~3.3 / bandwidth seconds long
+        transition = min(max(0.25 * l_freq, 2.0), l_freq)
+        numtaps = int(np.ceil(3.3 / transition * sfreq)) | 1
+        self.taps = firwin(numtaps, [l_freq, h_freq], pass_zero=False, fs=sfreq)
+
+        # Margin covering the FIR support plus the resampling filter, in whole `down` steps
+        margin = numtaps // 2 + int(np.ceil(10 * max(self.up, self.down) / self.up)) + 1
+        self.margin = -(-margin // self.down) * self.down
+        self.block = max(1, int(block_seconds * sfreq) // self.down) * self.down
+
+        self._buffer = None
+        self._buffer_start = 0  # absolute input index of _buffer[:, 0]
+        self._next = 0          # absolute input index of the next block to emit
+
+    def _process(self, stop: int, final: bool) -> np.ndarray:
+        seg_start = max(0, self._next - self.margin)
+        seg_stop = stop if final else stop + self.margin
+        segment = self._buffer[:, seg_start - self._buffer_start:seg_stop - self._buffer_start]
+        with span("eeg.filter"):
+            filtered = oaconvolve(segment, self.taps[None, :], mode="same", axes=1)
+        with span("eeg.resample"):
+            resampled = resample_poly(filtered, self.up, self.down, axis=1)
+        lead = (self._next - seg_start) * self.up // self.down
+        count = -(-(stop - self._next) * self.up // self.down)
+        self._next = stop
+        return resampled[:, lead:lead + count]
+
+    def push(self, samples: np.ndarray) -> List[np.ndarray]:
+        """Add input samples, return any finished output blocks"""
+        if self._buffer is None:
+            self._buffer = samples
+        else:
+            self._buffer = np.concatenate([self._buffer, samples], axis=1)
+
+        out = []
+        buffer_end = self._buffer_start + self._buffer.shape[1]
+        while self._next + self.block + self.margin <= buffer_end:
+            out.append(self._process(self._next + self.block, final=False))
+            # Keep only the look-back margin for the next block
+            keep_from = max(0, self._next - self.margin)
+            self._buffer = self._buffer[:, keep_from - self._buffer_start:]
+            self._buffer_start = keep_from
+        return out
+
+    def flush(self) -> List[np.ndarray]:
+        """Process whatever input is left at the end of the recording"""
+        if self._buffer is None:
+            return []
+        buffer_end = self._buffer_start + self._buffer.shape[1]
+        if buffer_end <= self._next:
+            return []
+        return [self._process(buffer_end, final=True)]
+
+    def output_length(self, n_input: int) -> int:
+        return -(-n_input * self.up // self.down)
+
+
+def preprocess_edf_stream(stream: BinaryIO, recording_id: str, output_dir: str = EEG_DATA_DIR,
+                          progress: Optional[Callable[[float], None]] = None) -> Tuple[List[str], float, str]:
+    """
+    Read an EDF from a (possibly non-seekable) stream, select 18 channels,
+    filter (1-30 Hz bandpass) and resample to 128 Hz block by block, writing
+    each block straight into the recording store.
+    `progress` is called with the fraction done after each block; an exception
+    raised from it aborts processing and removes the partial output.
+    Returns channels, sfreq and the stored header path.
+    """
+    header = read_edf_header(stream)
+    if header["n_records"] < 0:
+        raise ValueError("EDF files with an unknown number of records are not supported")
+
+    picks = select_channels(header["labels"])
+    channels = [header["labels"][i] for i in picks]
+    sfreq = signal_rate(header, picks[0])
+
+    pipeline = BandpassResampler(sfreq)
+    n_input = header["n_records"] * header["samples_per_record"][picks[0]]
+    writer = RecordingWriter(channels, TARGET_SFREQ, pipeline.output_length(n_input), recording_id, output_dir)
+
+    try:
+        done = 0
+        blocks = iter_edf_blocks(stream, header, picks)
+        while True:
+            with span("eeg.read"):
+                block = next(blocks, None)
+            if block is None:
+                break
+            for out in pipeline.push(block):
+                with span("eeg.serialize"):
+                    writer.write(out)
+            done += block.shape[1]
+            if progress is not None:
+                progress(done / max(1, n_input))
+        for out in pipeline.flush():
+            with span("eeg.serialize"):
+                writer.write(out)
+    except BaseException:
+        writer.abort()
+        raise
+
+    with span("eeg.serialize"):
+        # Pyramid and header
+        return channels, float(TARGET_SFREQ), writer.close()
+
+
+def preprocess_edf(file_path: str, recording_id: str, output_dir: str = EEG_DATA_DIR,
+                   progress: Optional[Callable[[float], None]] = None) -> Tuple[List[str], float, str]:
+    """
+    Preprocess an EDF file on disk into the recording store.
+    Returns channels, sfreq and the stored header path.
+    """
+    with open(file_path, "rb") as f:
+        return preprocess_edf_stream(f, recording_id, output_dir, progress)
+
+
+def save_preprocessed(channels: List[str], data: np.ndarray, sfreq: float, filename: str, output_dir: str = EEG_DATA_DIR) -> str:
+    """
+    Save preprocessed data as a float32 .npy array, its min/max plotting
+    pyramid and a small JSON header. Returns the header path.
+    """
+    return save_recording(channels, data, sfreq, filename, output_dir)
+
+
+def recording_key(content_digest: str) -> str:
+    """Recording id for an EDF's sha256 under the current preprocessing parameters"""
+    return content_key(content_digest, EEG_CACHE_PARAMS)
+
+
+def cached_recording(recording_id: str, output_dir: str = EEG_DATA_DIR) -> Optional[Tuple[List[str], float, str]]:
+    """Channels, sfreq and header path of an already preprocessed recording, if any"""
+    if not eeg_cache.contains(recording_id):
+        return None
+    eeg_cache.touch(recording_id)
+    header_path = os.path.join(output_dir, f"{recording_id}.json")
+    with open(header_path) as f:
+        header = json.load(f)
+    return header["channels"], header["samplingRate"], header_path
+
+
+def preprocess_edf_cached(file_obj: BinaryIO, output_dir: str = EEG_DATA_DIR) -> Tuple[List[str], float, str, str]:
+    """
+    Preprocess a seekable EDF unless the same content was already processed.
+    Returns channels, sfreq, header path and recording id.
+    """
+    recording_id = recording_key(hash_stream(file_obj))
+    file_obj.seek(0)
+
+    hit = cached_recording(recording_id, output_dir)
+    if hit is not None:
+        return (*hit, recording_id)
+
+    channels, sfreq, header_path = preprocess_edf_stream(file_obj, recording_id, output_dir)
+    eeg_cache.evict(protect=recording_id)
+    return channels, sfreq, header_path, recording_id
+
+
+def preprocess_edf_stream_cached(stream: BinaryIO, output_dir: str = EEG_DATA_DIR) -> Tuple[List[str], float, str, str]:
+    """
+    Preprocess a non-seekable EDF stream, hashing it on the way through.
+    The content key is only known at the end, so the output is written under
+    a temporary id and then moved (or dropped if it was already cached).
+    Returns channels, sfreq, header path and recording id.
+    """
+    reader = HashingReader(stream)
+    temp_id = f"tmp-{uuid.uuid4().hex}"
+    channels, sfreq, _ = preprocess_edf_stream(reader, temp_id, output_dir)
+    # Hash any trailing bytes too
+    while reader.read(1 << 20):
+        pass
+
+    recording_id = recording_key(reader.hexdigest())
+    hit = cached_recording(recording_id, output_dir)
+    if hit is not None:
+        delete_recording(temp_id, output_dir)
+        return (*hit, recording_id)
+
+    header_path = rename_recording(temp_id, recording_id, output_dir)
+    eeg_cache.evict(protect=recording_id)
+    return channels, sfreq, header_path, recording_id
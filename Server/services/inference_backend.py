@@ -0,0 +1,198 @@
+import fcntl
+import gc
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from services.config import ONNX_CACHE_DIR
+
+# Largest allowed |probability difference| between a converted model and the original
+PARITY_TOLERANCE = float(os.environ.get("ONNX_PARITY_TOLERANCE", 0.05))
+OPSET = 17
+
+
+def artifact_path(name: str, backend: str, source_key: str) -> str:
+    """Converted model location, keyed by what it was converted from"""
+    digest = hashlib.sha256(f"{source_key}:{OPSET}".encode()).hexdigest()[:12]
+    return os.path.join(ONNX_CACHE_DIR, f"{name}-{backend}-{digest}.onnx")
+
+
+@contextmanager
+def _exclusive(path: str):
+    """Cross-process lock, so only one worker converts a model while the others wait"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def create_session(path: str):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    # Same per-worker budget as the BLAS pools (set by serve.py --threads); 0 = all cores
+    options.intra_op_num_threads = int(os.environ.get("OMP_NUM_THREADS", 0))
+    options.inter_op_num_threads = 1
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class OnnxAudioClassifier:
+    """Called like the transformers audio-classification pipeline it was exported from"""
+
+    def __init__(self, path: str, feature_extractor, labels: List[str]):
+        self.session = create_session(path)
+        self.feature_extractor = feature_extractor
+        self.labels = labels
+        self._inputs = [i.name for i in self.session.get_inputs()]
+
+    def probabilities(self, waveforms: List[np.ndarray]) -> np.ndarray:
+        # Per-item normalisation, then padding to the longest item, as the pipeline collates
+        features = self.feature_extractor(
+            [np.asarray(w, dtype=np.float32) for w in waveforms],
+            sampling_rate=self.feature_extractor.sampling_rate, padding=True, return_tensors="np",
+        )
+        logits = self.session.run(None, {name: features[name] for name in self._inputs})[0]
+        return _softmax(logits)
+
+    def __call__(self, inputs: List[Dict[str, Any]], batch_size: int = 1) -> List[List[Dict[str, Any]]]:
+        probs = self.probabilities([item["raw"] for item in inputs])
+        return [
+            [{"label": self.labels[i], "score": float(p[i])} for i in np.argsort(p)[::-1]]
+            for p in probs
+        ]
+
+
+class OnnxKerasModel:
+    """predict() like the Keras model it was converted from"""
+
+    def __init__(self, path: str):
+        self.session = create_session(path)
+        self._input = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        return self.session.run(None, {self._input: np.ascontiguousarray(batch, dtype=np.float32)})[0]
+
+    probabilities = predict
+
+
+def export_audio_classifier(classifier, path: str):
+    """Model of a transformers audio-classification pipeline to ONNX, with dynamic batch and time axes"""
+    import torch
+
+    extractor = classifier.feature_extractor
+    rate = extractor.sampling_rate
+    # Two lengths, so padding and any attention mask are part of the traced inputs
+    features = extractor([np.zeros(rate, np.float32), np.zeros(rate // 2, np.float32)],
+                         sampling_rate=rate, padding=True, return_tensors="pt")
+    names = list(features.keys())
+    dynamic_axes = {name: {0: "batch", 1: "time"} if features[name].dim() == 2 else {0: "batch"} for name in names}
+    dynamic_axes["logits"] = {0: "batch"}
+    model = classifier.model.to("cpu").eval()
+    with torch.no_grad():
+        torch.onnx.export(model, (dict(features),), path, input_names=names, output_names=["logits"],
+                          dynamic_axes=dynamic_axes, opset_version=OPSET)
+
+
+def export_keras(model, path: str):
+    """Keras model to ONNX with a dynamic batch axis"""
+    import tensorflow as tf
+    import tf2onnx
+
+    signature = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=OPSET, output_path=path)
+
+
+def convert(path: str, backend: str, export: Callable[[str], None]) -> Dict[str, Any]:
+    """Export to fp32 ONNX, quantize the weights to int8 for onnx-int8, then move into place"""
+    start = time.perf_counter()
+    fp32_path = path + ".fp32.tmp"
+    try:
+        export(fp32_path)
+        report = {"fp32_bytes": os.path.getsize(fp32_path)}
+        if backend == "onnx-int8":
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(fp32_path, path + ".tmp", weight_type=QuantType.QInt8)
+            os.replace(path + ".tmp", path)
+        else:
+            os.replace(fp32_path, path)
+    finally:
+        for leftover in (fp32_path, path + ".tmp"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    report.update(backend=backend, size_bytes=os.path.getsize(path),
+                  convert_seconds=round(time.perf_counter() - start, 2))
+    return report
+
+
+def parity_report(reference: np.ndarray, candidate: np.ndarray, tolerance: float = PARITY_TOLERANCE) -> Dict[str, Any]:
+    """Agreement between the original and the converted model's probabilities on the same inputs"""
+    diff = np.abs(np.asarray(reference, dtype=np.float64) - np.asarray(candidate, dtype=np.float64))
+    return {
+        "samples": len(reference),
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+        "top1_agreement": float((np.argmax(reference, axis=1) == np.argmax(candidate, axis=1)).mean()),
+        "tolerance": tolerance,
+        "passed": bool(diff.max() <= tolerance),
+    }
+
+
+def load_converted(name: str, backend: str, source_key: str,
+                   load_original: Callable[[], Any], export: Callable[[Any, str], None],
+                   make_runner: Callable[[str], Any], reference_inputs: Callable[[], Any],
+                   original_probabilities: Callable[[Any, Any], np.ndarray]) -> Optional[Any]:
+    """
+    The model converted for `backend`, or None if it can't be used (conversion
+    failed, ONNX Runtime missing, or it failed the parity check), in which case
+    the caller keeps the native model.
+
+    The first process to need an artifact loads the original, converts it and
+    compares both on the reference inputs; the report is stored next to the
+    artifact, so every later load only opens the converted model.
+    """
+    try:
+        path = artifact_path(name, backend, source_key)
+        report_path = path[:-len(".onnx")] + ".json"
+        runner = None
+        with _exclusive(path):
+            if not os.path.exists(report_path):
+                print(f"Converting {name} model to {backend}...")
+                original = load_original()
+                report = convert(path, backend, lambda p: export(original, p))
+                runner = make_runner(path)
+                inputs = reference_inputs()
+                report["parity"] = parity_report(original_probabilities(original, inputs), runner.probabilities(inputs))
+                del original
+                gc.collect()
+                with open(report_path + ".tmp", "w") as f:
+                    json.dump(report, f, indent=2)
+                os.replace(report_path + ".tmp", report_path)
+            with open(report_path) as f:
+                report = json.load(f)
+
+        parity = report["parity"]
+        # Judged against the current tolerance, so changing it needs no reconversion
+        if parity["max_abs_diff"] > PARITY_TOLERANCE:
+            print(f"❌ {name} {backend} model failed the parity check "
+                  f"(max diff {parity['max_abs_diff']:.4f} > {PARITY_TOLERANCE}), using the native model")
+            return None
+        runner = runner or make_runner(path)
+        print(f"✅ {name} model running on {backend} ({report['size_bytes'] / 1024 ** 2:.1f} MB, "
+              f"max diff {parity['max_abs_diff']:.4f})")
+        return runner
+    except Exception as e:
+        print(f"❌ Could not use the {backend} backend for {name}: {e}")
+        return None
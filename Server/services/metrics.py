@@ -0,0 +1,151 @@
+import cProfile
+import functools
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Latency buckets (s), from a cached tile to a full EDF preprocess
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Payload buckets (bytes), 1 KB to 1 GB
+SIZE_BUCKETS = tuple(1024 * 4 ** k for k in range(11))
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# Per-request cProfile, only when enabled and asked for with an X-Profile header
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+# name -> (help, buckets, {labels: [bucket counts..., sum, count]})
+_histograms: Dict[str, Tuple[str, Tuple[float, ...], Dict[Labels, List[float]]]] = {}
+# name -> (help, kind, {labels: value}); kind is "gauge"
+_scalars: Dict[str, Tuple[str, str, Dict[Labels, float]]] = {}
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def observe(name: str, value: float, buckets: Tuple[float, ...] = TIME_BUCKETS, help: str = "", **labels):
+    """Add one observation to a histogram"""
+    key = _labels(labels)
+    with _lock:
+        _, bounds, series = _histograms.setdefault(name, (help, buckets, {}))
+        counts = series.get(key)
+        if counts is None:
+            counts = series[key] = [0.0] * (len(bounds) + 2)
+        for i, bound in enumerate(bounds):
+            if value <= bound:
+                counts[i] += 1
+                break
+        counts[-2] += value
+        counts[-1] += 1
+
+
+def set_gauge(name: str, value: float, help: str = "", **labels):
+    with _lock:
+        _scalars.setdefault(name, (help, "gauge", {}))[2][_labels(labels)] = value
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block of code into the span_duration_seconds histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("span_duration_seconds", time.perf_counter() - start,
+                help="Time spent in instrumented code sections", span=name)
+
+
+def timed(name: str):
+    """Decorator form of span()"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+
+def _format_labels(key: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    set_gauge("process_resident_memory_bytes", current_rss_bytes(), help="Current resident set size")
+    set_gauge("process_peak_resident_memory_bytes", peak_rss_bytes(), help="Peak resident set size")
+    lines = []
+    with _lock:
+        for name, (help, kind, series) in sorted(_scalars.items()):
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            lines += [f"{name}{_format_labels(key)} {_format_value(value)}" for key, value in series.items()]
+        for name, (help, bounds, series) in sorted(_histograms.items()):
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+            for key, counts in series.items():
+                cumulative = 0.0
+                for bound, count in zip(bounds, counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {_format_value(cumulative)}")
+                lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {_format_value(counts[-1])}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(counts[-2])}")
+                lines.append(f"{name}_count{_format_labels(key)} {_format_value(counts[-1])}")
+    return "\n".join(lines) + "\n"
+
+
+# cProfile hooks the interpreter globally, so one request at a time
+_profiling = threading.Lock()
+
+
+def start_profile() -> Optional[cProfile.Profile]:
+    """Start profiling a request, or None if another one is being profiled"""
+    if not _profiling.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def save_profile(profiler: cProfile.Profile, route: str) -> str:
+    """
+    Stop a request profile and dump it as a .prof file (pstats / snakeviz).
+    It covers the event-loop thread; work sent to thread or process pools
+    shows up as the time spent awaiting it.
+    """
+    profiler.disable()
+    _profiling.release()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe_route = route.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+    path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}_{safe_route}.prof")
+    profiler.dump_stats(path)
+    return path
@@ -0,0 +1,18 @@
+import struct
+import zlib
+import numpy as np
+
+
+def encode_png_gray(image: np.ndarray) -> bytes:
+    """Minimal 8-bit grayscale PNG encoder (no matplotlib/PIL needed)"""
+    height, width = image.shape
+    # Filter type 0 (None) byte in front of every row
+    raw = np.zeros((height, width + 1), dtype=np.uint8)
+    raw[:, 1:] = image
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)) + chunk(b"IEND", b""))
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional
+
+
+def hash_stream(stream: BinaryIO, chunk_size: int = 1 << 20) -> str:
+    """sha256 of a file-like object, read in chunks"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_key(content_digest: str, params: Dict[str, Any]) -> str:
+    """Cache key for some content processed with some parameters"""
+    payload = content_digest + json.dumps(params, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class HashingReader:
+    """File-like wrapper that hashes everything read through it"""
+
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        self._digest = hashlib.sha256()
+
+    def read(self, n: int = -1) -> bytes:
+        data = self._stream.read(n)
+        self._digest.update(data)
+        return data
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+class DiskLRUCache:
+    """
+    Size-bounded cache of entries in one directory. An entry is every file or
+    folder named `{key}.*`, and `{key}.json` marks it as complete. Recency is
+    the mtime of that marker, so it survives restarts.
+
+    put_json keeps a running byte total and only scans the directory when it
+    goes over budget (then evicts down to LOW_WATER of it), or every
+    RESYNC_SECONDS so entries written by other processes are counted too.
+    """
+
+    LOW_WATER = 0.9
+    RESYNC_SECONDS = 60.0
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total: Optional[int] = None  # bytes on disk as of the last scan, plus our writes since
+        self._synced_at = 0.0
+
+    def _marker(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def contains(self, key: str) -> bool:
+        return self._marker(key).exists()
+
+    def touch(self, key: str):
+        """Mark an entry as recently used"""
+        try:
+            os.utime(self._marker(key))
+        except FileNotFoundError:
+            pass
+
+    def get_json(self, key: str) -> Optional[Any]:
+        try:
+            with open(self._marker(key)) as f:
+                value = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        self.touch(key)
+        return value
+
+    def put_json(self, key: str, value: Any):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self.directory / f".{key}.json.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(value, f)
+            size = f.tell()
+        # Overwriting an entry only grows the cache by the difference
+        try:
+            replaced = self._marker(key).stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(temp_path, self._marker(key))
+        self._record_write(key, size - replaced)
+
+    def _record_write(self, key: str, growth: int):
+        with self._lock:
+            stale = self._total is None or time.monotonic() - self._synced_at > self.RESYNC_SECONDS
+            if not stale:
+                self._total += growth
+            scan = stale or self._total > self.max_bytes
+        if scan:
+            self.evict(protect=key, target_bytes=int(self.max_bytes * self.LOW_WATER))
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        if path.is_dir():
+            return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+        return path.stat().st_size
+
+    def evict(self, protect: Optional[str] = None, target_bytes: Optional[int] = None):
+        """Remove least recently used entries until the cache fits in target_bytes (default max_bytes)"""
+        target_bytes = self.max_bytes if target_bytes is None else target_bytes
+        if not self.directory.exists():
+            return
+        with self._lock:
+            entries: Dict[str, Dict[str, Any]] = {}
+            for path in self.directory.iterdir():
+                if path.name.startswith("."):
+                    continue
+                key = path.name.split(".", 1)[0]
+                entry = entries.setdefault(key, {"paths": [], "size": 0, "used": None})
+                entry["paths"].append(path)
+                entry["size"] += self._size(path)
+                if path == self._marker(key):
+                    entry["used"] = path.stat().st_mtime
+
+            # Entries without a marker are still being written
+            complete = {k: e for k, e in entries.items() if e["used"] is not None}
+            total = sum(e["size"] for e in complete.values())
+            for key in sorted(complete, key=lambda k: complete[k]["used"]):
+                if total <= target_bytes:
+                    break
+                if key == protect:
+                    continue
+                # Drop the marker first so readers stop seeing the entry
+                self._marker(key).unlink(missing_ok=True)
+                for path in complete[key]["paths"]:
+                    if path.is_dir():
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        path.unlink(missing_ok=True)
+                total -= complete[key]["size"]
+            # Partial entries count too: they will be complete soon
+            self._total = total + sum(e["size"] for k, e in entries.items() if k not in complete)
+            self._synced_at = time.monotonic()
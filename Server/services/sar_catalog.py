@@ -0,0 +1,372 @@
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from services.config import SAR_DATA_DIR
+
+# Directory holding (possibly nested) .SAFE products
+SAR_DATA_ROOT = SAR_DATA_DIR
+SAR_CATALOG_PATH = os.environ.get("SAR_CATALOG_PATH", "cache/sar_catalog.sqlite")
+# A background thread rescans the data root this often to pick up new
+# products; 0 leaves rescans to POST /sar/catalog/scan. With several
+# workers, only the one holding the scanner lock runs it.
+RESCAN_SECONDS = float(os.environ.get("SAR_CATALOG_RESCAN_SECONDS", 60))
+# Directories under the data root that never hold products
+SKIP_DIRS = {"static", "cache", "uploads", "node_modules", "__pycache__"}
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+_scan_lock = threading.Lock()
+_scanner_lock = threading.Lock()
+_scanner: Optional[threading.Thread] = None
+_initialized = set()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenes (
+    rowid INTEGER PRIMARY KEY,
+    scene_id TEXT UNIQUE NOT NULL,
+    path TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    mission TEXT,
+    product_type TEXT,
+    pass_direction TEXT,
+    start_time TEXT,
+    stop_time TEXT,
+    polarisations TEXT NOT NULL,
+    measurements TEXT NOT NULL,
+    footprint TEXT
+);
+CREATE INDEX IF NOT EXISTS scenes_start ON scenes (start_time);
+CREATE INDEX IF NOT EXISTS scenes_stop ON scenes (stop_time);
+CREATE VIRTUAL TABLE IF NOT EXISTS scenes_rtree USING rtree (id, min_lon, max_lon, min_lat, max_lat);
+"""
+
+
+def scene_id(folder_path: str) -> str:
+    return os.path.basename(os.path.normpath(folder_path)).replace(".SAFE", "")
+
+
+def normalize_time(value: str) -> str:
+    """Any ISO-8601 date or datetime as a sortable UTC string"""
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime(TIME_FORMAT)
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _texts(path: str, wanted: set) -> Dict[str, List[str]]:
+    """Text of every element whose local name is in `wanted`, in document order"""
+    found: Dict[str, List[str]] = {name: [] for name in wanted}
+    for _, elem in ET.iterparse(path, events=("end",)):
+        name = _local(elem.tag)
+        if name in wanted and elem.text:
+            found[name].append(elem.text.strip())
+    return found
+
+
+def _bbox(points: List[Tuple[float, float]]) -> Optional[List[float]]:
+    if not points:
+        return None
+    lats, lons = zip(*points)
+    return [min(lons), min(lats), max(lons), max(lats)]
+
+
+def _list_measurements(folder_path: str) -> Dict[str, str]:
+    """Polarisation -> measurement raster, from one directory listing"""
+    measurement_dir = os.path.join(folder_path, "measurement")
+    if not os.path.isdir(measurement_dir):
+        return {}
+    measurements = {}
+    for name in sorted(os.listdir(measurement_dir)):
+        if not name.lower().endswith((".tiff", ".tif")):
+            continue
+        # s1c-iw-grd-vv-...-001.tiff
+        parts = name.lower().split("-")
+        if len(parts) > 3 and parts[3] in ("vv", "vh", "hh", "hv"):
+            measurements.setdefault(parts[3], os.path.join(measurement_dir, name))
+    return measurements
+
+
+def parse_safe(folder_path: str) -> Dict[str, Any]:
+    """
+    Footprint, acquisition period, polarisations and measurement rasters of
+    one .SAFE product, from manifest.safe with annotation XML as a fallback.
+    """
+    record: Dict[str, Any] = {
+        "scene_id": scene_id(folder_path),
+        "path": os.path.abspath(folder_path),
+        "mission": None, "product_type": None, "pass_direction": None,
+        "start_time": None, "stop_time": None, "footprint": None,
+    }
+    measurements = {p: os.path.abspath(path) for p, path in _list_measurements(folder_path).items()}
+    polarisations = set(measurements)
+
+    manifest = os.path.join(folder_path, "manifest.safe")
+    if os.path.exists(manifest):
+        t = _texts(manifest, {"startTime", "stopTime", "coordinates", "transmitterReceiverPolarisation",
+                              "productType", "familyName", "number", "pass"})
+        if t["startTime"]:
+            record["start_time"] = normalize_time(t["startTime"][0])
+        if t["stopTime"]:
+            record["stop_time"] = normalize_time(t["stopTime"][0])
+        if t["coordinates"]:
+            # gml:coordinates is "lat,lon lat,lon ..."
+            points = [tuple(float(v) for v in pair.split(",")[:2]) for pair in t["coordinates"][0].split()]
+            record["footprint"] = _bbox(points)
+        polarisations.update(p.lower() for p in t["transmitterReceiverPolarisation"])
+        record["product_type"] = t["productType"][0] if t["productType"] else None
+        if t["familyName"]:
+            record["mission"] = t["familyName"][0] + (t["number"][0] if t["number"] else "")
+        record["pass_direction"] = t["pass"][0] if t["pass"] else None
+
+    annotation_dir = os.path.join(folder_path, "annotation")
+    if (record["start_time"] is None or record["footprint"] is None) and os.path.isdir(annotation_dir):
+        for name in sorted(os.listdir(annotation_dir)):
+            if not name.endswith(".xml"):
+                continue
+            t = _texts(os.path.join(annotation_dir, name), {"startTime", "stopTime", "polarisation", "latitude", "longitude"})
+            if record["start_time"] is None and t["startTime"]:
+                record["start_time"] = normalize_time(t["startTime"][0])
+                record["stop_time"] = normalize_time(t["stopTime"][0]) if t["stopTime"] else record["start_time"]
+            if record["footprint"] is None:
+                record["footprint"] = _bbox(list(zip(map(float, t["latitude"]), map(float, t["longitude"]))))
+            polarisations.update(p.lower() for p in t["polarisation"])
+            break
+
+    if record["start_time"] is None:
+        # Product name: S1C_IW_GRDH_1SDV_20250929T164759_20250929T164824_...
+        stamps = [p for p in record["scene_id"].split("_") if len(p) == 15 and p[8] == "T"]
+        if len(stamps) >= 2:
+            record["start_time"], record["stop_time"] = (
+                datetime.strptime(s, "%Y%m%dT%H%M%S").strftime(TIME_FORMAT) for s in stamps[:2]
+            )
+
+    record["polarisations"] = sorted(polarisations)
+    record["measurements"] = measurements
+    return record
+
+
+def _connect() -> sqlite3.Connection:
+    path = SAR_CATALOG_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    if path not in _initialized:
+        conn.executescript(SCHEMA)
+        _initialized.add(path)
+    return conn
+
+
+def _find_products(root: str) -> Iterator[str]:
+    for dirpath, dirnames, _ in os.walk(root):
+        products = [d for d in dirnames if d.endswith(".SAFE")]
+        for d in products:
+            yield os.path.join(dirpath, d)
+        # Never descend into products, hidden or known non-data directories
+        dirnames[:] = [d for d in dirnames if not d.endswith(".SAFE") and not d.startswith(".") and d not in SKIP_DIRS]
+
+
+def _product_mtime(folder_path: str) -> float:
+    manifest = os.path.join(folder_path, "manifest.safe")
+    measurement_dir = os.path.join(folder_path, "measurement")
+    paths = [p for p in (folder_path, manifest, measurement_dir) if os.path.exists(p)]
+    return max(os.path.getmtime(p) for p in paths)
+
+
+def _upsert(conn: sqlite3.Connection, record: Dict[str, Any], mtime: float):
+    row = conn.execute("SELECT rowid FROM scenes WHERE scene_id = ?", (record["scene_id"],)).fetchone()
+    values = (
+        record["scene_id"], record["path"], mtime, record["mission"], record["product_type"],
+        record["pass_direction"], record["start_time"], record["stop_time"],
+        "," + ",".join(record["polarisations"]) + ",", json.dumps(record["measurements"]),
+        json.dumps(record["footprint"]) if record["footprint"] else None,
+    )
+    if row is None:
+        rowid = conn.execute(
+            "INSERT INTO scenes (scene_id, path, mtime, mission, product_type, pass_direction, start_time, "
+            "stop_time, polarisations, measurements, footprint) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", values
+        ).lastrowid
+    else:
+        rowid = row["rowid"]
+        conn.execute(
+            "UPDATE scenes SET scene_id = ?, path = ?, mtime = ?, mission = ?, product_type = ?, pass_direction = ?, "
+            "start_time = ?, stop_time = ?, polarisations = ?, measurements = ?, footprint = ? WHERE rowid = ?",
+            values + (rowid,)
+        )
+    conn.execute("DELETE FROM scenes_rtree WHERE id = ?", (rowid,))
+    if record["footprint"]:
+        min_lon, min_lat, max_lon, max_lat = record["footprint"]
+        conn.execute("INSERT INTO scenes_rtree VALUES (?, ?, ?, ?, ?)", (rowid, min_lon, max_lon, min_lat, max_lat))
+
+
+def scan(root: Optional[str] = None) -> Dict[str, int]:
+    """
+    Bring the catalog in line with the products under `root` (SAR_DATA_ROOT):
+    parse new or modified products, drop vanished ones. Unchanged products
+    cost a few stats.
+    """
+    root = root or SAR_DATA_ROOT
+    # The thread lock orders scans in this process, the file lock across workers
+    with _scan_lock, _file_lock(SAR_CATALOG_PATH + ".scan.lock"):
+        counts = {"added": 0, "updated": 0, "removed": 0, "failed": 0}
+        with _connect() as conn:
+            stored = {r["scene_id"]: (r["path"], r["mtime"], r["rowid"])
+                      for r in conn.execute("SELECT scene_id, path, mtime, rowid FROM scenes")}
+            seen = set()
+            for folder in _find_products(root):
+                sid = scene_id(folder)
+                seen.add(sid)
+                mtime = _product_mtime(folder)
+                previous = stored.get(sid)
+                if previous and previous[0] == os.path.abspath(folder) and previous[1] == mtime:
+                    continue
+                try:
+                    _upsert(conn, parse_safe(folder), mtime)
+                except (OSError, ET.ParseError, ValueError) as e:
+                    print(f"❌ Could not catalog {folder}: {e}")
+                    counts["failed"] += 1
+                    continue
+                counts["updated" if previous else "added"] += 1
+            for sid, (_, _, rowid) in stored.items():
+                if sid not in seen:
+                    conn.execute("DELETE FROM scenes WHERE rowid = ?", (rowid,))
+                    conn.execute("DELETE FROM scenes_rtree WHERE id = ?", (rowid,))
+                    counts["removed"] += 1
+            counts["total"] = conn.execute("SELECT COUNT(*) FROM scenes").fetchone()[0]
+    if counts["added"] or counts["updated"] or counts["removed"]:
+        print(f"✅ SAR catalog: {counts['added']} added, {counts['updated']} updated, "
+              f"{counts['removed']} removed, {counts['total']} scenes")
+    return counts
+
+
+@contextmanager
+def _file_lock(path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _scan_forever():
+    # Pre-forked workers all start this thread; the first to take the scanner
+    # lock keeps it for its lifetime and does the rescans, the others check
+    # back every RESCAN_SECONDS in case that worker exits
+    path = SAR_CATALOG_PATH + ".scanner.lock"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as lock:
+        while True:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                time.sleep(RESCAN_SECONDS)
+        while True:
+            try:
+                scan()
+            except Exception as e:
+                print(f"❌ SAR catalog scan failed: {e}")
+            time.sleep(RESCAN_SECONDS)
+
+
+def start_background_scans():
+    """
+    Start the periodic rescan thread once. Queries never wait for a scan:
+    they read the index as it stands, so a product shows up within
+    RESCAN_SECONDS of landing (or right after POST /sar/catalog/scan).
+    """
+    global _scanner
+    if RESCAN_SECONDS <= 0 or _scanner is not None:
+        return
+    with _scanner_lock:
+        if _scanner is None:
+            _scanner = threading.Thread(target=_scan_forever, name="sar-catalog", daemon=True)
+            _scanner.start()
+
+
+def _row_to_scene(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "scene_id": row["scene_id"],
+        "path": row["path"],
+        "mission": row["mission"],
+        "product_type": row["product_type"],
+        "pass_direction": row["pass_direction"],
+        "start_time": row["start_time"],
+        "stop_time": row["stop_time"],
+        "polarisations": [p for p in row["polarisations"].split(",") if p],
+        "measurements": json.loads(row["measurements"]),
+        "bbox": json.loads(row["footprint"]) if row["footprint"] else None,
+    }
+
+
+def query(bbox: Optional[Tuple[float, float, float, float]] = None, start: Optional[str] = None,
+          end: Optional[str] = None, polarisation: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+    """
+    Scenes intersecting `bbox` (min_lon, min_lat, max_lon, max_lat) and
+    overlapping [start, end], newest first. The bbox goes through the R-tree,
+    the dates through the time indexes.
+    """
+    start_background_scans()
+    sql, params = "SELECT s.* FROM scenes s", []
+    where = []
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        sql += " JOIN scenes_rtree r ON r.id = s.rowid"
+        where += ["r.max_lon >= ?", "r.min_lon <= ?", "r.max_lat >= ?", "r.min_lat <= ?"]
+        params += [min_lon, max_lon, min_lat, max_lat]
+    if start is not None:
+        where.append("s.stop_time >= ?")
+        params.append(normalize_time(start))
+    if end is not None:
+        where.append("s.start_time <= ?")
+        params.append(normalize_time(end))
+    if polarisation is not None:
+        where.append("s.polarisations LIKE ?")
+        params.append(f"%,{polarisation.lower()},%")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY s.start_time DESC LIMIT ?"
+    params.append(limit)
+
+    with _connect() as conn:
+        return [_row_to_scene(row) for row in conn.execute(sql, params)]
+
+
+def get_scene(sid: str) -> Dict[str, Any]:
+    start_background_scans()
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM scenes WHERE scene_id = ?", (sid.replace(".SAFE", ""),)).fetchone()
+    if row is None:
+        raise FileNotFoundError(f"SAR scene not found: {sid}")
+    return _row_to_scene(row)
+
+
+def scene_folder(sid: str) -> str:
+    """Product folder of a catalogued scene"""
+    return get_scene(sid)["path"]
+
+
+def measurement_path(folder_path: str, polarisation: str = "vv") -> Optional[str]:
+    """
+    Measurement raster of one polarisation: the catalogued path when the
+    product is indexed, otherwise a single listing of its measurement/ folder.
+    """
+    with _connect() as conn:
+        row = conn.execute("SELECT path, measurements FROM scenes WHERE scene_id = ?", (scene_id(folder_path),)).fetchone()
+    if row is not None and row["path"] == os.path.abspath(folder_path):
+        path = json.loads(row["measurements"]).get(polarisation.lower())
+        if path and os.path.exists(path):
+            return path
+    return _list_measurements(folder_path).get(polarisation.lower())
@@ -0,0 +1,178 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+from services.sar_service import HARDCODED_SAR_FOLDER
+from services.sar_catalog import scene_id
+from services.sar_tiles import find_measurement, open_dataset, to_db
+
+PRODUCTS_DIR = "static/sar"
+POLARISATIONS = ("vv", "vh")
+# Each task reads one BLOCK_SIZE x BLOCK_SIZE window (~3 MB with its dB and
+# mask temporaries), so peak memory stays small however wide the scene and
+# however many workers run
+BLOCK_SIZE = 512
+MAX_WORKERS = int(os.environ.get("SAR_WORKERS", os.cpu_count() or 1))
+
+# Fixed dB histogram shared by every block so partial results just add up
+HIST_MIN_DB = -60.0
+HIST_MAX_DB = 40.0
+HIST_BINS = 1000
+CLIP_PERCENTILES = (2.0, 98.0)
+
+_scene_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _scene_dir(folder_path: str, output_dir: str = PRODUCTS_DIR) -> Path:
+    return Path(output_dir) / scene_id(folder_path)
+
+
+def _process_block(tiff_file: str, product: np.ndarray, window: Window) -> Dict[str, Any]:
+    # Per-thread handle; GDAL releases the GIL while reading
+    src = open_dataset(tiff_file)
+    intensity = src.read(1, window=window)
+    db = to_db(intensity)
+    product[window.row_off:window.row_off + window.height, window.col_off:window.col_off + window.width] = db
+
+    valid = db[intensity > 0]
+    counts, _ = np.histogram(valid, bins=HIST_BINS, range=(HIST_MIN_DB, HIST_MAX_DB))
+    return {
+        "count": int(valid.size),
+        "sum": float(valid.sum(dtype=np.float64)),
+        "sumsq": float(np.square(valid, dtype=np.float64).sum()),
+        "min": float(valid.min()) if valid.size else None,
+        "max": float(valid.max()) if valid.size else None,
+        "histogram": counts,
+    }
+
+
+def percentile_from_histogram(counts: np.ndarray, percentiles) -> List[float]:
+    """dB values at the given percentiles, interpolated within histogram bins"""
+    edges = np.linspace(HIST_MIN_DB, HIST_MAX_DB, HIST_BINS + 1)
+    cumulative = np.concatenate([[0], np.cumsum(counts)]).astype(np.float64)
+    if cumulative[-1] == 0:
+        return [float("nan")] * len(percentiles)
+    targets = np.asarray(percentiles, dtype=np.float64) / 100.0 * cumulative[-1]
+    return [float(v) for v in np.interp(targets, cumulative, edges)]
+
+
+def process_polarisation(tiff_file: str, out_path: Path) -> Dict[str, Any]:
+    """
+    Walk the full-resolution raster in BLOCK_SIZE windows on a thread pool,
+    writing the float32 dB product and merging per-window statistics as
+    they arrive.
+    """
+    with rasterio.open(tiff_file) as src:
+        width, height = src.width, src.height
+
+    product = np.lib.format.open_memmap(out_path, mode="w+", dtype="<f4", shape=(height, width))
+    windows = [
+        Window(col, row, min(BLOCK_SIZE, width - col), min(BLOCK_SIZE, height - row))
+        for row in range(0, height, BLOCK_SIZE) for col in range(0, width, BLOCK_SIZE)
+    ]
+    count, total, total_sq = 0, 0.0, 0.0
+    histogram = np.zeros(HIST_BINS, dtype=np.int64)
+    mins, maxs = [], []
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="sar") as pool:
+        for part in pool.map(lambda w: _process_block(tiff_file, product, w), windows):
+            count += part["count"]
+            total += part["sum"]
+            total_sq += part["sumsq"]
+            histogram += part["histogram"]
+            if part["min"] is not None:
+                mins.append(part["min"])
+                maxs.append(part["max"])
+    product.flush()
+    del product
+
+    mean = total / count if count else None
+    variance = total_sq / count - mean ** 2 if count else None
+    clip_low, clip_high = percentile_from_histogram(histogram, CLIP_PERCENTILES)
+
+    return {
+        "measurement": os.path.basename(tiff_file),
+        "product": out_path.name,
+        "width": width,
+        "height": height,
+        "valid_pixels": count,
+        "mean_db": mean,
+        "std_db": float(np.sqrt(max(variance, 0.0))) if count else None,
+        "min_db": min(mins) if mins else None,
+        "max_db": max(maxs) if maxs else None,
+        "clip_percentiles": list(CLIP_PERCENTILES),
+        "clip_db": [clip_low, clip_high],
+        "histogram": {
+            "min_db": HIST_MIN_DB,
+            "max_db": HIST_MAX_DB,
+            "counts": histogram.astype(np.int64).tolist(),
+        },
+    }
+
+
+def _scene_lock(folder_path: str) -> threading.Lock:
+    with _locks_guard:
+        return _scene_locks.setdefault(scene_id(folder_path), threading.Lock())
+
+
+def load_scene_stats(folder_path: str = HARDCODED_SAR_FOLDER, output_dir: str = PRODUCTS_DIR) -> Optional[Dict[str, Any]]:
+    """Precomputed statistics for a scene, or None if it has not been processed"""
+    stats_path = _scene_dir(folder_path, output_dir) / "stats.json"
+    if not stats_path.exists():
+        return None
+    with open(stats_path) as f:
+        return json.load(f)
+
+
+def process_scene(folder_path: str = HARDCODED_SAR_FOLDER, output_dir: str = PRODUCTS_DIR) -> Dict[str, Any]:
+    """
+    Compute dB products and statistics for every polarisation of a scene,
+    once. Later calls return the stored result.
+    """
+    with _scene_lock(folder_path):
+        stats = load_scene_stats(folder_path, output_dir)
+        if stats is not None:
+            return stats
+
+        if not os.path.exists(folder_path):
+            raise FileNotFoundError(f"SAR folder not found: {folder_path}")
+
+        scene_dir = _scene_dir(folder_path, output_dir)
+        os.makedirs(scene_dir, exist_ok=True)
+        stats = {"scene": scene_id(folder_path), "polarisations": {}}
+        for pol in POLARISATIONS:
+            tiff_file = find_measurement(folder_path, pol)
+            if tiff_file:
+                stats["polarisations"][pol] = process_polarisation(tiff_file, scene_dir / f"{pol}_db.npy")
+        if not stats["polarisations"]:
+            raise FileNotFoundError("No .tiff measurement file found in SAFE folder")
+
+        # Written last: its presence marks the scene as processed
+        temp_path = scene_dir / "stats.json.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(stats, f)
+        os.replace(temp_path, scene_dir / "stats.json")
+        return stats
+
+
+def polarisation_stats(polarisation: str, folder_path: str = HARDCODED_SAR_FOLDER) -> Dict[str, Any]:
+    stats = process_scene(folder_path)
+    pol = polarisation.lower()
+    if pol not in stats["polarisations"]:
+        raise FileNotFoundError(f"No {pol.upper()} measurement in scene {stats['scene']}")
+    return stats["polarisations"][pol]
+
+
+def contrast_limits(polarisation: str, low: float = CLIP_PERCENTILES[0], high: float = CLIP_PERCENTILES[1],
+                    folder_path: str = HARDCODED_SAR_FOLDER) -> Tuple[float, float]:
+    """dB contrast-stretch limits at any percentiles, from the stored histogram"""
+    if not 0 <= low < high <= 100:
+        raise ValueError("Percentiles must satisfy 0 <= low < high <= 100")
+    counts = np.asarray(polarisation_stats(polarisation, folder_path)["histogram"]["counts"])
+    lo, hi = percentile_from_histogram(counts, [low, high])
+    return lo, hi
@@ -1,9 +1,8 @@
 import os
 import numpy as np
-import matplotlib.pyplot as plt
 import rasterio
-from datetime import datetime
-import glob
+from services import sar_catalog
+from services.metrics import timed
 
 # Hardcoded SAR folder path
 HARDCODED_SAR_FOLDER = "S1C_IW_GRDH_1SDV_20250929T164759_20250929T164824_004342_0089C0_3B0E.SAFE"
@@ -12,17 +11,14 @@ HARDCODED_SAR_FOLDER = "S1C_IW_GRDH_1SDV_20250929T164759_20250929T164824_004342_
 OUTPUT_DIR = "static/images"
 
 
-def find_tiff_file(folder_path):
-    """Find the first measurement .tiff file in the SAFE folder"""
-    for root, dirs, files in os.walk(folder_path):
-        for f in files:
-            if f.lower().endswith(".tiff"):
-                return os.path.join(root, f)
-    return None
-
-
+@timed("sar.process_image")
 def process_sar_image(tiff_file):
     """Process SAR image safely (handles large files efficiently)"""
+    # Only the full-scene overview needs matplotlib; tiles are encoded directly
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
     with rasterio.open(tiff_file) as src:
         # Automatically compute downscale factor to limit output size
         target_max_dim = 2048
@@ -52,39 +48,42 @@ def process_sar_image(tiff_file):
     return fig
 
 
-def generate_sar_image(format="png"):
+def image_filename(folder_path, polarisation="vv", format="png"):
+    """Output file name of a scene overview; one file per scene, polarisation and format"""
+    extension = "jpg" if format.lower() in ["jpg", "jpeg"] else "png"
+    return f"sar_image_{sar_catalog.scene_id(folder_path)}_{polarisation.lower()}.{extension}"
+
+
+def generate_sar_image(format="png", folder_path=HARDCODED_SAR_FOLDER, polarisation="vv"):
     """
-    Generate SAR image and save it to file.
+    Generate SAR image and save it to file. The image is rendered once per
+    scene, polarisation and format, later calls return the existing file.
 
     Args:
         format (str): Output format - 'png' or 'jpg'
+        folder_path (str): SAFE folder of the scene
+        polarisation (str): Measurement to render (vv, vh, hh, hv)
 
     Returns:
         str: Full path to the saved image file
     """
-    if not os.path.exists(HARDCODED_SAR_FOLDER):
-        raise FileNotFoundError(f"SAR folder not found: {HARDCODED_SAR_FOLDER}")
+    if not os.path.exists(folder_path):
+        raise FileNotFoundError(f"SAR folder not found: {folder_path}")
 
-    # Find the measurement .tiff file
-    tiff_file = find_tiff_file(HARDCODED_SAR_FOLDER)
+    # Catalogued measurement path, or one listing of measurement/
+    tiff_file = sar_catalog.measurement_path(folder_path, polarisation)
     if not tiff_file:
-        raise FileNotFoundError("No .tiff measurement file found in SAFE folder")
+        raise FileNotFoundError(f"No {polarisation.upper()} measurement file found in SAFE folder")
 
     # Create output directory if it doesn't exist
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    # Generate filename with timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    sar_folder_name = os.path.basename(HARDCODED_SAR_FOLDER).replace(".SAFE", "")
+    filename = image_filename(folder_path, polarisation, format)
+    filepath = os.path.join(OUTPUT_DIR, filename)
+    format_str = filename.rsplit(".", 1)[-1]
 
-    if format.lower() in ["jpg", "jpeg"]:
-        filename = f"sar_image_{sar_folder_name}_{timestamp}.jpg"
-        filepath = os.path.join(OUTPUT_DIR, filename)
-        format_str = "jpg"
-    else:
-        filename = f"sar_image_{sar_folder_name}_{timestamp}.png"
-        filepath = os.path.join(OUTPUT_DIR, filename)
-        format_str = "png"
+    if os.path.exists(filepath):
+        return filepath
 
     # Process and create image safely
     fig = process_sar_image(tiff_file)
@@ -95,6 +94,7 @@ def generate_sar_image(format="png"):
     else:
         fig.savefig(filepath, format="png", bbox_inches="tight", dpi=150)
 
+    import matplotlib.pyplot as plt
     plt.close(fig)
 
     return filepath
@@ -102,15 +102,12 @@ def generate_sar_image(format="png"):
 
 def get_latest_sar_image():
     """
-    Get the most recently generated SAR image path
+    Image of the most recently acquired catalogued scene that has been rendered
     """
-    png_files = glob.glob(os.path.join(OUTPUT_DIR, "sar_image_*.png"))
-    jpg_files = glob.glob(os.path.join(OUTPUT_DIR, "sar_image_*.jpg"))
-    all_files = png_files + jpg_files
-
-    if not all_files:
-        return None
-
-    # Return the most recently created file
-    latest_file = max(all_files, key=os.path.getctime)
-    return latest_file
+    for scene in sar_catalog.query(limit=1000):
+        for polarisation in scene["polarisations"]:
+            for format in ("png", "jpg"):
+                filepath = os.path.join(OUTPUT_DIR, image_filename(scene["path"], polarisation, format))
+                if os.path.exists(filepath):
+                    return filepath
+    return None
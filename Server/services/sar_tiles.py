@@ -0,0 +1,224 @@
+import fcntl
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.windows import Window
+from services.sar_service import HARDCODED_SAR_FOLDER
+from services.png import encode_png_gray
+from services.sar_catalog import measurement_path
+from services.metrics import timed
+
+TILE_SIZE = 256
+TILE_CACHE_MAX_BYTES = int(os.environ.get("SAR_TILE_CACHE_MAX_BYTES", 256 * 1024 ** 2))
+OVERVIEW_FACTORS = [2, 4, 8, 16, 32, 64]
+# Open rasterio datasets kept per thread; the least recently used is closed
+MAX_OPEN_DATASETS = int(os.environ.get("SAR_MAX_OPEN_DATASETS", 8))
+
+_local = threading.local()
+_lock = threading.Lock()
+_scene_info: Dict[str, Dict[str, Any]] = {}
+# One lock per scene key, so concurrent first requests compute its info once
+_scene_locks: Dict[str, threading.Lock] = {}
+
+
+def find_measurement(folder_path: str, polarisation: str = "vv") -> Optional[str]:
+    """Measurement .tiff for one polarisation (vv, vh, hh, hv) in a SAFE folder"""
+    path = measurement_path(folder_path, polarisation)
+    if path:
+        return path
+    # Non-standard layouts: any raster tagged with the polarisation
+    tag = f"-{polarisation.lower()}-"
+    measurement_dir = os.path.join(folder_path, "measurement")
+    search_root = measurement_dir if os.path.isdir(measurement_dir) else folder_path
+    for root, dirs, files in os.walk(search_root):
+        for f in sorted(files):
+            if f.lower().endswith((".tiff", ".tif")) and tag in f.lower():
+                return os.path.join(root, f)
+    return None
+
+
+def ensure_overviews(tiff_file: str):
+    """Build external (.ovr) overviews once so zoomed-out tiles read little data"""
+    with rasterio.open(tiff_file) as src:
+        if src.overviews(1):
+            return
+    # Threads and pre-forked workers may all get here for a new scene; only
+    # one builds the sidecar, the others wait and find it built
+    with open(tiff_file + ".ovr.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with rasterio.open(tiff_file) as src:
+                if src.overviews(1):
+                    return
+            # TIFF_USE_OVR keeps the SAFE product untouched: overviews go to a sidecar file
+            with rasterio.Env(TIFF_USE_OVR=True):
+                with rasterio.open(tiff_file, "r+") as dst:
+                    dst.build_overviews(OVERVIEW_FACTORS, Resampling.average)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def open_dataset(tiff_file: str):
+    """
+    Per-thread open dataset (rasterio handles are not thread-safe). Each
+    thread keeps at most MAX_OPEN_DATASETS open and closes the least recently
+    used, so open files don't grow with the number of scenes.
+    """
+    handles = getattr(_local, "handles", None)
+    if handles is None:
+        handles = _local.handles = OrderedDict()
+    if tiff_file in handles:
+        handles.move_to_end(tiff_file)
+        return handles[tiff_file]
+    handles[tiff_file] = rasterio.open(tiff_file)
+    while len(handles) > MAX_OPEN_DATASETS:
+        _, evicted = handles.popitem(last=False)
+        evicted.close()
+    return handles[tiff_file]
+
+
+def to_db(intensity: np.ndarray) -> np.ndarray:
+    return 10.0 * np.log10(intensity.astype(np.float32) + 1e-6)
+
+
+def _contrast_limits(tiff_file: str, folder_path: str, polarisation: str) -> Tuple[float, float]:
+    """
+    2nd/98th dB percentiles of valid pixels: exact from the precomputed scene
+    products when available, otherwise estimated from a coarse read.
+    """
+    # Imported here: sar_products builds on this module
+    from services.sar_products import load_scene_stats
+    stats = load_scene_stats(folder_path)
+    if stats and polarisation in stats["polarisations"]:
+        lo, hi = stats["polarisations"][polarisation]["clip_db"]
+        return lo, hi
+
+    src = open_dataset(tiff_file)
+    scale = max(1, max(src.height, src.width) // 1024)
+    preview = src.read(1, out_shape=(src.height // scale, src.width // scale), resampling=Resampling.average)
+    valid = preview[preview > 0]
+    if valid.size == 0:
+        return -25.0, 5.0
+    lo, hi = np.percentile(to_db(valid), [2, 98])
+    return float(lo), float(hi)
+
+
+def scene_info(folder_path: str = HARDCODED_SAR_FOLDER, polarisation: str = "vv") -> Dict[str, Any]:
+    """Size, zoom range and contrast limits of a scene (computed once)"""
+    key = f"{folder_path}:{polarisation}"
+    with _lock:
+        if key in _scene_info:
+            return _scene_info[key]
+        scene_lock = _scene_locks.setdefault(key, threading.Lock())
+
+    with scene_lock:
+        with _lock:
+            if key in _scene_info:
+                return _scene_info[key]
+        info = _compute_scene_info(folder_path, polarisation)
+        with _lock:
+            _scene_info[key] = info
+    return info
+
+
+def _compute_scene_info(folder_path: str, polarisation: str) -> Dict[str, Any]:
+    if not os.path.exists(folder_path):
+        raise FileNotFoundError(f"SAR folder not found: {folder_path}")
+    tiff_file = find_measurement(folder_path, polarisation)
+    if not tiff_file:
+        raise FileNotFoundError(f"No {polarisation.upper()} measurement found in SAFE folder")
+
+    ensure_overviews(tiff_file)
+    src = open_dataset(tiff_file)
+    db_min, db_max = _contrast_limits(tiff_file, folder_path, polarisation.lower())
+    info = {
+        "tiff_file": tiff_file,
+        "polarisation": polarisation.lower(),
+        "width": src.width,
+        "height": src.height,
+        "tile_size": TILE_SIZE,
+        "max_zoom": max(0, math.ceil(math.log2(max(src.width, src.height) / TILE_SIZE))),
+        "db_min": db_min,
+        "db_max": db_max,
+    }
+    return info
+
+
+@timed("sar.render_tile")
+def render_tile(info: Dict[str, Any], z: int, x: int, y: int) -> bytes:
+    """
+    Render one TILE_SIZE x TILE_SIZE tile. Zoom max_zoom is native resolution,
+    each lower zoom halves it; the windowed read picks the matching overview.
+    """
+    if not 0 <= z <= info["max_zoom"]:
+        raise ValueError(f"Zoom must be between 0 and {info['max_zoom']}")
+    scale = 2 ** (info["max_zoom"] - z)
+    span = TILE_SIZE * scale
+    col_off, row_off = x * span, y * span
+    if x < 0 or y < 0 or col_off >= info["width"] or row_off >= info["height"]:
+        raise ValueError("Tile outside the scene")
+
+    # Clip the window at the scene edge and shrink the output to match
+    width = min(span, info["width"] - col_off)
+    height = min(span, info["height"] - row_off)
+    out_w, out_h = max(1, math.ceil(width / scale)), max(1, math.ceil(height / scale))
+
+    src = open_dataset(info["tiff_file"])
+    data = src.read(
+        1,
+        window=Window(col_off, row_off, width, height),
+        out_shape=(out_h, out_w),
+        resampling=Resampling.average,
+    )
+
+    db_min, db_max = info["db_min"], info["db_max"]
+    tile = np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.uint8)
+    scaled = (to_db(data) - db_min) * (255.0 / (db_max - db_min))
+    tile[:out_h, :out_w] = np.clip(scaled, 0, 255).astype(np.uint8)
+    tile[:out_h, :out_w][data == 0] = 0
+    return encode_png_gray(tile)
+
+
+class TileCache:
+    """LRU cache of encoded tiles bounded by total bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._tiles: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+            return tile
+
+    def put(self, key: Tuple, tile: bytes):
+        with self._lock:
+            if key in self._tiles:
+                return
+            self._tiles[key] = tile
+            self._size += len(tile)
+            while self._size > self.max_bytes and self._tiles:
+                _, evicted = self._tiles.popitem(last=False)
+                self._size -= len(evicted)
+
+
+tile_cache = TileCache(TILE_CACHE_MAX_BYTES)
+
+
+def get_tile(z: int, x: int, y: int, polarisation: str = "vv", folder_path: str = HARDCODED_SAR_FOLDER) -> bytes:
+    info = scene_info(folder_path, polarisation)
+    key = (info["tiff_file"], z, x, y)
+    tile = tile_cache.get(key)
+    if tile is None:
+        tile = render_tile(info, z, x, y)
+        tile_cache.put(key, tile)
+    return tile
@@ -0,0 +1,266 @@
+import json
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+# Each pyramid level is PYRAMID_FACTOR times coarser than the one below
+PYRAMID_FACTOR = 4
+# Stop building levels once a level is this short
+PYRAMID_MIN_LENGTH = 512
+
+
+# Bins reduced per step when building a pyramid level from disk
+PYRAMID_CHUNK_BINS = 1 << 16
+
+
+def build_minmax_pyramid(data: np.ndarray, factor: int = PYRAMID_FACTOR, min_length: int = PYRAMID_MIN_LENGTH) -> List[np.ndarray]:
+    """
+    Build min/max envelope levels for a (n_channels, n_times) array.
+    Level k is a (2, n_channels, ceil(n_times / factor**k)) array of [min, max],
+    so every peak of the raw trace survives at every zoom level.
+    """
+    levels = []
+    lo = hi = np.asarray(data, dtype=np.float32)
+    while lo.shape[1] > min_length:
+        lo, hi = _reduce_minmax(lo, hi, factor)
+        levels.append(np.stack([lo, hi]))
+    return levels
+
+
+def _reduce_minmax(lo: np.ndarray, hi: np.ndarray, factor: int) -> Tuple[np.ndarray, np.ndarray]:
+    n_bins = -(-lo.shape[1] // factor)
+    pad = n_bins * factor - lo.shape[1]
+    if pad:
+        # Edge-pad so the last partial bin does not pick up fake extremes
+        lo = np.pad(lo, ((0, 0), (0, pad)), mode="edge")
+        hi = np.pad(hi, ((0, 0), (0, pad)), mode="edge")
+    return (lo.reshape(lo.shape[0], n_bins, factor).min(axis=2),
+            hi.reshape(hi.shape[0], n_bins, factor).max(axis=2))
+
+
+def _write_pyramid(data: np.ndarray, pyramid_dir: Path) -> List[Dict[str, int]]:
+    """Same levels as build_minmax_pyramid, reduced chunk by chunk into .npy memmaps"""
+    if pyramid_dir.exists():
+        shutil.rmtree(pyramid_dir)
+    pyramid_dir.mkdir()
+
+    levels = []
+    lo, hi, k = data, data, 0
+    while lo.shape[1] > PYRAMID_MIN_LENGTH:
+        k += 1
+        n_bins = -(-lo.shape[1] // PYRAMID_FACTOR)
+        level = np.lib.format.open_memmap(
+            pyramid_dir / f"level_{k}.npy", mode="w+", dtype="<f4", shape=(2, lo.shape[0], n_bins)
+        )
+        for b0 in range(0, n_bins, PYRAMID_CHUNK_BINS):
+            b1 = min(n_bins, b0 + PYRAMID_CHUNK_BINS)
+            s0, s1 = b0 * PYRAMID_FACTOR, min(lo.shape[1], b1 * PYRAMID_FACTOR)
+            level[0, :, b0:b1], level[1, :, b0:b1] = _reduce_minmax(
+                np.asarray(lo[:, s0:s1]), np.asarray(hi[:, s0:s1]), PYRAMID_FACTOR
+            )
+        level.flush()
+        levels.append({"level": k, "binSize": PYRAMID_FACTOR ** k, "length": n_bins})
+        lo, hi = level[0], level[1]
+    return levels
+
+
+def _paths(output_dir: str, recording_id: str) -> Tuple[Path, Path, Path]:
+    base = Path(output_dir)
+    return base / f"{recording_id}.json", base / f"{recording_id}.npy", base / f"{recording_id}.pyramid"
+
+
+class RecordingWriter:
+    """
+    Writes a (n_channels, n_samples) recording block by block straight into
+    its float32 .npy file, then builds the pyramid and header on close().
+    Memory use is bounded by the block size, not the recording length.
+    """
+
+    def __init__(self, channels: List[str], sfreq: float, n_samples: int, recording_id: str, output_dir: str):
+        os.makedirs(output_dir, exist_ok=True)
+        self.channels = channels
+        self.sfreq = sfreq
+        self.n_samples = n_samples
+        self.header_path, self.data_path, self.pyramid_dir = _paths(output_dir, recording_id)
+        # Little-endian float32, channel-major: each channel's samples are contiguous
+        self._data = np.lib.format.open_memmap(
+            self.data_path, mode="w+", dtype="<f4", shape=(len(channels), n_samples)
+        )
+        self.written = 0
+
+    def write(self, block: np.ndarray):
+        n = min(block.shape[1], self.n_samples - self.written)
+        self._data[:, self.written:self.written + n] = block[:, :n]
+        self.written += n
+
+    def abort(self):
+        """Drop a partially written recording"""
+        del self._data
+        if self.data_path.exists():
+            os.remove(self.data_path)
+
+    def close(self) -> str:
+        """Flush samples, build the min/max pyramid and write the header. Returns the header path."""
+        self._data.flush()
+        levels = _write_pyramid(self._data, self.pyramid_dir)
+        header = {
+            "channels": self.channels,
+            "samplingRate": float(self.sfreq),
+            "nSamples": int(self.n_samples),
+            "dtype": "float32",
+            "layout": "channels x samples",
+            "dataFile": self.data_path.name,
+            "pyramid": {"factor": PYRAMID_FACTOR, "levels": levels},
+        }
+        del self._data
+        with open(self.header_path, 'w') as f:
+            json.dump(header, f)
+        return str(self.header_path)
+
+
+def save_recording(channels: List[str], data: np.ndarray, sfreq: float, recording_id: str, output_dir: str) -> str:
+    """
+    Save a (n_channels, n_times) recording as a float32 .npy array, its min/max
+    pyramid and a small JSON header. Returns the header path.
+    """
+    writer = RecordingWriter(channels, sfreq, data.shape[1], recording_id, output_dir)
+    writer.write(data)
+    return writer.close()
+
+
+def delete_recording(recording_id: str, output_dir: str):
+    header_path, data_path, pyramid_dir = _paths(output_dir, recording_id)
+    header_path.unlink(missing_ok=True)
+    data_path.unlink(missing_ok=True)
+    shutil.rmtree(pyramid_dir, ignore_errors=True)
+
+
+def rename_recording(old_id: str, new_id: str, output_dir: str) -> str:
+    """Move a stored recording to a new id, returns the new header path"""
+    old_header, old_data, old_pyramid = _paths(output_dir, old_id)
+    new_header, new_data, new_pyramid = _paths(output_dir, new_id)
+    with open(old_header) as f:
+        header = json.load(f)
+    header["dataFile"] = new_data.name
+    os.replace(old_data, new_data)
+    if new_pyramid.exists():
+        shutil.rmtree(new_pyramid)
+    os.replace(old_pyramid, new_pyramid)
+    # Header last: it marks the recording as complete
+    with open(new_header, 'w') as f:
+        json.dump(header, f)
+    old_header.unlink()
+    return str(new_header)
+
+
+def _existing_paths(output_dir: str, recording_id: str) -> Tuple[Path, Path, Path]:
+    if not recording_id or Path(recording_id).name != recording_id or recording_id.startswith("."):
+        raise ValueError(f"Invalid recording id: {recording_id}")
+    header_path, data_path, pyramid_dir = _paths(output_dir, recording_id)
+    if not header_path.exists() or not data_path.exists():
+        raise FileNotFoundError(f"Recording not found: {recording_id}")
+    return header_path, data_path, pyramid_dir
+
+
+def load_header(recording_id: str, output_dir: str) -> Dict[str, Any]:
+    header_path, _, _ = _existing_paths(output_dir, recording_id)
+    with open(header_path) as f:
+        return json.load(f)
+
+
+def _select(header: Dict[str, Any], channels: Optional[List[str]], t0: float, t1: Optional[float]):
+    sfreq = header["samplingRate"]
+    n_samples = header["nSamples"]
+    start = max(0, int(np.floor(t0 * sfreq)))
+    stop = n_samples if t1 is None else min(n_samples, int(np.ceil(t1 * sfreq)))
+    if stop < start:
+        raise ValueError("t1 must be greater than t0")
+
+    all_channels = header["channels"]
+    if channels:
+        missing = [ch for ch in channels if ch not in all_channels]
+        if missing:
+            raise ValueError(f"Unknown channels: {', '.join(missing)}")
+        rows = [all_channels.index(ch) for ch in channels]
+    else:
+        channels = all_channels
+        rows = list(range(len(all_channels)))
+    return channels, rows, start, stop
+
+
+def read_window(recording_id: str, output_dir: str, t0: float = 0.0, t1: Optional[float] = None,
+                channels: Optional[List[str]] = None) -> Tuple[Dict[str, Any], List[str], int, np.ndarray]:
+    """
+    Read the [t0, t1) seconds of a stored recording for a subset of channels.
+    Only the requested window is touched on disk (memory-mapped).
+    Returns header, channel names, start sample and a (n_channels, n) float32 array.
+    """
+    header_path, data_path, _ = _existing_paths(output_dir, recording_id)
+    with open(header_path) as f:
+        header = json.load(f)
+
+    channels, rows, start, stop = _select(header, channels, t0, t1)
+    data = np.load(data_path, mmap_mode="r")
+    window = np.ascontiguousarray(data[rows, start:stop], dtype="<f4")
+    return header, channels, start, window
+
+
+def read_samples(recording_id: str, output_dir: str, channel: str, start: int, stop: int) -> np.ndarray:
+    """Samples [start, stop) of one channel, clipped to the recording, as float32"""
+    header_path, data_path, _ = _existing_paths(output_dir, recording_id)
+    with open(header_path) as f:
+        header = json.load(f)
+    if channel not in header["channels"]:
+        raise ValueError(f"Unknown channels: {channel}")
+    data = np.load(data_path, mmap_mode="r")
+    row = header["channels"].index(channel)
+    return np.ascontiguousarray(data[row, max(0, start):max(0, stop)], dtype="<f4")
+
+def read_view(recording_id: str, output_dir: str, t0: float = 0.0, t1: Optional[float] = None,
+              pixels: int = 1000, channels: Optional[List[str]] = None) -> Tuple[Dict[str, Any], List[str], int, int, np.ndarray]:
+    """
+    Min/max envelope of [t0, t1) with at most `pixels` bins per channel.
+    Reads from the coarsest pyramid level that still has a bin per pixel,
+    so the cost is O(pixels) whatever the zoom level.
+    Returns header, channel names, start sample, samples per bin and a
+    (2, n_channels, n_bins) float32 [min, max] array.
+    """
+    if pixels <= 0:
+        raise ValueError("pixels must be positive")
+    header_path, data_path, pyramid_dir = _existing_paths(output_dir, recording_id)
+    with open(header_path) as f:
+        header = json.load(f)
+
+    channels, rows, start, stop = _select(header, channels, t0, t1)
+    span = stop - start
+    target_bin = max(1, span // pixels)
+
+    # Coarsest level whose bins are no wider than one pixel
+    bin_size, source = 1, None
+    for level in header.get("pyramid", {}).get("levels", []):
+        if level["binSize"] <= target_bin:
+            bin_size = level["binSize"]
+            source = pyramid_dir / f"level_{level['level']}.npy"
+
+    if source is None:
+        raw = np.load(data_path, mmap_mode="r")[rows, start:stop]
+        lo = hi = np.asarray(raw, dtype=np.float32)
+    else:
+        level_data = np.load(source, mmap_mode="r")
+        lo_idx, hi_idx = start // bin_size, -(-stop // bin_size)
+        lo = np.asarray(level_data[0][rows, lo_idx:hi_idx])
+        hi = np.asarray(level_data[1][rows, lo_idx:hi_idx])
+        start = lo_idx * bin_size
+
+    # Merge the level's bins down to at most `pixels` output bins
+    n = lo.shape[1]
+    group = max(1, -(-n // pixels))
+    if group > 1 and n:
+        edges = np.arange(0, n, group)
+        lo = np.minimum.reduceat(lo, edges, axis=1)
+        hi = np.maximum.reduceat(hi, edges, axis=1)
+
+    envelope = np.ascontiguousarray(np.stack([lo, hi]), dtype="<f4")
+    return header, channels, start, bin_size * group, envelope
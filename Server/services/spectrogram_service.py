@@ -0,0 +1,183 @@
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import get_window
+from services.result_cache import DiskLRUCache, content_key
+from services.signal_store import load_header, read_samples, save_recording
+from services.config import AUDIO_DATA_DIR
+
+AUDIO_SAMPLING_RATE = 16000
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get("AUDIO_CACHE_MAX_BYTES", 5 * 1024 ** 3))
+
+# Decoded uploads are stored under their content key, so the store is the cache
+audio_cache = DiskLRUCache(AUDIO_DATA_DIR, AUDIO_CACHE_MAX_BYTES)
+
+# Frames are computed and cached in blocks of this many STFT columns,
+# so panning a view only computes the blocks it has not seen yet
+BLOCK_FRAMES = 256
+FRAME_CACHE_MAX_BYTES = int(os.environ.get("SPECTROGRAM_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Largest spectrogram a single request may ask for: at most MAX_FRAMES
+# columns and MAX_CELLS frames x bins (~80 MB of float32 power), whatever n_fft
+MAX_FRAMES = 20000
+MAX_CELLS = int(os.environ.get("SPECTROGRAM_MAX_CELLS", 20000 * 1025))
+
+
+@lru_cache(maxsize=16)
+def analysis_window(name: str, n_fft: int) -> np.ndarray:
+    window = get_window(name, n_fft, fftbins=True).astype(np.float32)
+    window.setflags(write=False)
+    return window
+
+
+@lru_cache(maxsize=16)
+def mel_filterbank(n_mels: int, n_fft: int, sfreq: float) -> np.ndarray:
+    """(n_mels, n_fft // 2 + 1) triangular HTK mel filters spanning 0 to Nyquist"""
+    def to_mel(f):
+        return 2595.0 * np.log10(1.0 + f / 700.0)
+
+    def to_hz(m):
+        return 700.0 * (10.0 ** (m / 2595.0) - 1.0)
+
+    fft_freqs = np.fft.rfftfreq(n_fft, 1.0 / sfreq)
+    edges = to_hz(np.linspace(0.0, to_mel(sfreq / 2), n_mels + 2))
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (fft_freqs - lower) / np.maximum(center - lower, 1e-9)
+    falling = (upper - fft_freqs) / np.maximum(upper - center, 1e-9)
+    filters = np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+    filters.setflags(write=False)
+    return filters
+
+
+def stft_power(samples: np.ndarray, n_fft: int, hop: int, window: str = "hann") -> np.ndarray:
+    """
+    |STFT|^2 of a 1-D signal as a (n_frames, n_fft // 2 + 1) float32 array.
+    Frames are strided views of the input, transformed in one batched rfft.
+    """
+    frames = sliding_window_view(samples, n_fft)[::hop]
+    spectrum = np.fft.rfft(frames * analysis_window(window, n_fft), axis=-1)
+    return (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+
+
+class FrameCache:
+    """LRU cache of STFT frame blocks bounded by total bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._blocks: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[np.ndarray]:
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is not None:
+                self._blocks.move_to_end(key)
+            return block
+
+    def put(self, key: Tuple, block: np.ndarray):
+        with self._lock:
+            if key in self._blocks:
+                return
+            self._blocks[key] = block
+            self._size += block.nbytes
+            while self._size > self.max_bytes and self._blocks:
+                _, evicted = self._blocks.popitem(last=False)
+                self._size -= evicted.nbytes
+
+
+frame_cache = FrameCache(FRAME_CACHE_MAX_BYTES)
+
+
+def _frame_block(recording_id: str, output_dir: str, channel: str, n_samples: int,
+                 block: int, n_fft: int, hop: int, window: str) -> np.ndarray:
+    key = (output_dir, recording_id, channel, n_fft, hop, window, block)
+    power = frame_cache.get(key)
+    if power is None:
+        start = block * BLOCK_FRAMES * hop
+        stop = start + (BLOCK_FRAMES - 1) * hop + n_fft
+        samples = read_samples(recording_id, output_dir, channel, start, min(stop, n_samples))
+        power = stft_power(samples, n_fft, hop, window)
+        power.setflags(write=False)
+        frame_cache.put(key, power)
+    return power
+
+
+def compute_spectrogram(recording_id: str, output_dir: str, channel: Optional[str] = None,
+                        t0: float = 0.0, t1: Optional[float] = None, n_fft: int = 512,
+                        hop: Optional[int] = None, window: str = "hann",
+                        n_mels: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Power spectrogram (or mel spectrogram if n_mels is given) of one channel
+    of a stored recording over [t0, t1). Returns the (n_frames, n_bins) power
+    and the metadata needed to place it on a time/frequency axis.
+    """
+    header = load_header(recording_id, output_dir)
+    sfreq = header["samplingRate"]
+    n_samples = header["nSamples"]
+    channel = channel or header["channels"][0]
+    hop = hop or n_fft // 4
+    if n_samples < n_fft:
+        raise ValueError(f"Recording has fewer than n_fft={n_fft} samples")
+
+    n_frames_total = 1 + (n_samples - n_fft) // hop
+    f0 = min(n_frames_total, int(np.floor(t0 * sfreq / hop)))
+    f1 = n_frames_total if t1 is None else min(n_frames_total, int(np.ceil(t1 * sfreq / hop)))
+    if f1 <= f0:
+        raise ValueError("t1 must be greater than t0")
+    if f1 - f0 > MAX_FRAMES:
+        raise ValueError(f"Window spans {f1 - f0} frames (max {MAX_FRAMES}); shorten it or increase hop")
+    if (f1 - f0) * (n_fft // 2 + 1) > MAX_CELLS:
+        raise ValueError(f"Window spans {f1 - f0} frames of {n_fft // 2 + 1} bins (max {MAX_CELLS} values); "
+                         f"shorten it, increase hop or lower n_fft")
+
+    blocks = [
+        _frame_block(recording_id, output_dir, channel, n_samples, b, n_fft, hop, window)
+        for b in range(f0 // BLOCK_FRAMES, (f1 - 1) // BLOCK_FRAMES + 1)
+    ]
+    offset = f0 - (f0 // BLOCK_FRAMES) * BLOCK_FRAMES
+    power = np.concatenate(blocks)[offset:offset + f1 - f0]
+
+    if n_mels:
+        power = power @ mel_filterbank(n_mels, n_fft, sfreq).T
+
+    return {
+        "power": power,
+        "channel": channel,
+        "sampling_rate": sfreq,
+        "start_sample": f0 * hop,
+        "hop": hop,
+        "n_fft": n_fft,
+        "max_frequency": sfreq / 2,
+    }
+
+
+def to_db(power: np.ndarray, top_db: float = 80.0) -> np.ndarray:
+    """Power in dB relative to the peak, floored at -top_db"""
+    db = 10.0 * np.log10(np.maximum(power, 1e-12))
+    return np.maximum(db - db.max(), -top_db).astype(np.float32)
+
+
+def quantize(db: np.ndarray, top_db: float = 80.0) -> np.ndarray:
+    """uint8 image of a dB spectrogram: frequency upwards, time to the right"""
+    image = np.round((db + top_db) * (255.0 / top_db)).astype(np.uint8)
+    return np.flipud(image.T)
+
+
+def store_audio(audio_bytes: bytes, digest: str) -> str:
+    """Decode an uploaded audio file once into a stored recording, keyed by content"""
+    recording_id = content_key(digest, {"sampling_rate": AUDIO_SAMPLING_RATE})
+    if audio_cache.contains(recording_id):
+        audio_cache.touch(recording_id)
+        return recording_id
+    # Imported here so EEG/ECG spectrograms never load transformers
+    from transformers.pipelines.audio_utils import ffmpeg_read
+    waveform = ffmpeg_read(audio_bytes, AUDIO_SAMPLING_RATE)
+    if waveform.size == 0:
+        raise ValueError("Audio file contains no samples")
+    save_recording(["audio"], waveform[None, :], AUDIO_SAMPLING_RATE, recording_id, AUDIO_DATA_DIR)
+    audio_cache.evict(protect=recording_id)
+    return recording_id
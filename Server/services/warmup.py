@@ -0,0 +1,57 @@
+import importlib
+import threading
+import time
+from typing import Any, Dict, List
+
+# domain: (service module, loader, attribute that is set once loaded)
+MODEL_LOADERS = {
+    "drone": ("services.drone_service", "load_drone_model", "classifier"),
+    "ecg": ("services.ecg_service", "load_ecg_model", "ecg_model"),
+    "doppler": ("services.doppler_service", "load_speed_index", "speed_index"),
+}
+
+_status: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+
+
+def _set(domain: str, **fields):
+    with _lock:
+        _status[domain].update(fields)
+
+
+def load(domains: List[str]):
+    """Import and load the models of the given domains, one after another"""
+    for domain in domains:
+        if domain not in MODEL_LOADERS:
+            continue
+        module_name, loader, attribute = MODEL_LOADERS[domain]
+        with _lock:
+            _status.setdefault(domain, {"status": "pending"})
+        _set(domain, status="loading")
+        start = time.perf_counter()
+        try:
+            module = importlib.import_module(module_name)
+            getattr(module, loader)()
+            ok = getattr(module, attribute) is not None
+            _set(domain, status="ready" if ok else "failed")
+        except Exception as e:
+            print(f"❌ Warm-up of {domain} failed: {e}")
+            _set(domain, status="failed", error=str(e))
+        _set(domain, seconds=round(time.perf_counter() - start, 2))
+
+
+def start(domains: List[str]) -> threading.Thread:
+    """Warm the models up in the background so the app can answer right away"""
+    with _lock:
+        for domain in domains:
+            if domain in MODEL_LOADERS:
+                _status.setdefault(domain, {"status": "pending"})
+    thread = threading.Thread(target=load, args=(domains,), name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def status() -> Dict[str, Any]:
+    with _lock:
+        models = {domain: dict(entry) for domain, entry in _status.items()}
+    return {"ready": all(m["status"] == "ready" for m in models.values()), "models": models}